@@ -1,20 +1,64 @@
 
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.db import models
+from django.db.models.functions import Greatest, Least, Now
 # IMPORTANT: Must import all models, including the new ones
-from .models import Category, Product, CartItem, Order, OrderItem 
+from .models import (
+    Category, Product, CartItem, Order, OrderItem, OrderStatusChange, ProductRecommendation, Task, DeadTask,
+)
+from .admin_tools import ApproximateCountPaginator, HoldStatusFilter, PriceBandFilter, StockLevelFilter
+from .cache import bump_products
+from . import fulfilment, search, tasks
 
 # --- Inline for Order Details ---
 class OrderItemInline(admin.TabularInline):
     """Allows OrderItems to be viewed/edited directly within the Order detail page."""
     model = OrderItem
-    # Use raw_id_fields for large tables to avoid slow dropdowns
-    raw_id_fields = ['product'] 
+    # Autocomplete rather than a <select> of every product
+    autocomplete_fields = ['product']
     # Order item details should generally be read-only once the order is placed
     readonly_fields = ['name', 'price_at_purchase', 'quantity'] 
 
 
+class OrderStatusChangeInline(admin.TabularInline):
+    """The order's status history (written by api/fulfilment.py)."""
+    model = OrderStatusChange
+    fields = readonly_fields = ['from_status', 'to_status', 'changed_by', 'changed_at']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class ProductRecommendationInline(admin.TabularInline):
+    """Products frequently bought with this one (computed by api/recommendations.py)."""
+    model = ProductRecommendation
+    fk_name = 'product'
+    fields = readonly_fields = ['rank', 'recommended', 'score', 'orders']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def transition_action(status, label):
+    """An admin action moving the selected orders to `status` (api/fulfilment.py)."""
+    @admin.action(description=f'Mark selected orders as {label}')
+    def action(modeladmin, request, queryset):
+        result = fulfilment.transition(queryset.values_list('pk', flat=True), status, request.user)
+        modeladmin.message_user(request, f"{result['updated']} order(s) marked as {label}.")
+        if result['rejected']:
+            modeladmin.message_user(
+                request, f"{len(result['rejected'])} order(s) cannot move to {label} from their status.",
+                messages.WARNING,
+            )
+    action.__name__ = f'mark_{status.lower()}'
+    return action
+
+
 # --- Register Core Models ---
 
 @admin.register(Category)
@@ -31,35 +75,59 @@ class ProductAdmin(admin.ModelAdmin):
     # Fields to display in the list view (Includes 'image_tag')
     list_display = ('name', 'category', 'price', 'stock_quantity', 'is_in_stock', 'image_tag', 'created_date')
     
-    # Fields to use for filtering in the sidebar
-    list_filter = ('category', 'created_date', 'stock_quantity', 'price')
+    # Fields to use for filtering in the sidebar (ranges, not one entry per distinct value)
+    list_filter = ('category', 'created_date', StockLevelFilter, PriceBandFilter)
     
     # Fields to search across
     search_fields = ('name', 'description')
     
     # Read-only fields.
     readonly_fields = ('created_date', 'image_tag')
+    inlines = [ProductRecommendationInline]
+
+    # Large-table settings: one JOIN for the category column, no exact COUNT(*)s
+    list_select_related = ('category',)
+    autocomplete_fields = ['category']
+    # An explicit pk tiebreak keeps the (name, id) index usable; the admin's
+    # default '-pk' tiebreak forces a sort of the whole table
+    ordering = ('name', 'pk')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     
     # Custom actions available from the list view dropdown
     actions = ['increase_stock', 'decrease_stock']
 
+    def get_search_results(self, request, queryset, search_term):
+        """Uses the full-text index when there is one instead of LIKE '%term%' scans."""
+        if search_term and search.is_available() and search.build_query(search_term):
+            return search.search_products(queryset, search_term, ranked=False), False
+        return super().get_search_results(request, queryset, search_term)
+
     @admin.action(description='Increase stock for selected products by 10 units')
     def increase_stock(self, request, queryset):
         """Increases stock_quantity for selected products by 10."""
-        updated_count = queryset.update(stock_quantity=models.F('stock_quantity') + 10)
+        updated_count = queryset.update(
+            stock_quantity=models.F('stock_quantity') + 10,
+            version=models.F('version') + 1,
+            updated_at=Now(),
+        )
+        bump_products(queryset.values_list('pk', flat=True))
         self.message_user(request, f"{updated_count} product(s) stock successfully increased by 10 units.")
 
     @admin.action(description='Decrease stock for selected products by 10 units')
     def decrease_stock(self, request, queryset):
-        """Decreases stock_quantity for selected products by 10."""
-        for product in queryset:
-            if product.stock_quantity >= 10:
-                product.stock_quantity -= 10
-                product.save()
-            else:
-                product.stock_quantity = 0
-                product.save()
-        self.message_user(request, f"Stock for selected product(s) successfully decreased.")
+        """
+        Decreases stock_quantity for selected products by 10, never below the
+        units held in carts (reserved_quantity): available stock stays >= 0.
+        """
+        stock = models.F('stock_quantity')
+        updated_count = queryset.update(
+            stock_quantity=Greatest(stock - 10, Least(models.F('reserved_quantity'), stock)),
+            version=models.F('version') + 1,
+            updated_at=Now(),
+        )
+        bump_products(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"{updated_count} product(s) stock successfully decreased (never below the units held in carts).")
 
 
 # --- Register New Models (Cart & Order Logic) ---
@@ -67,10 +135,15 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     """Admin for user's current shopping cart items."""
-    list_display = ('user', 'product', 'quantity')
-    list_filter = ('user', 'product')
+    list_display = ('user', 'product', 'quantity', 'held_quantity', 'hold_expires_at')
+    # Find a user's or product's lines through search; per-user/per-product
+    # filters would list every user and product in the sidebar
+    list_filter = (HoldStatusFilter,)
     search_fields = ('user__username', 'product__name')
-    raw_id_fields = ['user', 'product']
+    autocomplete_fields = ['user', 'product']
+    list_select_related = ('user', 'product')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Order)
@@ -79,6 +152,39 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'total_amount', 'status', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('user__username', 'id')
-    raw_id_fields = ['user']
-    readonly_fields = ('created_at', 'total_amount')
-    inlines = [OrderItemInline] # Show OrderItems directly within the Order detail page
\ No newline at end of file
+    autocomplete_fields = ['user']
+    list_select_related = ('user',)
+    # Ids grow with created_at; ordering on the pk alone needs no sort
+    ordering = ('-pk',)
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    # Status only changes through the transition actions, which validate the move
+    readonly_fields = ('created_at', 'total_amount', 'status')
+    inlines = [OrderItemInline, OrderStatusChangeInline] # Show OrderItems directly within the Order detail page
+    actions = [
+        transition_action(status, label.lower())
+        for status, label in Order.STATUS_CHOICES if fulfilment.allowed_from(status)
+    ]
+
+
+# --- Background tasks (api/tasks.py) ---
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Queued and running tasks; workers delete them once they succeed."""
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'created_at')
+    list_filter = ('name', 'status')
+    readonly_fields = ('claimed_by', 'last_error')
+
+
+@admin.register(DeadTask)
+class DeadTaskAdmin(admin.ModelAdmin):
+    """Tasks that ran out of attempts, with their last error."""
+    list_display = ('id', 'name', 'attempts', 'failed_at', 'created_at')
+    list_filter = ('name',)
+    readonly_fields = ('name', 'args', 'kwargs', 'attempts', 'created_at', 'failed_at', 'error')
+    actions = ['requeue']
+
+    @admin.action(description='Queue selected tasks again')
+    def requeue(self, request, queryset):
+        self.message_user(request, f"{tasks.requeue_dead(queryset)} task(s) queued again.")
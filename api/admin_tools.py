@@ -0,0 +1,134 @@
+# api/admin_tools.py
+"""List filters and a paginator that keep admin changelists fast on very large tables."""
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+# --- Bucketed filters ---------------------------------------------------------
+
+class RangeBucketFilter(admin.SimpleListFilter):
+    """
+    Filters a numeric field by fixed ranges.
+
+    The built-in filter for a plain field lists every distinct value, which
+    means a SELECT DISTINCT over the whole table on every changelist load and
+    an unusable sidebar. Subclasses set `field` and `buckets`, a list of
+    (key, label, low, high) where low is inclusive, high exclusive and either
+    may be None for an open end.
+    """
+    field = None
+    buckets = []
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, label, _, _ in self.buckets]
+
+    def queryset(self, request, queryset):
+        for key, _, low, high in self.buckets:
+            if self.value() == key:
+                if low is not None:
+                    queryset = queryset.filter(**{f'{self.field}__gte': low})
+                if high is not None:
+                    queryset = queryset.filter(**{f'{self.field}__lt': high})
+                return queryset
+        return queryset
+
+
+class PriceBandFilter(RangeBucketFilter):
+    title = 'price'
+    parameter_name = 'price_band'
+    field = 'price'
+    buckets = [
+        ('lt10', 'Under 10', None, 10),
+        ('10-100', '10 to 100', 10, 100),
+        ('100-1000', '100 to 1,000', 100, 1000),
+        ('1000-10000', '1,000 to 10,000', 1000, 10000),
+        ('gte10000', '10,000 and over', 10000, None),
+    ]
+
+
+class StockLevelFilter(RangeBucketFilter):
+    title = 'stock level'
+    parameter_name = 'stock_level'
+    field = 'stock_quantity'
+    buckets = [
+        ('out', 'Out of stock', None, 1),
+        ('low', 'Low (1-9)', 1, 10),
+        ('in', 'In stock (10+)', 10, None),
+    ]
+
+
+class HoldStatusFilter(admin.SimpleListFilter):
+    title = 'reservation'
+    parameter_name = 'hold'
+
+    def lookups(self, request, model_admin):
+        return [('held', 'Holding stock'), ('none', 'No hold')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'held':
+            return queryset.filter(held_quantity__gt=0)
+        if self.value() == 'none':
+            return queryset.filter(held_quantity=0)
+        return queryset
+
+
+# --- Approximate counts -------------------------------------------------------
+
+def estimated_row_count(model, using='default'):
+    """
+    The planner's row estimate for `model`'s table, or None when the database
+    keeps none (SQLite before ANALYZE, PostgreSQL before the first VACUUM/ANALYZE).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'postgresql': ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]),
+        'mysql': (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            [table],
+        ),
+        # The first number of any sqlite_stat1 row for the table is its row count
+        'sqlite': ("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]),
+    }
+    if connection.vendor not in queries:
+        return None
+    sql, params = queries[connection.vendor]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:  # e.g. sqlite_stat1 does not exist until ANALYZE runs
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Avoids an exact COUNT(*) over huge tables.
+
+    Unfiltered lists of more than `exact_count_limit` rows use the planner's
+    row estimate. Everything else counts at most `count_limit` rows, so a broad
+    filter caps the page links rather than scanning the whole table. Pair it
+    with ModelAdmin.show_full_result_count = False, which drops the second,
+    unfiltered COUNT(*) the changelist would otherwise run.
+    """
+    exact_count_limit = 10_000
+    count_limit = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return queryset.order_by().values('pk')[:self.count_limit].count()
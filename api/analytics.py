@@ -0,0 +1,274 @@
+# api/analytics.py
+"""
+Sales rollups: orders, units and revenue per day, per day and category and per
+day and product (DailySales, DailyCategorySales, DailyProductSales).
+
+Dashboards read the rollups instead of aggregating OrderItem, so a report
+costs the same however long the order history is. Orders are counted unless
+cancelled. Placing an order, cancelling or un-cancelling it and deleting it
+add or subtract its items (see api/signals.py): the change is read once the
+transaction commits and applied by a background task ('analytics.apply',
+api/tasks.py), off the checkout path. Changes are additions, so tasks may run
+in any order. Queryset.update() call sites that change an order's status must
+call record_orders() themselves. `rebuild()` (manage.py rebuild_sales_rollups)
+recomputes a range of days from the orders and drops the queued changes to them.
+
+Increments are single INSERT ... ON CONFLICT DO UPDATE statements, which
+SQLite and PostgreSQL both support.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import tasks
+from .models import DailyCategorySales, DailyProductSales, DailySales, DeadTask, Order, OrderItem, Task
+
+# Orders in these statuses are not counted
+EXCLUDED_STATUSES = ('CANCELLED',)
+
+# Rollup model -> the fields identifying one of its rows
+KEYS = {
+    DailySales: ('day',),
+    DailyCategorySales: ('day', 'category'),
+    DailyProductSales: ('day', 'product'),
+}
+
+CENT = Decimal('0.01')
+UPSERT_BATCH = 500
+
+
+def is_counted(status):
+    return status not in EXCLUDED_STATUSES
+
+
+def _day(moment):
+    return timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+
+
+def _rollups(items):
+    """
+    The rollup rows an OrderItem queryset adds up to, in one query:
+    {model: {key: [orders, units, revenue]}}.
+    """
+    rollups = {model: defaultdict(lambda: [0, 0, Decimal('0.00')]) for model in KEYS}
+    seen = set()  # (model, key, order): each order counts once per row
+    rows = items.order_by().values_list(
+        'order_id', 'order__created_at', 'product_id', 'product__category_id', 'quantity', 'price_at_purchase',
+    )
+    for order_id, created_at, product_id, category_id, quantity, price in rows.iterator():
+        day = _day(created_at)
+        for model, key in ((DailySales, (day,)), (DailyCategorySales, (day, category_id)),
+                           (DailyProductSales, (day, product_id))):
+            counters = rollups[model][key]
+            if (model, key, order_id) not in seen:
+                seen.add((model, key, order_id))
+                counters[0] += 1
+            counters[1] += quantity
+            counters[2] += quantity * price
+    return rollups
+
+
+def increment(model, keys, counters, rows):
+    """
+    Adds (key..., counter...) rows to the `counters` fields of a table unique on
+    the `keys` fields, creating missing rows; UPSERT_BATCH rows per statement.
+    """
+    fields = [model._meta.get_field(name) for name in (*keys, *counters)]
+    keys = fields[:len(keys)]
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = ', '.join(qn(field.column) for field in fields)
+    conflict = ', '.join(qn(field.column) for field in keys)
+    updates = ', '.join(
+        f'{qn(field.column)} = {table}.{qn(field.column)} + excluded.{qn(field.column)}'
+        for field in fields[len(keys):]
+    )
+    row_sql = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    with connection.cursor() as cursor:
+        # The connection itself, not the `connection` proxy (a thread-local lookup per value)
+        db = cursor.db
+        for start in range(0, len(rows), UPSERT_BATCH):
+            batch = rows[start:start + UPSERT_BATCH]
+            params = [
+                field.get_db_prep_save(value, db) for row in batch for field, value in zip(fields, row)
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([row_sql] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params,
+            )
+
+
+def _apply(rollups, sign=1):
+    # Rows in key order, so concurrent writers lock them in the same order
+    with transaction.atomic():
+        for model, rows in rollups.items():
+            increment(model, KEYS[model], model.COUNTERS,
+                      [(*key, *(sign * value for value in counters)) for key, counters in sorted(rows.items())])
+
+
+def _encode(rollups, sign):
+    """JSON task arguments for _apply(): [[model label, [key...], [orders, units, revenue]], ...]."""
+    return [
+        [model._meta.label, [value.isoformat() if isinstance(value, date) else value for value in key],
+         [sign * counters[0], sign * counters[1], str(sign * counters[2])]]
+        for model, rows in rollups.items() for key, counters in rows.items()
+    ]
+
+
+@tasks.task('analytics.apply')
+def apply_rollups(rows):
+    models = {model._meta.label: model for model in KEYS}
+    rollups = {model: {} for model in KEYS}
+    for label, (day, *ids), (orders, units, revenue) in rows:
+        rollups[models[label]][(date.fromisoformat(day), *ids)] = [orders, units, Decimal(revenue)]
+    _apply(rollups)
+
+
+def _enqueue(rollups, sign):
+    rows = _encode(rollups, sign)
+    if rows:
+        tasks.enqueue('analytics.apply', rows)
+
+
+def record_orders(order_ids, sign=1):
+    """
+    Adds (sign=1) or subtracts (sign=-1) the orders' items to the rollups. The
+    items are read once the current transaction commits (an order's items may
+    be created after the order) and applied by a background task.
+    """
+    order_ids = list(order_ids)
+    transaction.on_commit(lambda: _enqueue(_rollups(OrderItem.objects.filter(order_id__in=order_ids)), sign))
+
+
+def record_deletion(order_ids):
+    """Subtracts orders about to be deleted (their items are read now) once the transaction commits."""
+    _enqueue(_rollups(OrderItem.objects.filter(order_id__in=list(order_ids))), -1)
+
+
+def _midnight(day):
+    moment = datetime.combine(day, time.min)
+    return timezone.make_aware(moment) if settings.USE_TZ else moment
+
+
+def _discard_pending(start, end):
+    """
+    Drops the rows of queued, running and dead 'analytics.apply' tasks that fall
+    on the days `start`..`end`: rebuild() recounts their orders. A task losing
+    rows is deleted and its other rows queued anew, so a worker running it
+    loses its lease and rolls its writes back (see tasks.run()).
+    """
+    def kept(rows):
+        # Rows are [model label, [day, ...], counters] (see _encode())
+        return [row for row in rows if not rebuilt(date.fromisoformat(row[1][0]))]
+
+    def rebuilt(day):
+        return (start is None or day >= start) and (end is None or day <= end)
+
+    for row in Task.objects.select_for_update().filter(name='analytics.apply'):
+        rows = kept(row.args[0])
+        if len(rows) < len(row.args[0]):
+            row.delete()
+            if rows:
+                Task.objects.create(name=row.name, args=[rows])
+    for row in DeadTask.objects.select_for_update().filter(name='analytics.apply'):
+        rows = kept(row.args[0])
+        if not rows:
+            row.delete()
+        elif len(rows) < len(row.args[0]):
+            row.args = [rows]
+            row.save(update_fields=['args'])
+
+
+def rebuild(start=None, end=None, chunk_size=2000):
+    """
+    Recomputes the rollups of the days `start`..`end` (inclusive, either open)
+    from the orders placed on them, `chunk_size` orders per transaction, and
+    drops the queued changes to those days. Returns the number of orders
+    counted. Orders written while it runs may be counted twice or missed on
+    the rebuilt days: run it when checkout is quiet.
+    """
+    orders = Order.objects.exclude(status__in=EXCLUDED_STATUSES)
+    days = {}
+    if start is not None:
+        orders = orders.filter(created_at__gte=_midnight(start))
+        days['day__gte'] = start
+    if end is not None:
+        orders = orders.filter(created_at__lt=_midnight(end + timedelta(days=1)))
+        days['day__lte'] = end
+
+    with transaction.atomic():
+        # Queued changes to these days would be counted a second time
+        _discard_pending(start, end)
+        for model in KEYS:
+            model.objects.filter(**days).delete()
+
+    counted, last = 0, 0
+    while True:
+        chunk = list(orders.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            return counted
+        _apply(_rollups(OrderItem.objects.filter(order_id__in=chunk)))
+        counted, last = counted + len(chunk), chunk[-1]
+
+
+# --- Reports ------------------------------------------------------------------
+
+def _figures(orders, units, revenue):
+    revenue = (revenue or Decimal('0.00')).quantize(CENT)
+    return {
+        'orders': orders or 0,
+        'units': units or 0,
+        'revenue': revenue,
+        'average_order_value': (revenue / orders).quantize(CENT) if orders else None,
+    }
+
+
+def _totals(queryset):
+    return queryset.annotate(
+        total_orders=Sum('orders'), total_units=Sum('units'), total_revenue=Sum('revenue'),
+    )
+
+
+def daily(start, end):
+    """Totals of the range and one entry per day (days without sales included)."""
+    rows = {row.day: row for row in DailySales.objects.filter(day__gte=start, day__lte=end)}
+    days = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = rows.get(day, DailySales(day=day))
+        days.append({'day': day, **_figures(row.orders, row.units, row.revenue)})
+    totals = _figures(
+        sum(row.orders for row in rows.values()),
+        sum(row.units for row in rows.values()),
+        sum((row.revenue for row in rows.values()), Decimal('0.00')),
+    )
+    return {'totals': totals, 'days': days}
+
+
+def by_category(start, end, rank_by='revenue', limit=None):
+    rows = _totals(
+        DailyCategorySales.objects.filter(day__gte=start, day__lte=end).values('category_id', 'category__name')
+    ).order_by(f'-total_{rank_by}', 'category_id')
+    return [
+        {'id': row['category_id'], 'name': row['category__name'],
+         **_figures(row['total_orders'], row['total_units'], row['total_revenue'])}
+        for row in (rows[:limit] if limit else rows)
+    ]
+
+
+def top_products(start, end, rank_by='revenue', limit=10):
+    rows = _totals(
+        DailyProductSales.objects.filter(day__gte=start, day__lte=end).values('product_id', 'product__name')
+    ).order_by(f'-total_{rank_by}', 'product_id')[:limit]
+    return [
+        {'id': row['product_id'], 'name': row['product__name'],
+         **_figures(row['total_orders'], row['total_units'], row['total_revenue'])}
+        for row in rows
+    ]
@@ -0,0 +1,231 @@
+# api/async_views.py
+"""
+Native async read path, routed ahead of the regular API by
+api_project/urls_async.py when the project runs under ASGI.
+
+Product list/search/detail and order history are served on the event loop:
+queries go through the async ORM, caches through their async API, and the
+already-fetched rows are serialized and rendered in place. Anything these
+views do not answer exactly like DRF would (writes, other renderers, Basic
+auth, invalid input, errors) falls through to the sync viewset, so responses
+are the same on either path.
+"""
+
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from . import throttling
+from .authentication import CachedTokenAuthentication
+from .cache import CATALOG_GENERATION, DETAIL_GENERATION, PRODUCT_GENERATION, catalog_cache
+from .conditional import _detail_etag, _not_modified, _set_validators, _timestamp
+from .models import Category
+from .views import OrderViewSet, ProductViewSet
+
+
+class _Fallback(Exception):
+    """The sync viewset has to answer this request."""
+
+
+def async_read(viewset, actions):
+    """
+    Turns `handler(view, request, **kwargs)` into an async view for the
+    viewset route `actions`. GET requests run the handler with a viewset
+    instance set up as DRF's dispatch would (authenticated, permission-checked,
+    content-negotiated, throttled); every other request, and any request the handler
+    gives up on, is dispatched to the sync viewset in a worker thread.
+    """
+    sync_view = viewset.as_view(dict(actions))
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, **kwargs):
+            if request.method == 'GET':
+                try:
+                    drf_view, drf_request = await _initial(sync_view, request, kwargs)
+                    try:
+                        drf_view.check_throttles(drf_request)
+                    except exceptions.Throttled as exc:
+                        # Answered here: the sync viewset would take a second token
+                        return _finalize(drf_view, drf_request, drf_view.handle_exception(exc))
+                    # Should the handler give up, the sync viewset must not throttle it again
+                    throttling.mark_admitted(request)
+                    response = await handler(drf_view, drf_request, **kwargs)
+                    return _finalize(drf_view, drf_request, response)
+                except (_Fallback, exceptions.APIException, ObjectDoesNotExist):
+                    pass  # answered (or rejected) by the sync viewset below
+            return await sync_to_async(sync_view)(request, **kwargs)
+
+        # Metrics label the route like the sync viewset ('ProductViewSet.list')
+        view.cls, view.initkwargs, view.actions = sync_view.cls, sync_view.initkwargs, sync_view.actions
+        return csrf_exempt(view)
+
+    return decorator
+
+
+async def _authenticate(request):
+    """(user, auth) as CachedTokenAuthentication or SessionAuthentication would find them."""
+    header = get_authorization_header(request).split()
+    if not header:
+        return await request.auser(), None
+    if len(header) != 2 or header[0].lower() != b'token':
+        raise _Fallback  # Basic credentials and malformed headers
+    try:
+        key = header[1].decode()
+    except UnicodeError:
+        raise _Fallback
+    return await CachedTokenAuthentication().aauthenticate_credentials(key)
+
+
+async def _initial(sync_view, request, kwargs):
+    """The viewset instance and DRF request of a sync dispatch, up to the handler call."""
+    actions = dict(sync_view.actions)
+    actions.setdefault('head', actions['get'])
+    view = sync_view.cls(**sync_view.initkwargs)
+    view.action_map = actions
+    for method, action in actions.items():
+        setattr(view, method, getattr(view, action))
+    view.action = actions['get']
+    view.args, view.kwargs, view.format_kwarg = (), kwargs, None
+    view.headers = view.default_response_headers
+
+    drf_request = Request(request, authenticators=(), negotiator=view.get_content_negotiator())
+    view.request = drf_request
+    renderer, media_type = view.perform_content_negotiation(drf_request)
+    if not isinstance(renderer, JSONRenderer):
+        raise _Fallback  # e.g. the browsable API
+    drf_request.accepted_renderer, drf_request.accepted_media_type = renderer, media_type
+
+    drf_request.user, drf_request.auth = await _authenticate(request)
+    view.check_permissions(drf_request)
+    return view, drf_request
+
+
+def _finalize(view, drf_request, response):
+    """Adds the viewset's headers and renders DRF responses here rather than in a worker thread."""
+    response = view.finalize_response(drf_request, response)
+    if not isinstance(response, Response):
+        return response  # 304 / 412
+    marks = getattr(drf_request._request, '_metrics_render', None)
+    if marks is not None:
+        marks[0] = time.perf_counter()
+    response.render()
+    if marks is not None:
+        marks[1] = time.perf_counter()
+    rendered = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        rendered[header] = value
+    return rendered
+
+
+def _filter(view, request, queryset, categories):
+    """
+    ProductViewSet.filter_queryset(). `categories` are the `?category=` ids,
+    already known to exist: the filterset would query for them to validate.
+    """
+    params = request.query_params.copy()
+    params.pop('category', None)
+    filterset = view.filterset_class(params, queryset, request=request)
+    if not filterset.is_valid():
+        raise _Fallback  # django-filter's 400
+    queryset = filterset.qs
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    for backend in view.filter_backends:
+        if backend is not DjangoFilterBackend:
+            queryset = backend().filter_queryset(request, queryset, view)
+    return view.prune_queryset(queryset)
+
+
+async def _validators(view, request, pk):
+    """ConditionalRetrieveMixin's validators for `pk`: (etag, last modified, 304 response or None)."""
+    if not pk.isdigit() or request.query_params:
+        raise _Fallback
+    queryset = view.get_queryset()
+    row = await queryset.filter(pk=pk).values_list(*view.validator_fields).afirst()
+    if row is None:
+        raise _Fallback  # the usual 404
+    etag = _detail_etag(queryset.model, pk, None, row)  # no query string: the full representation
+    last_modified = _timestamp(value for value in row if hasattr(value, 'timestamp'))
+    return etag, last_modified, _not_modified(request, etag, last_modified)
+
+
+def _cached_response(data, state):
+    response = Response(data)
+    response['X-Cache'] = state
+    return response
+
+
+@async_read(ProductViewSet, {'get': 'list', 'post': 'create'})
+async def product_list(view, request):
+    # 1. Catalog cache (CatalogCacheMixin.list)
+    key = await catalog_cache.akey(request, [CATALOG_GENERATION])
+    data = await catalog_cache.aget(key)
+    if data is not None:
+        return _cached_response(data, 'HIT')
+
+    # 2. Filter, search, order and fetch one page
+    categories = {pk for pk in request.query_params.getlist('category') if pk}
+    if categories and (
+        not all(pk.isdigit() for pk in categories)
+        or await Category.objects.filter(pk__in=categories).acount() != len(categories)
+    ):
+        raise _Fallback  # django-filter's 400
+    queryset = _filter(view, request, view.get_queryset(), categories)
+    page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+
+    data = view.get_paginated_response(view.get_serializer(page, many=True).data).data
+    await catalog_cache.aset(key, data)
+    return _cached_response(data, 'MISS')
+
+
+@async_read(ProductViewSet, {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'})
+async def product_detail(view, request, pk):
+    # 1. Conditional GET (ConditionalRetrieveMixin)
+    etag, last_modified, not_modified = await _validators(view, request, pk)
+    if not_modified is not None:
+        return not_modified
+
+    # 2. Catalog cache (CatalogCacheMixin.retrieve), then the row
+    key = await catalog_cache.akey(request, [DETAIL_GENERATION, PRODUCT_GENERATION.format(pk)])
+    data = await catalog_cache.aget(key)
+    if data is not None:
+        response = _cached_response(data, 'HIT')
+    else:
+        product = await view.get_queryset().aget(pk=pk)
+        view.check_object_permissions(request, product)
+        data = view.get_serializer(product).data
+        await catalog_cache.aset(key, data)
+        response = _cached_response(data, 'MISS')
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+@async_read(OrderViewSet, {'get': 'list', 'post': 'create'})
+async def order_list(view, request):
+    queryset = view.filter_queryset(view.get_queryset())
+    page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+    return view.get_paginated_response(view.get_serializer(page, many=True).data)
+
+
+@async_read(OrderViewSet, {'get': 'retrieve'})
+async def order_detail(view, request, pk):
+    etag, last_modified, not_modified = await _validators(view, request, pk)
+    if not_modified is not None:
+        return not_modified
+
+    order = await view.get_queryset().aget(pk=pk)  # items come with it (prefetch_related)
+    view.check_object_permissions(request, order)
+    response = Response(view.get_serializer(order).data)
+    _set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,182 @@
+# api/authentication.py
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _config():
+    config = {'MAX_ENTRIES': 10000, 'TTL': 60, 'SHARED_ALIAS': None}
+    config.update(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+    return config
+
+
+def _shared_key(key):
+    # Never put raw tokens into a shared cache's key space
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+class TokenUserCache:
+    """
+    Bounded token -> user LRU whose entries expire after TOKEN_AUTH_CACHE['TTL']
+    seconds, optionally backed by a shared cache (TOKEN_AUTH_CACHE['SHARED_ALIAS']).
+
+    Signal handlers (api/signals.py) invalidate entries when a token is deleted
+    or rotated and when its user changes. Other processes only see that through
+    the shared cache; their in-process entries run out with the TTL, so keep it
+    short.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (user, expires_at)
+        self._by_user = {}             # user id -> keys, for user-level invalidation
+        self._epoch = 0                # bumped by every invalidation
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    @property
+    def shared(self):
+        alias = _config()['SHARED_ALIAS']
+        return caches[alias] if alias else None
+
+    def epoch(self):
+        """Pass to set(): an invalidation in between makes the set a no-op."""
+        return self._epoch
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return copy.copy(entry[0])  # requests must not share one mutable User
+            if entry is not None:
+                self._forget(key)
+
+        user = self.shared.get(_shared_key(key)) if self.shared else None
+        with self._lock:
+            if user is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            self._store(key, user, now)
+        return user
+
+    def set(self, key, user, epoch):
+        config = _config()
+        with self._lock:
+            if epoch != self._epoch:
+                return  # invalidated while the user was being loaded
+            self._store(key, user, time.monotonic())
+        if self.shared:
+            self.shared.set(_shared_key(key), user, timeout=config['TTL'])
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                if key in self._entries:
+                    self._forget(key)
+                    self._stats['invalidations'] += 1
+        if self.shared and keys:
+            self.shared.delete_many([_shared_key(key) for key in keys])
+
+    def invalidate_user(self, user_id):
+        """Drops every cached token of a user, including ones only the shared cache holds."""
+        with self._lock:
+            keys = set(self._by_user.get(user_id, ()))
+        if self.shared:
+            keys.update(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+        self.invalidate(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._by_user.clear()
+            self._epoch += 1
+            self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        if self.shared and keys:
+            self.shared.delete_many([_shared_key(key) for key in keys])
+
+    # Callers hold self._lock
+
+    def _store(self, key, user, now):
+        if key in self._entries:
+            self._forget(key)
+        self._entries[key] = (copy.copy(user), now + _config()['TTL'])
+        self._by_user.setdefault(user.pk, set()).add(key)
+        while len(self._entries) > _config()['MAX_ENTRIES']:
+            self._forget(next(iter(self._entries)))
+            self._stats['evictions'] += 1
+
+    def _forget(self, key):
+        user, _ = self._entries.pop(key)
+        keys = self._by_user.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user.pk]
+
+
+token_cache = TokenUserCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that skips the Token + User query for recently seen
+    tokens. `request.auth` is an unsaved Token carrying the key and user.
+    """
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            epoch = token_cache.epoch()
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            token_cache.set(key, user, epoch)
+        return (user, Token(key=key, user=user))
+
+    async def aauthenticate_credentials(self, key):
+        """authenticate_credentials() for async views (api/async_views.py)."""
+        # The in-process cache never blocks; a shared cache may do network I/O
+        shared = token_cache.shared is not None
+        user = await sync_to_async(token_cache.get)(key) if shared else token_cache.get(key)
+        if user is None:
+            epoch = token_cache.epoch()
+            try:
+                token = await Token.objects.select_related('user').aget(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            if shared:
+                await sync_to_async(token_cache.set)(key, user, epoch)
+            else:
+                token_cache.set(key, user, epoch)
+        return (user, Token(key=key, user=user))
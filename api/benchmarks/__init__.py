@@ -0,0 +1,11 @@
+# api/benchmarks/__init__.py
+"""
+Helpers shared by the `bench_*` management commands, plus the API benchmark
+suite run by `manage.py bench_api`: a deterministic data generator (data.py),
+in-process endpoint scenarios (scenarios.py) and comparable results files
+(results.py).
+"""
+
+from .base import percentile, rss_kb, run_parallel, scratch_database
+
+__all__ = ['percentile', 'rss_kb', 'run_parallel', 'scratch_database']
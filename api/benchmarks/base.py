@@ -0,0 +1,104 @@
+# api/benchmarks/base.py
+
+import math
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import override_settings
+
+
+@contextmanager
+def scratch_database(alias='default'):
+    """
+    Creates a throwaway test database for a benchmark run and destroys it
+    afterwards, so benchmarks never touch development data.
+    """
+    connection = connections[alias]
+    settings_dict = connection.settings_dict
+    old_options = dict(settings_dict['OPTIONS'])
+    tmpdir = None
+
+    if connection.vendor == 'sqlite':
+        # Worker threads need a real file: the shared in-memory test database
+        # raises "table is locked" instead of waiting for concurrent writers.
+        tmpdir = tempfile.mkdtemp(prefix='api-bench-')
+        settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+        settings_dict['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        # Like the test runner: no per-query logging skewing timings and memory
+        with override_settings(DEBUG=False):
+            yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_dict['OPTIONS'] = old_options
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run_parallel(func, jobs, workers):
+    """
+    Runs `func(job)` for every job on `workers` threads.
+
+    Returns a list of (result, exception, seconds) tuples, one per job. Each
+    worker closes its own database connection when the queue is drained.
+    """
+    pending = queue.Queue()
+    for job in jobs:
+        pending.put(job)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                try:
+                    job = pending.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.perf_counter()
+                result, error = None, None
+                try:
+                    result = func(job)
+                except Exception as exc:  # recorded, not raised: benchmarks count failures
+                    error = exc
+                with lock:
+                    results.append((result, error, time.perf_counter() - started))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def rss_kb():
+    """Current resident set size in KiB (Linux /proc), else the peak reported by getrusage."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,137 @@
+# api/benchmarks/data.py
+
+import hashlib
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+
+from api.models import CartItem, Category, Order, OrderItem, Product
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'zen', 'bar', 'cor', 'dex', 'fil', 'gan']
+STATUSES = [status for status, _ in Order.STATUS_CHOICES]
+# Fixed origin for every generated timestamp, so two runs produce identical rows
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+PASSWORD = 'bench'
+
+
+@dataclass(frozen=True)
+class Scale:
+    categories: int
+    products: int
+    users: int
+    cart_lines: int        # per user
+    orders_per_user: int
+    items_per_order: int = 3  # at most
+
+
+SCALES = {
+    'tiny': Scale(categories=5, products=200, users=20, cart_lines=2, orders_per_user=3),
+    'small': Scale(categories=20, products=5_000, users=200, cart_lines=3, orders_per_user=5),
+    'medium': Scale(categories=50, products=50_000, users=2_000, cart_lines=3, orders_per_user=10),
+    'large': Scale(categories=100, products=500_000, users=20_000, cart_lines=3, orders_per_user=20),
+}
+
+
+@dataclass
+class Dataset:
+    """What the scenarios need to know about the generated data."""
+    seed: int
+    scale: Scale
+    category_ids: list = field(default_factory=list)
+    product_ids: list = field(default_factory=list)
+    tokens: dict = field(default_factory=dict)  # user id -> API token key
+    words: list = field(default_factory=list)   # vocabulary product names are built from
+
+
+def token_key(seed, index):
+    return hashlib.sha1(f'bench:{seed}:{index}'.encode()).hexdigest()
+
+
+def generate(scale, seed=7, batch_size=5000):
+    """
+    Fills the current database with a deterministic catalog, users (with API
+    tokens), carts and order histories. The same scale and seed always give
+    the same rows; run it against an empty database (see scratch_database).
+    """
+    rng = random.Random(seed)
+    data = Dataset(seed=seed, scale=scale)
+    data.words = sorted({
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(2000)
+    })
+
+    # 1. Catalog
+    categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(scale.categories)])
+    data.category_ids = [c.pk for c in categories]
+    prices = {}
+    for start in range(0, scale.products, batch_size):
+        products = Product.objects.bulk_create([
+            Product(
+                category_id=rng.choice(data.category_ids),
+                sku=f'BENCH-{i:08d}',
+                name=' '.join(rng.sample(data.words, 3)).title(),
+                description=' '.join(rng.choices(data.words, k=20)),
+                price=Decimal(rng.randint(100, 100000)) / 100,
+                stock_quantity=rng.randint(20, 500),
+                created_date=EPOCH + timedelta(minutes=i),
+            )
+            for i in range(start, min(scale.products, start + batch_size))
+        ])
+        for product in products:
+            data.product_ids.append(product.pk)
+            prices[product.pk] = (product.name, product.price)
+
+    # 2. Users and their API tokens (one password hash, computed once)
+    User = get_user_model()
+    password = make_password(PASSWORD, salt='benchmarksalt')
+    users = []
+    for start in range(0, scale.users, batch_size):
+        users += User.objects.bulk_create([
+            User(username=f'bench-{i}', password=password, date_joined=EPOCH)
+            for i in range(start, min(scale.users, start + batch_size))
+        ])
+    Token.objects.bulk_create(
+        [Token(key=token_key(seed, i), user=user) for i, user in enumerate(users)], batch_size=batch_size
+    )
+    data.tokens = {user.pk: token_key(seed, i) for i, user in enumerate(users)}
+
+    # 3. Carts (no holds: reservations would drift from the generated stock)
+    CartItem.objects.bulk_create(
+        [
+            CartItem(user=user, product_id=product_id, quantity=rng.randint(1, 3))
+            for user in users
+            for product_id in rng.sample(data.product_ids, min(scale.cart_lines, len(data.product_ids)))
+        ],
+        batch_size=batch_size,
+    )
+
+    # 4. Order histories
+    per_batch = max(1, batch_size // max(1, scale.orders_per_user))
+    for start in range(0, len(users), per_batch):
+        orders, lines = [], []
+        for user in users[start:start + per_batch]:
+            for _ in range(scale.orders_per_user):
+                picked = rng.sample(data.product_ids, min(rng.randint(1, scale.items_per_order), len(data.product_ids)))
+                items = [(product_id, rng.randint(1, 3)) for product_id in picked]
+                orders.append(Order(
+                    user=user,
+                    created_at=EPOCH + timedelta(minutes=rng.randint(0, 525_600)),
+                    total_amount=sum(prices[pid][1] * quantity for pid, quantity in items),
+                    status=rng.choice(STATUSES),
+                ))
+                lines.append(items)
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product_id=product_id, name=prices[product_id][0],
+                quantity=quantity, price_at_purchase=prices[product_id][1],
+            )
+            for order, items in zip(orders, lines)
+            for product_id, quantity in items
+        ], batch_size=batch_size)
+
+    return data
@@ -0,0 +1,90 @@
+# api/benchmarks/results.py
+
+import json
+import platform
+import subprocess
+from dataclasses import asdict
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.db import connection
+
+FORMAT_VERSION = 1
+
+# Figures compared between runs: (key, True when higher is better)
+COMPARED = [('throughput_rps', True), ('p50_ms', False), ('p95_ms', False), ('p99_ms', False)]
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def build(scenarios, scale_name, data, iterations, workers):
+    """The results document: run metadata plus one entry per scenario."""
+    return {
+        'format': FORMAT_VERSION,
+        'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'scale': {'name': scale_name, **asdict(data.scale)},
+        'seed': data.seed,
+        'iterations': iterations,
+        'workers': workers,
+        'scenarios': scenarios,
+    }
+
+
+def write(path, results):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def compare(baseline, current, threshold_pct=25.0):
+    """
+    Returns (report lines, regressions) for two results documents.
+
+    Timings regress when they get worse by more than `threshold_pct` percent;
+    errors and queries per request are deterministic, so any increase is a
+    regression.
+    """
+    lines, regressions = [], []
+    if (baseline.get('scale'), baseline.get('database')) != (current.get('scale'), current.get('database')):
+        lines.append('warning: runs used a different scale or database; timings are not comparable')
+
+    for name, now in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            lines.append(f'{name}: new scenario')
+            continue
+        for key, higher_is_better in COMPARED:
+            old, new = before[key], now[key]
+            change = (new - old) / old * 100 if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > threshold_pct:
+                flag = '  REGRESSION'
+                regressions.append(f'{name}.{key}')
+            lines.append(f'{name:<14} {key:<16} {old:>10} -> {new:>10} ({change:+.1f}%){flag}')
+        if now['errors'] > before['errors']:
+            regressions.append(f'{name}.errors')
+            lines.append(f"{name:<14} {'errors':<16} {before['errors']:>10} -> {now['errors']:>10}  REGRESSION")
+        if now['queries_per_request'] > before['queries_per_request']:
+            regressions.append(f'{name}.queries_per_request')
+            lines.append(
+                f"{name:<14} {'queries':<16} {before['queries_per_request']:>10} -> "
+                f"{now['queries_per_request']:>10}  REGRESSION"
+            )
+    return lines, regressions
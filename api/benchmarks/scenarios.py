@@ -0,0 +1,189 @@
+# api/benchmarks/scenarios.py
+"""
+In-process load scenarios for the real endpoints.
+
+Each scenario turns (dataset, rng, call index) into one Call. A Call's `prepare` step
+(e.g. filling the cart before a checkout) runs untimed; the request itself
+goes through the full middleware, authentication and view stack with a
+token header, and is timed together with the SQL queries it runs.
+"""
+
+import random
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api import throttling
+from api.carts import cart_store
+from api.authentication import token_cache
+from api.cache import catalog_cache
+from api.models import CartItem
+
+from .base import percentile, run_parallel
+
+PRODUCTS_URL = '/api/v1/products/'
+
+
+class Call(NamedTuple):
+    method: str
+    path: str
+    data: Optional[dict] = None
+    user_id: Optional[int] = None
+    prepare: Optional[Callable[[], None]] = None
+
+
+def browse(data, rng, index):
+    return Call('get', PRODUCTS_URL, {'ordering': rng.choice(['price', '-price', 'created_date', 'stock_quantity'])})
+
+
+def search(data, rng, index):
+    return Call('get', PRODUCTS_URL, {'search': rng.choice(data.words)[:rng.choice([3, 5, 12])]})
+
+
+def filter_category(data, rng, index):
+    return Call('get', PRODUCTS_URL, {'category': rng.choice(data.category_ids), 'ordering': 'price'})
+
+
+def product_detail(data, rng, index):
+    return Call('get', f'{PRODUCTS_URL}{rng.choice(data.product_ids)}/')
+
+
+def cart_add(data, rng, index):
+    user_id = rng.choice(list(data.tokens))
+    product_id = rng.choice(data.product_ids)
+    return Call('post', '/api/v1/cart/items/', {'product_id': product_id, 'quantity': 1}, user_id)
+
+
+def cart_update(data, rng, index):
+    """Changes the quantity of one of three products each shopper keeps coming back to."""
+    user_id = rng.choice(list(data.tokens))
+    product_id = data.product_ids[(user_id * 31 + rng.randrange(3)) % len(data.product_ids)]
+    return Call('post', '/api/v1/cart/items/', {'product_id': product_id, 'quantity': rng.randint(1, 3)}, user_id)
+
+
+def checkout(data, rng, index):
+    """Places an order (OrderSerializer.create) for a cart of 1-3 products filled beforehand."""
+    user_ids = list(data.tokens)  # round-robin, so concurrent calls rarely wait on one shopper
+    user_id = user_ids[index % len(user_ids)]
+    quantities = {product_id: 1 for product_id in rng.sample(data.product_ids, rng.randint(1, 3))}
+
+    def prepare():
+        CartItem.objects.filter(user_id=user_id).delete()
+        cart_store().set_many(get_user_model()(pk=user_id), quantities)
+
+    return Call('post', '/api/v1/orders/', {}, user_id, prepare)
+
+
+def order_history(data, rng, index):
+    return Call('get', '/api/v1/orders/', None, rng.choice(list(data.tokens)))
+
+
+SCENARIOS = {
+    'browse': browse,
+    'search': search,
+    'filter': filter_category,
+    'detail': product_detail,
+    'cart_add': cart_add,
+    'cart_update': cart_update,
+    'checkout': checkout,
+    'order_history': order_history,
+}
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(name, data, iterations, workers=1, seed=0):
+    """
+    Runs `iterations` calls of scenario `name` on `workers` threads and
+    returns its figures: throughput, p50/p95/p99 latency and queries per request.
+    Calls are drawn from a seeded generator, so every run issues the same
+    requests; a tenth as many warm-up calls run first, untimed.
+    """
+    rng = random.Random(f'{seed}:{name}')
+    warmup_count = max(1, iterations // 10)
+    warmup = [SCENARIOS[name](data, rng, index) for index in range(warmup_count)]
+    calls = [SCENARIOS[name](data, rng, index) for index in range(warmup_count, warmup_count + iterations)]
+    local = threading.local()
+    # One shopper never has two requests in flight (a checkout would find its cart emptied)
+    user_locks = {user_id: threading.Lock() for user_id in data.tokens} if workers > 1 else {}
+
+    def execute(call):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = APIClient()
+        with user_locks.get(call.user_id, nullcontext()):
+            if call.prepare:
+                call.prepare()
+            if call.user_id is not None:
+                client.credentials(HTTP_AUTHORIZATION=f'Token {data.tokens[call.user_id]}')
+            else:
+                client.credentials()
+            counter = _QueryCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                response = getattr(client, call.method)(call.path, call.data, format='json')
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise AssertionError(
+                f'{call.method.upper()} {call.path} returned {response.status_code}: {response.content[:200]!r}'
+            )
+        return elapsed, counter.count
+
+    # APIClient requests come from 'testserver', all from one address and at a rate no
+    # bucket allows: throttles still decide every request, but never reject one
+    throttles = throttling._config()
+    unlimited = {scope: '1000000/s' for scope in throttles['RATES']}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                           THROTTLES={**throttles, 'RATES': unlimited}):
+        # Untimed warm-up (imports, prepared connections), then start from cold caches
+        for call in warmup:
+            try:
+                execute(call)
+            except Exception:
+                pass
+        catalog_cache.clear()
+        token_cache.clear()
+        throttling.store.clear()
+
+        started = time.perf_counter()
+        if workers > 1:
+            results = run_parallel(execute, calls, workers)
+        else:
+            # On the calling thread (and its connection/transaction)
+            results = []
+            for call in calls:
+                try:
+                    results.append((execute(call), None, None))
+                except Exception as exc:  # recorded, not raised, like run_parallel()
+                    results.append((None, exc, None))
+        wall = time.perf_counter() - started
+
+    ok = [result for result, error, _ in results if error is None]
+    errors = [error for _, error, _ in results if error is not None]
+    latencies = [elapsed * 1000 for elapsed, _ in ok]
+    return {
+        'requests': len(results),
+        'errors': len(errors),
+        'first_error': str(errors[0]) if errors else None,
+        # Request time only: untimed `prepare` steps are excluded from throughput too
+        'throughput_rps': round(len(ok) / (sum(latencies) / 1000 / workers), 1) if ok else 0.0,
+        'wall_seconds': round(wall, 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries_per_request': round(sum(queries for _, queries in ok) / len(ok), 2) if ok else 0.0,
+    }
@@ -0,0 +1,92 @@
+# api/benchmarks/servers.py
+"""
+Minimal in-process WSGI and ASGI clients: a request goes through the same
+handler, middleware and views a real server would call, without the sockets.
+"""
+
+import asyncio
+import io
+import sys
+from urllib.parse import urlencode
+
+HOST = 'testserver'
+
+
+def wsgi_get(application, path, params=None, headers=None):
+    """GET through a WSGI application; returns (status, headers, body)."""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(params or {}),
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    started = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        started['status'] = int(status.split()[0])
+        started['headers'] = response_headers
+
+    result = application(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started['status'], started['headers'], body
+
+
+async def asgi_get(application, path, params=None, headers=None):
+    """GET through an ASGI application; returns (status, headers, body)."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(params or {}).encode(),
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())] + [
+            (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()
+        ],
+        'client': ('127.0.0.1', 50000),
+        'server': (HOST, 80),
+    }
+    requested = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()  # the client stays connected until the response is sent
+        return {'type': 'http.disconnect'}
+
+    response = {'body': []}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = [(name.decode(), value.decode()) for name, value in message['headers']]
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+            if not message.get('more_body'):
+                disconnected.set()
+
+    await application(scope, receive, send)
+    return response['status'], response['headers'], b''.join(response['body'])
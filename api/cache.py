@@ -0,0 +1,223 @@
+# api/cache.py
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+# Generation counters live in the default cache; cached responses live in
+# CATALOG_CACHE['ALIAS'] so a full response cache can never evict a counter.
+CATALOG_GENERATION = 'catalog:gen'           # any catalog write (list/search pages)
+DETAIL_GENERATION = 'catalog:detail:gen'     # category writes and large bulk updates (all details)
+PRODUCT_GENERATION = 'catalog:product:{}:gen'
+
+# Above this many products a bulk update bumps DETAIL_GENERATION instead of one counter each
+BULK_BUMP_LIMIT = 500
+
+
+def _config():
+    config = {'ALIAS': 'default', 'MAX_ENTRIES': 5000, 'TIMEOUT': 300}
+    config.update(getattr(settings, 'CATALOG_CACHE', {}))
+    return config
+
+
+def _counters():
+    return caches['default']
+
+
+def _fresh_generation():
+    # Seeded from the clock so a counter that was evicted never restarts at an old value
+    return time.time_ns() // 1000
+
+
+def _incr(keys):
+    counters = _counters()
+    for key in keys:
+        try:
+            counters.incr(key)
+        except ValueError:
+            counters.add(key, _fresh_generation(), timeout=None)
+
+
+def bump(*keys):
+    """
+    Invalidates every cached response built on the given generation keys.
+
+    Bumped immediately and again once the surrounding transaction commits, so a
+    reader that cached pre-commit data in between is invalidated as well.
+    """
+    _incr(keys)
+    transaction.on_commit(lambda: _incr(keys))
+
+
+def bump_products(product_ids):
+    """Invalidates list pages and the detail pages of the given products."""
+    product_ids = list(product_ids)
+    if len(product_ids) > BULK_BUMP_LIMIT:
+        bump(CATALOG_GENERATION, DETAIL_GENERATION)
+    else:
+        bump(CATALOG_GENERATION, *[PRODUCT_GENERATION.format(pk) for pk in product_ids])
+
+
+def bump_categories():
+    """Category names are embedded in every product representation."""
+    bump(CATALOG_GENERATION, DETAIL_GENERATION)
+
+
+def generations(keys):
+    """Current value of each generation key, creating missing counters."""
+    counters = _counters()
+    values = counters.get_many(keys)
+    for key in keys:
+        if key not in values:
+            counters.add(key, _fresh_generation(), timeout=None)
+            values[key] = counters.get(key)
+    return [values[key] for key in keys]
+
+
+async def _acall(backend, method, *args, **kwargs):
+    """Local-memory caches do no I/O and are called directly; others through their async API."""
+    if isinstance(backend, LocMemCache):
+        return getattr(backend, method)(*args, **kwargs)
+    return await getattr(backend, f'a{method}')(*args, **kwargs)
+
+
+async def agenerations(keys):
+    """generations() for async views."""
+    counters = _counters()
+    values = await _acall(counters, 'get_many', keys)
+    for key in keys:
+        if key not in values:
+            await _acall(counters, 'add', key, _fresh_generation(), timeout=None)
+            values[key] = await _acall(counters, 'get', key)
+    return [values[key] for key in keys]
+
+
+class ResponseCache:
+    """
+    Caches `Response.data` for catalog GETs under generation-stamped keys.
+
+    Keys only ever change (they embed the generations), so a write makes old
+    entries unreachable instead of deleting them. A bounded in-process LRU
+    index evicts the least recently used keys from the backend, which keeps
+    the entry count capped on locmem and shared caches alike.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @property
+    def backend(self):
+        return caches[_config()['ALIAS']]
+
+    def key(self, request, generation_keys):
+        """Builds the entry key from the host, path, normalized query string and generations."""
+        return self._key(request, generations(generation_keys))
+
+    def get(self, key):
+        return self._counted(key, self.backend.get(key))
+
+    def set(self, key, data):
+        config = _config()
+        self.backend.set(key, data, timeout=config['TIMEOUT'])
+        evicted = self._indexed(key, config)
+        if evicted:
+            self.backend.delete_many(evicted)
+
+    # Async views (api/async_views.py) share the index and counters
+
+    async def akey(self, request, generation_keys):
+        return self._key(request, await agenerations(generation_keys))
+
+    async def aget(self, key):
+        return self._counted(key, await _acall(self.backend, 'get', key))
+
+    async def aset(self, key, data):
+        config = _config()
+        await _acall(self.backend, 'set', key, data, timeout=config['TIMEOUT'])
+        evicted = self._indexed(key, config)
+        if evicted:
+            await _acall(self.backend, 'delete_many', evicted)
+
+    def _key(self, request, generation_values):
+        params = sorted(
+            (name, value) for name, values in request.query_params.lists() for value in values
+        )
+        raw = repr((request.get_host(), request.path, params, generation_values))
+        return 'catalog:response:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def _counted(self, key, data):
+        with self._lock:
+            if data is None:
+                self._stats['misses'] += 1
+            else:
+                self._stats['hits'] += 1
+                self._index[key] = True
+                self._index.move_to_end(key)
+        return data
+
+    def _indexed(self, key, config):
+        """Records a stored key; returns the least recently used keys to evict."""
+        evicted = []
+        with self._lock:
+            self._index[key] = True
+            self._index.move_to_end(key)
+            while len(self._index) > config['MAX_ENTRIES']:
+                evicted.append(self._index.popitem(last=False)[0])
+            self._stats['evictions'] += len(evicted)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._index))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+            self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.backend.delete_many(keys)
+
+
+catalog_cache = ResponseCache()
+
+
+class CatalogCacheMixin:
+    """
+    ViewSet mixin that serves `list` and `retrieve` from `catalog_cache`.
+
+    Only successful GET responses are stored. The `X-Cache` header tells
+    clients (and load tests) whether a response was a HIT or a MISS.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, [CATALOG_GENERATION], super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        keys = [DETAIL_GENERATION, PRODUCT_GENERATION.format(lookup)]
+        return self._cached(request, keys, super().retrieve, *args, **kwargs)
+
+    def _cached(self, request, generation_keys, handler, *args, **kwargs):
+        key = catalog_cache.key(request, generation_keys)
+        data = catalog_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            catalog_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
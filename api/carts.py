@@ -0,0 +1,237 @@
+# api/carts.py
+"""
+Cart storage backends, chosen by settings.CART_STORE['BACKEND'].
+
+DatabaseCartStore, the default, writes every cart change to CartItem as it
+happens (api/reservations.py).
+
+CacheCartStore keeps quantity changes to lines already in the cart in a
+Django cache (CART_STORE['ALIAS']) and writes them back to CartItem in one
+go (reservations.write_back):
+  - once WRITE_BACK_CHANGES changes are pending or the oldest is
+    WRITE_BACK_SECONDS old (checked on the next change),
+  - before the cart is read (list, batch), and
+  - inside the checkout transaction.
+Most carts are abandoned, so most of those writes never happen. Adding a
+product and removing a line still go to CartItem at once: an evicted or
+expired entry is reloaded from CartItem without losing an item, only
+quantity changes not yet written back revert.
+
+Pending increases are checked against unreserved stock and the line's live
+hold in CartItem (a lapsed hold counts as none), but not held (a hold is a
+shared counter, see api/reservations.py): checkout takes them from unreserved
+stock, like a lapsed hold. Pending decreases give their held units
+back when written back, or when the hold expires. Each read-modify-write of
+an entry holds a per-user lock (cache.add, expiring after LOCK_SECONDS), so
+two tabs changing one cart never lose a pending quantity. Every process must
+see the same entries and locks, so use a shared cache (e.g. Redis) once there
+is more than one.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+from . import checkout, reservations
+from .models import CartItem
+
+
+def _config():
+    config = {
+        'BACKEND': 'api.carts.DatabaseCartStore',
+        'ALIAS': 'default',
+        'TIMEOUT': 24 * 60 * 60,
+        'WRITE_BACK_CHANGES': 20,
+        'WRITE_BACK_SECONDS': 60,
+        'LOCK_SECONDS': 5,
+    }
+    config.update(getattr(settings, 'CART_STORE', {}))
+    return config
+
+
+def cart_store():
+    """The configured cart store."""
+    config = _config()
+    return import_string(config['BACKEND'])(config)
+
+
+class DatabaseCartStore:
+    """Writes every change to CartItem as it happens."""
+
+    def __init__(self, config):
+        self.config = config
+
+    def set_quantity(self, user, product_id, quantity):
+        """Adds or updates one line; returns (cart_item, created)."""
+        return reservations.hold(user, product_id, quantity)
+
+    def set_many(self, user, quantities):
+        """Sets many lines from a {product_id: quantity} map; quantity 0 removes the line."""
+        reservations.hold_many(user, quantities)
+
+    @transaction.atomic
+    def remove(self, cart_item):
+        # Give the held units back to other shoppers before removing the line
+        reservations.release(cart_item)
+        cart_item.delete()
+
+    def flush(self, user):
+        """Writes pending changes to CartItem; nothing is ever pending here."""
+
+    def checkout(self, user):
+        """Places an order for the user's cart (api/checkout.py)."""
+        return checkout.place_order(user)
+
+
+class CacheCartStore(DatabaseCartStore):
+    """
+    Buffers quantity changes of existing lines in a cache entry per user:
+    {'lines': {product_id: [cart_item_id, quantity, held_quantity]},
+     'pending': {product_id: quantity}, 'changes': <pending change count>,
+     'since': <time of the oldest pending change>}.
+    """
+
+    key = 'cart:{}'
+    lock_key = 'cart-lock:{}'
+
+    @property
+    def cache(self):
+        return caches[self.config['ALIAS']]
+
+    def _get(self, user_id):
+        return self.cache.get(self.key.format(user_id))
+
+    def _set(self, user_id, entry):
+        self.cache.set(self.key.format(user_id), entry, self.config['TIMEOUT'])
+
+    def _drop(self, user_id):
+        transaction.on_commit(lambda: self.cache.delete(self.key.format(user_id)))
+
+    @contextmanager
+    def _locked(self, user_id):
+        """
+        Holds the user's entry lock. A holder that died keeps it at most
+        LOCK_SECONDS; the token keeps a late release from freeing a successor's lock.
+        """
+        key, token = self.lock_key.format(user_id), uuid.uuid4().hex
+        while not self.cache.add(key, token, self.config['LOCK_SECONDS']):
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def _load(self, user):
+        entry = self._get(user.pk)
+        if entry is None:
+            # First use, or evicted: CartItem has every line
+            rows = CartItem.objects.filter(user=user).values_list('product_id', 'id', 'quantity', 'held_quantity')
+            entry = {'lines': {row[0]: list(row[1:]) for row in rows}, 'pending': {}, 'changes': 0, 'since': None}
+            self._set(user.pk, entry)
+        return entry
+
+    def _on_commit(self, user_id, change):
+        """Applies `change` to the cached entry (if any) once the database write commits."""
+        def apply():
+            with self._locked(user_id):
+                entry = self._get(user_id)
+                if entry is not None:
+                    change(entry)
+                    self._set(user_id, entry)
+        transaction.on_commit(apply)
+
+    def set_quantity(self, user, product_id, quantity):
+        with self._locked(user.pk):
+            entry = self._load(user)
+            line = entry['lines'].get(product_id)
+            cart_item = None
+            if line is not None:
+                # The live hold: the cached one may have lapsed or been released since
+                cart_item = CartItem.objects.select_related('product').only(
+                    'id', 'held_quantity', 'hold_expires_at', 'product__id', 'product__name', 'product__price',
+                    'product__image_url', 'product__stock_quantity', 'product__reserved_quantity',
+                ).filter(pk=line[0]).first()
+            if cart_item is not None:
+                product = cart_item.product
+                held_quantity = cart_item.held_quantity
+                if cart_item.hold_expires_at is None or cart_item.hold_expires_at <= timezone.now():
+                    held_quantity = 0
+                if quantity - held_quantity > product.available_quantity:
+                    raise serializers.ValidationError(
+                        f"Only {max(product.available_quantity, 0)} units of {product.name} are available."
+                    )
+                line[1], line[2] = quantity, cart_item.held_quantity
+                entry['pending'][product_id] = quantity
+                entry['changes'] += 1
+                entry['since'] = entry['since'] or time.time()
+                self._set(user.pk, entry)
+            elif line is not None:
+                # Removed outside the store (e.g. in the admin): add it again below
+                entry['lines'].pop(product_id)
+                entry['pending'].pop(product_id, None)
+                self._set(user.pk, entry)
+
+        if cart_item is None:
+            cart_item, created = super().set_quantity(user, product_id, quantity)
+            self._on_commit(user.pk, lambda entry: entry['lines'].update(
+                {product_id: [cart_item.pk, quantity, quantity]}
+            ))
+            return cart_item, created
+
+        if (entry['changes'] >= self.config['WRITE_BACK_CHANGES']
+                or time.time() - entry['since'] >= self.config['WRITE_BACK_SECONDS']):
+            self.flush(user)
+        cart_item.user, cart_item.quantity = user, quantity
+        return cart_item, False
+
+    @transaction.atomic
+    def set_many(self, user, quantities):
+        self.flush(user)
+        super().set_many(user, quantities)
+        # hold_many rewrote the lines; reload them on the next change
+        self._drop(user.pk)
+
+    @transaction.atomic
+    def remove(self, cart_item):
+        super().remove(cart_item)
+
+        def forget(entry):
+            entry['lines'].pop(cart_item.product_id, None)
+            entry['pending'].pop(cart_item.product_id, None)
+        self._on_commit(cart_item.user_id, forget)
+
+    def flush(self, user):
+        entry = self._get(user.pk)
+        if not entry or not entry['pending']:
+            return
+        pending = dict(entry['pending'])
+        written = reservations.write_back(user, pending)
+
+        def written_back(entry):
+            for product_id, quantity in pending.items():
+                if product_id not in written:
+                    # Removed outside the store (e.g. in the admin)
+                    entry['lines'].pop(product_id, None)
+                    entry['pending'].pop(product_id, None)
+                elif entry['pending'].get(product_id) == quantity:
+                    del entry['pending'][product_id]
+                    line = entry['lines'][product_id]
+                    line[2] = min(line[2], quantity)
+            if not entry['pending']:
+                entry['changes'], entry['since'] = 0, None
+        self._on_commit(user.pk, written_back)
+
+    @transaction.atomic
+    def checkout(self, user):
+        self.flush(user)
+        order = super().checkout(user)
+        self._drop(user.pk)
+        return order
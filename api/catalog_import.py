@@ -0,0 +1,144 @@
+# api/catalog_import.py
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+
+from .cache import bump_products
+from .models import Category, Product
+
+# Columns (CSV header / JSONL keys) understood by the importer
+IMPORT_FIELDS = ['sku', 'name', 'description', 'price', 'stock_quantity', 'image_url', 'category']
+UPDATE_FIELDS = ['name', 'description', 'price', 'stock_quantity', 'image_url', 'category', 'version', 'updated_at']
+
+_validate_url = URLValidator()
+
+
+# --- Reading & validation (no database access; safe to run in worker processes) ---
+
+def read_records(path, file_format):
+    """Yields (line_number, raw_record) without loading the whole file."""
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            reader = csv.DictReader(handle)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(handle, start=1):
+                if line.strip():
+                    yield line_number, line
+
+
+def _text(record, field, max_length, required=True):
+    value = (record.get(field) or '').strip()
+    if required and not value:
+        raise ValueError(f"'{field}' is required")
+    if len(value) > max_length:
+        raise ValueError(f"'{field}' is longer than {max_length} characters")
+    return value
+
+
+def clean_record(record):
+    """Validates one raw record and returns the values to store; raises ValueError."""
+    try:
+        price = Decimal(str(record.get('price', '')).strip())
+    except InvalidOperation:
+        raise ValueError("'price' is not a number")
+    if not price.is_finite() or price < 0 or price.as_tuple().exponent < -2 or price >= Decimal('1e8'):
+        raise ValueError("'price' must be between 0 and 99999999.99 with at most 2 decimals")
+
+    stock = str(record.get('stock_quantity') or '0').strip()
+    if not stock.isdigit():
+        raise ValueError("'stock_quantity' must be a non-negative integer")
+
+    image_url = (record.get('image_url') or '').strip() or None
+    if image_url:
+        try:
+            _validate_url(image_url)
+        except ValidationError:
+            raise ValueError("'image_url' is not a valid URL")
+
+    return {
+        'sku': _text(record, 'sku', 64),
+        'name': _text(record, 'name', 255),
+        'description': (record.get('description') or '').strip(),
+        'price': price,
+        'stock_quantity': int(stock),
+        'image_url': image_url,
+        'category': _text(record, 'category', 100),
+    }
+
+
+def clean_chunk(chunk, file_format):
+    """Validates a list of (line_number, raw_record); returns (rows, errors)."""
+    rows, errors = [], []
+    for line_number, record in chunk:
+        try:
+            if file_format == 'jsonl':
+                record = json.loads(record)
+                if not isinstance(record, dict):
+                    raise ValueError("line is not a JSON object")
+            rows.append(clean_record(record))
+        except ValueError as exc:  # json.JSONDecodeError is a ValueError too
+            errors.append((line_number, str(exc)))
+    return rows, errors
+
+
+# --- Writing ----------------------------------------------------------------
+
+class CatalogWriter:
+    """
+    Upserts validated rows keyed on Product.sku, one batch per transaction.
+
+    Category names resolve through an in-memory name -> id map; unknown names
+    are created in bulk. Each batch costs one SKU lookup (to count creates vs
+    updates and bump row versions) and one upserting bulk_create, regardless
+    of how many rows it holds. A SKU repeated within a batch is written once
+    (its last row wins); the earlier rows count as `merged`, so created +
+    updated + merged is the number of rows written.
+    """
+
+    def __init__(self):
+        self.category_ids = dict(Category.objects.values_list('name', 'id'))
+        self.created = 0
+        self.updated = 0
+        self.merged = 0
+
+    def _resolve_categories(self, names):
+        missing = sorted(set(names) - set(self.category_ids))
+        if missing:
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            self.category_ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    @transaction.atomic
+    def write(self, rows):
+        # Last occurrence of a SKU in the batch wins
+        unique = list({row['sku']: row for row in rows}.values())
+        self.merged += len(rows) - len(unique)
+        rows = unique
+        self._resolve_categories(row['category'] for row in rows)
+        existing = {
+            sku: (pk, version)
+            for sku, pk, version in Product.objects.filter(sku__in=[row['sku'] for row in rows])
+            .order_by()
+            .values_list('sku', 'id', 'version')
+        }
+
+        products = []
+        for row in rows:
+            values = {field: value for field, value in row.items() if field != 'category'}
+            version = existing[row['sku']][1] + 1 if row['sku'] in existing else 1
+            products.append(Product(category_id=self.category_ids[row['category']], version=version, **values))
+
+        # One INSERT .. ON CONFLICT (sku) DO UPDATE for new and known SKUs alike
+        products = Product.objects.bulk_create(
+            products, update_conflicts=True, unique_fields=['sku'], update_fields=UPDATE_FIELDS,
+        )
+        bump_products([pk for pk, _ in existing.values()] + [p.pk for p in products if p.pk])
+
+        self.updated += len(existing)
+        self.created += len(rows) - len(existing)
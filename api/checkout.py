@@ -0,0 +1,91 @@
+# api/checkout.py
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, IntegerField, Sum, When
+from django.db.models.functions import Now
+from rest_framework import serializers
+
+from .cache import bump_products
+from .models import CartItem, Order, OrderItem, Product
+
+
+def _quantity_case(quantities):
+    """Builds `CASE id WHEN <pk> THEN <qty> ... END` for a {product_id: quantity} map."""
+    return Case(
+        *[When(pk=product_id, then=quantity) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def cart_total(user):
+    """Sums quantity * price for the user's cart inside the database."""
+    line_total = ExpressionWrapper(
+        F('quantity') * F('product__price'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    return CartItem.objects.filter(user=user).aggregate(total=Sum(line_total))['total']
+
+
+@transaction.atomic
+def place_order(user):
+    """
+    Converts the user's cart into an Order.
+
+    Product rows are locked in primary-key order so two checkouts touching the
+    same products always queue up instead of deadlocking. Stock is then
+    decremented by one conditional UPDATE for the whole order. Lines that still
+    hold a reservation (api/reservations.py) are converted without needing any
+    unreserved stock; lines whose hold was released must fit in what is left.
+    If any row fails its guard the transaction is rolled back.
+    """
+    # 1. Collect the cart lines: requested units and units still held per product
+    rows = CartItem.objects.filter(user=user).order_by('product_id').values_list(
+        'product_id', 'quantity', 'held_quantity'
+    )
+    quantities = {product_id: quantity for product_id, quantity, _ in rows}
+    if not quantities:
+        raise serializers.ValidationError("Cannot place an order with an empty cart.")
+    held = {product_id: held_quantity for product_id, _, held_quantity in rows}
+    unheld = {product_id: quantities[product_id] - held[product_id] for product_id in quantities}
+
+    # 2. Lock the affected products in a deterministic order
+    products = list(
+        Product.objects.select_for_update()
+        .filter(pk__in=quantities)
+        .order_by('pk')
+        .only('id', 'name', 'price', 'stock_quantity', 'reserved_quantity')
+    )
+
+    # 3. Convert holds into stock decrements for every line in one set-based statement
+    updated = Product.objects.filter(
+        pk__in=quantities, stock_quantity__gte=F('reserved_quantity') + _quantity_case(unheld)
+    ).update(
+        stock_quantity=F('stock_quantity') - _quantity_case(quantities),
+        reserved_quantity=F('reserved_quantity') - _quantity_case(held),
+        version=F('version') + 1,
+        updated_at=Now(),
+    )
+    if updated != len(quantities):
+        for product in products:
+            if unheld[product.pk] > product.available_quantity:
+                raise serializers.ValidationError(f"Insufficient stock for {product.name}.")
+        raise serializers.ValidationError("Insufficient stock for one or more products.")
+    bump_products(quantities)
+
+    # 4. Create the Order with a database-computed total and snapshot its items
+    order = Order.objects.create(user=user, total_amount=cart_total(user))
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=product,
+            name=product.name,
+            quantity=quantities[product.pk],
+            price_at_purchase=product.price,
+        )
+        for product in products
+    ])
+
+    # 5. Clear the Cart
+    CartItem.objects.filter(user=user).delete()
+
+    return order
@@ -0,0 +1,103 @@
+# api/conditional.py
+
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def _etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def _detail_etag(model, pk, selection, row):
+    """A retrieve ETag: the row's validators, for one sparse fieldset (None: the full representation)."""
+    return _etag(model._meta.label, pk, sorted(selection) if selection is not None else None, *row)
+
+
+def _timestamp(values):
+    moments = [value for value in values if value is not None]
+    return int(max(moments).timestamp()) if moments else None
+
+
+def _not_modified(request, etag, last_modified):
+    """Returns a 304 (or 412) response when the client's validators still match, else None."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        _set_validators(response, etag, last_modified)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+
+
+class ConditionalRetrieveMixin:
+    """
+    Honours If-None-Match / If-Modified-Since on `retrieve`.
+
+    The validators come from `validator_fields` (row version and update times,
+    see VersionedModel) fetched with one narrow query before the object is
+    loaded or serialized. Include the columns of every related row that shows
+    up in the representation. A sparse fieldset (`?fields=`/`?expand=`, see
+    SparseFieldsetMixin) is part of the ETag: each one is a different representation.
+    """
+    validator_fields = ('version', 'updated_at')
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .values_list(*self.validator_fields)
+            .first()
+        )
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)  # the usual 404
+
+        selection = self.sparse_selection() if hasattr(self, 'sparse_selection') else None
+        etag = _detail_etag(self.get_queryset().model, self.kwargs[lookup_url_kwarg], selection, row)
+        last_modified = _timestamp(value for value in row if hasattr(value, 'timestamp'))
+        not_modified = _not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200:
+            _set_validators(response, etag, last_modified)
+        return response
+
+
+class ConditionalListMixin:
+    """
+    Honours If-None-Match on `list` using one aggregate query over the filtered
+    collection (`list_validator_aggregates`) plus the query string, so any added,
+    removed or changed row (or related row) yields a new ETag.
+
+    No Last-Modified is sent: a deleted row leaves no timestamp behind. The
+    aggregate row is kept on `self.list_aggregates`, so views can piggyback
+    other collection-wide figures on the same query.
+    """
+    list_validator_aggregates = {
+        'rows': Count('pk'),
+        'last_id': Max('pk'),
+        'versions': Sum('version'),
+        'updated': Max('updated_at'),
+    }
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        self.list_aggregates = queryset.aggregate(**self.list_validator_aggregates)
+        params = sorted(request.query_params.lists())
+        etag = _etag(self.get_queryset().model._meta.label, params, sorted(self.list_aggregates.items()))
+        not_modified = _not_modified(request, etag, None)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            _set_validators(response, etag, None)
+        return response
@@ -0,0 +1,120 @@
+# api/exports.py
+
+import csv
+from itertools import groupby, islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import Order, OrderItem, Product
+
+CHUNK_SIZE = 2000
+
+PRODUCT_FIELDS = [
+    'id', 'name', 'description', 'price', 'stock_quantity', 'image_url', 'created_date', 'category_id',
+    'category__name',
+]
+ORDER_FIELDS = ['id', 'user_id', 'total_amount', 'status', 'created_at']
+ORDER_ITEM_FIELDS = ['id', 'product_id', 'name', 'quantity', 'price_at_purchase']
+
+
+def _watermarked(queryset, date_field, since=None, after_id=None):
+    """Delta exports: rows created at/after `since` and/or with an id above `after_id`, in id order."""
+    if since is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    return queryset.order_by('id')
+
+
+def iter_products(since=None, after_id=None, chunk_size=CHUNK_SIZE):
+    """Yields one dict per product, reading `chunk_size` rows at a time."""
+    queryset = _watermarked(Product.objects.all(), 'created_date', since, after_id)
+    for row in queryset.values(*PRODUCT_FIELDS).iterator(chunk_size=chunk_size):
+        row['category_name'] = row.pop('category__name')
+        yield row
+
+
+def iter_orders(since=None, after_id=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields one dict per order with its `items` nested.
+
+    Orders are read `chunk_size` at a time and each chunk's OrderItems are
+    fetched with a single IN query, so memory is bounded by the chunk size.
+    """
+    queryset = _watermarked(Order.objects.all(), 'created_at', since, after_id)
+    orders = queryset.values(*ORDER_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(orders, chunk_size))
+        if not chunk:
+            return
+        items = (
+            OrderItem.objects.filter(order_id__in=[order['id'] for order in chunk])
+            .order_by('order_id', 'id')
+            .values('order_id', *ORDER_ITEM_FIELDS)
+        )
+        items_by_order = {
+            order_id: [{field: item[field] for field in ORDER_ITEM_FIELDS} for item in group]
+            for order_id, group in groupby(items, key=lambda item: item['order_id'])
+        }
+        for order in chunk:
+            order['items'] = items_by_order.get(order['id'], [])
+            yield order
+
+
+# --- Encoders -----------------------------------------------------------------
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, header):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([row.get(column) for column in header])
+
+
+def flatten_orders(orders):
+    """One CSV row per order item (orders without items still get one row)."""
+    for order in orders:
+        items = order.pop('items') or [{}]
+        for item in items:
+            yield {**order, **{f'item_{key}': value for key, value in item.items()}}
+
+
+PRODUCT_CSV_HEADER = [
+    'id', 'name', 'description', 'price', 'stock_quantity', 'image_url', 'created_date', 'category_id',
+    'category_name',
+]
+ORDER_CSV_HEADER = ORDER_FIELDS + [f'item_{field}' for field in ORDER_ITEM_FIELDS]
+
+EXPORTS = {
+    'products': (iter_products, PRODUCT_CSV_HEADER, lambda rows: rows),
+    'orders': (iter_orders, ORDER_CSV_HEADER, flatten_orders),
+}
+
+
+def export_lines(dataset, output='ndjson', since=None, after_id=None, chunk_size=CHUNK_SIZE):
+    """Text lines of a full or delta export of `dataset` ('products' or 'orders')."""
+    iterate, header, flatten = EXPORTS[dataset]
+    rows = iterate(since=since, after_id=after_id, chunk_size=chunk_size)
+    if output == 'csv':
+        return csv_lines(flatten(rows), header)
+    return ndjson_lines(rows)
+
+
+def streaming_export(dataset, output='ndjson', **filters):
+    """StreamingHttpResponse for an export; the body is produced while it is sent."""
+    content_type = 'text/csv' if output == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_lines(dataset, output, **filters), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{output}"'
+    return response
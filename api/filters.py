@@ -0,0 +1,127 @@
+# api/filters.py
+"""
+Product filtering (`ProductFilter`) and the facet counts of the storefront
+sidebar (`facet_counts`).
+
+Facets are disjunctive: each facet is counted as if its own filter were not
+applied (the category counts ignore `?category=`, and so on), so a shopper sees
+what selecting another value would give. All three are derived from one grouped
+query over the search results and the non-facet filters, grouped by category,
+price bucket and stock state, with the in-price-range rows counted alongside.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, Count, IntegerField, Q, Value, When
+from django_filters import rest_framework as filters
+
+from .models import Category, Product
+
+CENT = Decimal('0.01')
+
+# Filters with a facet; the grouped query is built without them
+FACET_FILTERS = ('category', 'price', 'in_stock')
+
+
+def _config():
+    # Bucket edges as in the admin's PriceBandFilter (api/admin_tools.py)
+    config = {'PRICE_BUCKETS': [10, 100, 1000, 10000]}
+    config.update(getattr(settings, 'CATALOG_FACETS', {}))
+    return config
+
+
+class ProductFilter(filters.FilterSet):
+    """
+    `?category=<id>` (repeat it for any of several categories), `?price_min=` /
+    `?price_max=` (inclusive), `?in_stock=true|false` and `?stock_quantity=<n>`.
+    """
+    category = filters.ModelMultipleChoiceFilter(queryset=Category.objects.all(), distinct=False)
+    price = filters.RangeFilter()
+    in_stock = filters.BooleanFilter(method='filter_in_stock')
+
+    class Meta:
+        model = Product
+        fields = ['category', 'price', 'in_stock', 'stock_quantity']
+
+    def filter_in_stock(self, queryset, name, value):
+        return queryset.filter(stock_quantity__gt=0) if value else queryset.filter(stock_quantity__lte=0)
+
+    def filter_queryset_without(self, queryset, names):
+        """filter_queryset() skipping the filters in `names`."""
+        for name, value in self.form.cleaned_data.items():
+            if name not in names:
+                queryset = self.filters[name].filter(queryset, value)
+        return queryset
+
+
+def price_buckets():
+    """(min, max) of each price bucket, both inclusive; the last one has no max."""
+    edges = [Decimal(edge) for edge in _config()['PRICE_BUCKETS']]
+    lows = [Decimal('0.00'), *edges]
+    return [(low, high - CENT if high is not None else None) for low, high in zip(lows, [*edges, None])]
+
+
+def _bucket():
+    buckets = price_buckets()
+    whens = [When(price__lte=high, then=Value(index)) for index, (_, high) in enumerate(buckets[:-1])]
+    return Case(*whens, default=Value(len(buckets) - 1), output_field=IntegerField())
+
+
+def _in_range(price):
+    """The `?price_min=`/`?price_max=` condition as a Q (empty when neither is given)."""
+    condition = Q()
+    if price and price.start is not None:
+        condition &= Q(price__gte=price.start)
+    if price and price.stop is not None:
+        condition &= Q(price__lte=price.stop)
+    return condition
+
+
+def facet_counts(queryset, selected):
+    """
+    Category, price bucket and stock facets of a product queryset that is
+    filtered by everything but the facet filters; `selected` is a valid
+    ProductFilter's cleaned_data. `count` is the number of matching products.
+    """
+    categories = {category.pk for category in selected.get('category') or ()}
+    in_stock = selected.get('in_stock')
+
+    # 1. One grouped query: (category, price bucket, in stock) -> all rows, rows in the price range
+    stocked = Case(When(stock_quantity__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField())
+    groups = list(
+        queryset.order_by()
+        .annotate(facet_bucket=_bucket(), facet_stocked=stocked)
+        .values('category_id', 'category__name', 'facet_bucket', 'facet_stocked')
+        .annotate(total=Count('pk'), in_range=Count('pk', filter=_in_range(selected.get('price'))))
+    )
+
+    # 2. Each facet adds up the groups that pass the other facets' filters
+    def passes(group, *facets):
+        return (
+            ('category' not in facets or not categories or group['category_id'] in categories)
+            and ('in_stock' not in facets or in_stock is None or group['facet_stocked'] == in_stock)
+        )
+
+    by_category, by_bucket, by_stock, count = {}, {}, {True: 0, False: 0}, 0
+    for group in groups:
+        if passes(group, 'in_stock'):
+            name = (group['category__name'], group['category_id'])
+            by_category[name] = by_category.get(name, 0) + group['in_range']
+        if passes(group, 'category', 'in_stock'):
+            by_bucket[group['facet_bucket']] = by_bucket.get(group['facet_bucket'], 0) + group['total']
+            count += group['in_range']
+        if passes(group, 'category'):
+            by_stock[group['facet_stocked']] += group['in_range']
+
+    return {
+        'count': count,
+        'category': [
+            {'id': pk, 'name': name, 'count': total} for (name, pk), total in sorted(by_category.items())
+        ],
+        'price': [
+            {'min': f'{low:.2f}', 'max': f'{high:.2f}' if high is not None else None, 'count': by_bucket.get(index, 0)}
+            for index, (low, high) in enumerate(price_buckets())
+        ],
+        'in_stock': [{'value': value, 'count': by_stock[value]} for value in (True, False)],
+    }
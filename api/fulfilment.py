@@ -0,0 +1,107 @@
+# api/fulfilment.py
+"""
+Order status transitions.
+
+Orders move PENDING -> PROCESSING -> SHIPPED -> DELIVERED and may be
+cancelled until they ship. transition() applies one move to any number of
+orders, set-based, CHUNK_SIZE orders per round of statements:
+  1. lock the orders and read their current status,
+  2. one UPDATE of every order the move is allowed from,
+  3. the audit rows (OrderStatusChange) with bulk_create,
+  4. when cancelling, the units of the cancelled orders' OrderItem rows go
+     back to stock with one CASE update over their products.
+Orders in a status the move is not allowed from (or that do not exist) are
+left alone and reported. Queryset.update() fires no signals, so the sales
+rollups (api/analytics.py) and the catalog cache are updated here.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from . import analytics
+from .cache import bump_products
+from .models import Order, OrderItem, OrderStatusChange, Product
+
+# Allowed moves: status -> the statuses it may move to
+TRANSITIONS = {
+    'PENDING': ('PROCESSING', 'CANCELLED'),
+    'PROCESSING': ('SHIPPED', 'CANCELLED'),
+    'SHIPPED': ('DELIVERED',),
+    'DELIVERED': (),
+    'CANCELLED': (),
+}
+
+CHUNK_SIZE = 5000
+
+
+def allowed_from(status):
+    """The statuses an order may move to `status` from."""
+    return [source for source, targets in TRANSITIONS.items() if status in targets]
+
+
+def transition(order_ids, status, user=None, chunk_size=CHUNK_SIZE):
+    """
+    Moves the given orders to `status` where TRANSITIONS allows it, in one
+    transaction. Returns {'updated': <count>, 'rejected': [{'id', 'status'}]}
+    where a rejected order's status is None if it does not exist.
+    """
+    if status not in TRANSITIONS:
+        raise ValueError(f"Unknown order status {status!r}.")
+    sources = allowed_from(status)
+    order_ids = list(dict.fromkeys(order_ids))
+    updated, rejected = 0, []
+
+    with transaction.atomic():
+        for start in range(0, len(order_ids), chunk_size):
+            chunk = order_ids[start:start + chunk_size]
+            # 1. Lock the orders in id order, so concurrent calls queue up instead of deadlocking
+            current = dict(
+                Order.objects.select_for_update().filter(pk__in=chunk).order_by('pk').values_list('pk', 'status')
+            )
+            moving = [pk for pk in chunk if current.get(pk) in sources]
+            rejected.extend({'id': pk, 'status': current.get(pk)} for pk in chunk if current.get(pk) not in sources)
+            if not moving:
+                continue
+
+            # 2. Move them
+            Order.objects.filter(pk__in=moving).update(
+                status=status, version=F('version') + 1, updated_at=Now(),
+            )
+            updated += len(moving)
+
+            # 3. Audit log
+            now = timezone.now()
+            OrderStatusChange.objects.bulk_create([
+                OrderStatusChange(order_id=pk, from_status=current[pk], to_status=status, changed_by=user,
+                                  changed_at=now)
+                for pk in moving
+            ], batch_size=1000)
+
+            # 4. Cancelling: restock, and take the orders out of the sales rollups
+            if status == 'CANCELLED':
+                restock(moving)
+                counted = [pk for pk in moving if analytics.is_counted(current[pk])]
+                if counted:
+                    analytics.record_orders(counted, -1)
+
+    return {'updated': updated, 'rejected': rejected}
+
+
+def restock(order_ids):
+    """Puts the units of the orders' items back into stock: one aggregate query, one CASE update."""
+    units = dict(
+        OrderItem.objects.filter(order_id__in=order_ids).order_by().values('product_id')
+        .annotate(units=Sum('quantity')).values_list('product_id', 'units')
+    )
+    if not units:
+        return
+    Product.objects.filter(pk__in=units).update(
+        stock_quantity=F('stock_quantity') + Case(
+            *[When(pk=pk, then=count) for pk, count in units.items()], output_field=IntegerField()
+        ),
+        version=F('version') + 1,
+        updated_at=Now(),
+    )
+    bump_products(units)
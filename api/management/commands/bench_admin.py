@@ -0,0 +1,119 @@
+# api/management/commands/bench_admin.py
+
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from api.admin import ProductAdmin
+from api.benchmarks import scratch_database
+from api.models import Category, Product
+
+WORDS = ['oak', 'steel', 'linen', 'cotton', 'walnut', 'copper', 'glass', 'wool', 'cedar', 'slate',
+         'desk', 'lamp', 'chair', 'shelf', 'rug', 'mug', 'vase', 'stool', 'bench', 'frame']
+
+
+class LegacyProductAdmin(admin.ModelAdmin):
+    """The changelist configuration ProductAdmin had before the large-table settings."""
+    list_display = ProductAdmin.list_display
+    list_filter = ('category', 'created_date', 'stock_quantity', 'price')
+    search_fields = ('name', 'description')
+
+
+# (label, legacy query string, current query string)
+CASES = [
+    ('first page', {}, {}),
+    ('middle page', {'p': None}, {'p': None}),  # filled in from --rows
+    ('low stock', {'stock_quantity__exact': '5'}, {'stock_level': 'low'}),
+    ('price band', {'price__exact': '42.00'}, {'price_band': '10-100'}),
+    ('search', {'q': 'walnut'}, {'q': 'walnut'}),
+]
+
+
+class Command(BaseCommand):
+    help = "Measures Product changelist render time in the admin, legacy vs current configuration."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Products in the scratch catalog.")
+        parser.add_argument('--repeat', type=int, default=5, help="Renders per case (median is reported).")
+        parser.add_argument('--action-size', type=int, default=1000, help="Products selected for the stock action.")
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._run(options)
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"Loading {options['rows']} products...")
+        self._load(options['rows'], rng)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')  # planner statistics, as a production database would have
+
+        superuser = get_user_model().objects.create_superuser('bench', 'bench@example.com', 'bench')
+        factory = RequestFactory()
+        admins = [('legacy', LegacyProductAdmin(Product, admin.site)), ('current', ProductAdmin(Product, admin.site))]
+
+        self.stdout.write(f"{'case':<12} {'admin':>8} {'median ms':>10} {'queries':>8}")
+        middle = str(options['rows'] // ProductAdmin.list_per_page // 2)
+        for label, *params in CASES:
+            for (name, model_admin), query in zip(admins, params):
+                query = {key: value or middle for key, value in query.items()}
+                def render():
+                    request = factory.get('/admin/api/product/', query)
+                    request.user = superuser
+                    return model_admin.changelist_view(request).render()
+
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                with CaptureQueriesContext(connection) as captured:
+                    render()
+                self.stdout.write(
+                    f"{label:<12} {name:>8} {statistics.median(timings):>10.1f} {len(captured.captured_queries):>8}"
+                )
+
+        self._bench_action(options['action_size'], factory, superuser)
+
+    def _bench_action(self, size, factory, superuser):
+        request = factory.post('/admin/api/product/')
+        request.user = superuser
+        selected = Product.objects.filter(pk__in=Product.objects.order_by('pk').values('pk')[:size])
+
+        started = time.perf_counter()
+        for product in selected:  # the former per-row decrease_stock
+            product.stock_quantity = max(product.stock_quantity - 10, 0)
+            product.save()
+        legacy = time.perf_counter() - started
+
+        model_admin = ProductAdmin(Product, admin.site)
+        model_admin.message_user = lambda *args, **kwargs: None
+        started = time.perf_counter()
+        model_admin.decrease_stock(request, selected)
+        current = time.perf_counter() - started
+        self.stdout.write(
+            f"decrease_stock on {size} products: legacy {legacy * 1000:.0f} ms, current {current * 1000:.0f} ms"
+        )
+
+    def _load(self, rows, rng, batch_size=10_000):
+        categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(100)])
+        for start in range(0, rows, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    category=rng.choice(categories),
+                    name=' '.join(rng.sample(WORDS, 3)).title(),
+                    description=' '.join(rng.choices(WORDS, k=12)),
+                    price=Decimal(rng.randint(100, 500000)) / 100,
+                    stock_quantity=rng.randint(0, 200),
+                )
+                for _ in range(start, min(rows, start + batch_size))
+            ])
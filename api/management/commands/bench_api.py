@@ -0,0 +1,63 @@
+# api/management/commands/bench_api.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import results, scratch_database
+from api.benchmarks.data import SCALES, generate
+from api.benchmarks.scenarios import SCENARIOS, run_scenario
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a deterministic dataset in a scratch database, runs the API scenarios "
+        "in process and reports throughput, p50/p95/p99 and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--iterations', type=int, default=200, help="Requests per scenario.")
+        parser.add_argument('--workers', type=int, default=1, help="Threads issuing requests.")
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', metavar='BASELINE', help="Compare against an earlier results file.")
+        parser.add_argument('--threshold', type=float, default=25.0,
+                            help="Percent slowdown reported as a regression (default 25; "
+                                 "identical runs on a busy laptop differ by ~15%%).")
+
+    def handle(self, *args, **options):
+        baseline = results.load(options['compare']) if options['compare'] else None
+
+        with scratch_database():
+            started = time.perf_counter()
+            data = generate(SCALES[options['scale']], seed=options['seed'])
+            self.stderr.write(f"Generated '{options['scale']}' dataset in {time.perf_counter() - started:.1f}s")
+
+            figures = {}
+            self.stdout.write(
+                f"{'scenario':<14} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}"
+            )
+            for name in options['scenarios']:
+                figures[name] = row = run_scenario(
+                    name, data, options['iterations'], options['workers'], options['seed']
+                )
+                self.stdout.write(
+                    f"{name:<14} {row['throughput_rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                    f"{row['p99_ms']:>8} {row['queries_per_request']:>8} {row['errors']:>7}"
+                )
+                if row['errors']:
+                    self.stderr.write(f"  first error: {row['first_error']}")
+
+            report = results.build(figures, options['scale'], data, options['iterations'], options['workers'])
+
+        if options['output']:
+            results.write(options['output'], report)
+            self.stderr.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            lines, regressions = results.compare(baseline, report, options['threshold'])
+            self.stdout.write('\n'.join(lines))
+            if regressions:
+                raise CommandError(f"Regressions: {', '.join(regressions)}")
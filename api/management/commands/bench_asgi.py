@@ -0,0 +1,129 @@
+# api/management/commands/bench_asgi.py
+
+import asyncio
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from api.authentication import token_cache
+from api.benchmarks import percentile, run_parallel, scratch_database
+from api.benchmarks.data import SCALES, generate
+from api.benchmarks.scenarios import SCENARIOS
+from api.benchmarks.servers import HOST, asgi_get, wsgi_get
+from api.cache import catalog_cache
+
+READ_SCENARIOS = ['browse', 'search', 'filter', 'detail', 'order_history']
+
+
+def _requests(name, data, count, seed):
+    """(path, params, headers) of `count` seeded calls of a read scenario."""
+    rng = random.Random(f'{seed}:{name}')
+    requests = []
+    for index in range(count):
+        call = SCENARIOS[name](data, rng, index)
+        headers = {'Authorization': f'Token {data.tokens[call.user_id]}'} if call.user_id is not None else {}
+        requests.append((call.path, call.data, headers))
+    return requests
+
+
+def _figures(latencies, errors, wall):
+    latencies = [seconds * 1000 for seconds in latencies]
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+def run_wsgi(application, requests, concurrency):
+    """`concurrency` threads, each a blocking client with one request in flight."""
+    def execute(request):
+        started = time.perf_counter()
+        status, _, _ = wsgi_get(application, *request)
+        if status >= 400:
+            raise AssertionError(f'{request[0]} returned {status}')
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = run_parallel(execute, requests, concurrency)
+    wall = time.perf_counter() - started
+    latencies = [elapsed for elapsed, error, _ in results if error is None]
+    return _figures(latencies, len(results) - len(latencies), wall)
+
+
+def run_asgi(application, requests, concurrency):
+    """`concurrency` client tasks on one event loop, each with one request in flight."""
+    async def main():
+        pending = list(reversed(requests))
+        latencies, errors = [], []
+
+        async def client():
+            while pending:
+                request = pending.pop()
+                started = time.perf_counter()
+                try:
+                    status, _, _ = await asgi_get(application, *request)
+                except Exception as exc:  # recorded, not raised, like run_parallel()
+                    errors.append(exc)
+                    continue
+                if status >= 400:
+                    errors.append(status)
+                else:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return _figures(latencies, len(errors), time.perf_counter() - started)
+
+    return asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the WSGI and ASGI entry points on the read endpoints: both handlers "
+        "are driven in process at several client concurrencies, reporting throughput and p50/p99."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--requests', type=int, default=400, help="Requests per scenario and run.")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--scenarios', nargs='+', choices=READ_SCENARIOS, default=READ_SCENARIOS)
+
+    def handle(self, *args, **options):
+        from api_project.asgi import application as asgi_application
+        wsgi_application = get_wsgi_application()
+        runners = [('wsgi', run_wsgi, wsgi_application), ('asgi', run_asgi, asgi_application)]
+
+        with scratch_database():
+            started = time.perf_counter()
+            data = generate(SCALES[options['scale']], seed=options['seed'])
+            self.stderr.write(f"Generated '{options['scale']}' dataset in {time.perf_counter() - started:.1f}s")
+
+            self.stdout.write(
+                f"{'scenario':<14} {'server':<6} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'errors':>7}"
+            )
+            # Saturated runs would log most requests as slow (api/metrics.py)
+            logging.getLogger('api.metrics').disabled = True
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST]):
+                for name in options['scenarios']:
+                    requests = _requests(name, data, options['requests'], options['seed'])
+                    for concurrency in options['concurrency']:
+                        for server, run, application in runners:
+                            # Untimed warm-up, then both servers start from cold caches
+                            run(application, requests[:max(1, len(requests) // 10)], concurrency)
+                            catalog_cache.clear()
+                            token_cache.clear()
+                            row = run(application, requests, concurrency)
+                            self.stdout.write(
+                                f"{name:<14} {server:<6} {concurrency:>7} {row['throughput_rps']:>8} "
+                                f"{row['p50_ms']:>8} {row['p99_ms']:>9} {row['errors']:>7}"
+                            )
@@ -0,0 +1,54 @@
+# api/management/commands/bench_cart.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from api.benchmarks import scratch_database
+from api.benchmarks.data import SCALES, generate
+from api.benchmarks.scenarios import run_scenario
+from api.carts import _config
+
+STORES = {
+    'database': 'api.carts.DatabaseCartStore',
+    'cache': 'api.carts.CacheCartStore',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the cart write scenarios (cart_add, cart_update) once per cart store "
+        "(api/carts.py) and reports throughput, latency and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--iterations', type=int, default=500, help="Requests per scenario and store.")
+        parser.add_argument('--workers', type=int, default=1, help="Threads issuing requests.")
+        parser.add_argument('--stores', nargs='+', choices=list(STORES), default=list(STORES))
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            started = time.perf_counter()
+            data = generate(SCALES[options['scale']], seed=options['seed'])
+            self.stderr.write(f"Generated '{options['scale']}' dataset in {time.perf_counter() - started:.1f}s")
+
+            self.stdout.write(
+                f"{'store':<10} {'scenario':<12} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}"
+            )
+            for store in options['stores']:
+                config = {**getattr(settings, 'CART_STORE', {}), 'BACKEND': STORES[store]}
+                with override_settings(CART_STORE=config):
+                    caches[_config()['ALIAS']].clear()
+                    for name in ('cart_add', 'cart_update'):
+                        row = run_scenario(name, data, options['iterations'], options['workers'], options['seed'])
+                        self.stdout.write(
+                            f"{store:<10} {name:<12} {row['throughput_rps']:>8} {row['p50_ms']:>8} "
+                            f"{row['p99_ms']:>8} {row['queries_per_request']:>8} {row['errors']:>7}"
+                        )
+                        if row['errors']:
+                            self.stderr.write(f"  first error: {row['first_error']}")
@@ -0,0 +1,80 @@
+# api/management/commands/bench_checkout.py
+
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from rest_framework import serializers
+
+from api.benchmarks import percentile, run_parallel, scratch_database
+from api.checkout import place_order
+from api.models import CartItem, Category, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = "Runs concurrent checkouts against a few hot products and reports throughput and oversell."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500, help="Number of checkouts to attempt.")
+        parser.add_argument('--workers', type=int, default=8, help="Parallel checkout threads.")
+        parser.add_argument('--skus', type=int, default=3, help="Number of hot products.")
+        parser.add_argument('--stock', type=int, default=200, help="Initial stock per hot product.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._run(options)
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        User = get_user_model()
+
+        # 1. Seed a few hot products and one cart per simulated shopper
+        category = Category.objects.create(name='Bench')
+        products = Product.objects.bulk_create([
+            Product(
+                category=category, name=f'Hot SKU {i}', description='',
+                price=Decimal('9.99'), stock_quantity=options['stock'],
+            )
+            for i in range(options['skus'])
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'bench-{i}') for i in range(options['orders'])
+        ])
+        CartItem.objects.bulk_create([
+            CartItem(user=user, product=product, quantity=rng.randint(1, 3))
+            for user in users
+            for product in rng.sample(products, rng.randint(1, len(products)))
+        ])
+
+        # 2. Check everyone out at once
+        started = time.perf_counter()
+        results = run_parallel(place_order, users, options['workers'])
+        elapsed = time.perf_counter() - started
+
+        placed = [r for r in results if r[1] is None]
+        rejected = [r for r in results if isinstance(r[1], serializers.ValidationError)]
+        errors = [r for r in results if r[1] is not None and r not in rejected]
+
+        # 3. Oversell: more units sold than existed, or stock below zero
+        sold = dict(
+            OrderItem.objects.values('product').annotate(units=Sum('quantity')).values_list('product', 'units')
+        )
+        oversell = sum(
+            max(0, sold.get(p.pk, 0) - options['stock']) for p in products
+        ) + Product.objects.filter(stock_quantity__lt=0).count()
+
+        latencies = [r[2] * 1000 for r in placed]
+        self.stdout.write(f"orders placed:   {len(placed)}")
+        self.stdout.write(f"rejected:        {len(rejected)} (insufficient stock)")
+        self.stdout.write(f"errors:          {len(errors)}")
+        self.stdout.write(f"orders/sec:      {len(placed) / elapsed:.1f}")
+        self.stdout.write(f"p50/p99 ms:      {percentile(latencies, 50):.2f} / {percentile(latencies, 99):.2f}")
+        for _, error, _ in errors[:3]:
+            self.stderr.write(f"  {error!r}")
+
+        style = self.style.SUCCESS if oversell == 0 else self.style.ERROR
+        self.stdout.write(style(f"oversell:        {oversell}"))
@@ -0,0 +1,71 @@
+# api/management/commands/bench_export.py
+
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import exports
+from api.benchmarks import rss_kb, scratch_database
+from api.models import Category, Order, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = "Measures streaming export throughput (rows/sec) and resident memory growth."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200_000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--products', type=int, default=20_000)
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+        parser.add_argument('--seed', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._seed(options)
+            self.stdout.write(f"{'dataset':>9} {'format':>7} {'rows':>9} {'rows/sec':>10} {'rss +KiB':>9}")
+            for dataset in ('products', 'orders'):
+                for output in ('ndjson', 'csv'):
+                    self._measure(dataset, output, options['chunk_size'])
+
+    def _measure(self, dataset, output, chunk_size):
+        baseline = peak = rss_kb()
+        lines = 0
+        started = time.perf_counter()
+        for lines, _ in enumerate(exports.export_lines(dataset, output, chunk_size=chunk_size), start=1):
+            if lines % 10_000 == 0:
+                peak = max(peak, rss_kb())
+        elapsed = time.perf_counter() - started
+        rows = lines - 1 if output == 'csv' else lines  # minus the CSV header
+        self.stdout.write(
+            f"{dataset:>9} {output:>7} {rows:>9} {rows / elapsed:>10.0f} {max(peak, rss_kb()) - baseline:>9}"
+        )
+
+    def _seed(self, options, batch_size=5000):
+        rng = random.Random(options['seed'])
+        user = get_user_model().objects.create(username='bench-exporter')
+        category = Category.objects.create(name='Bench')
+        for start in range(0, options['products'], batch_size):
+            Product.objects.bulk_create([
+                Product(category=category, name=f'Product {i}', description='x' * 200,
+                        price=Decimal(rng.randint(100, 10000)) / 100, stock_quantity=100)
+                for i in range(start, min(options['products'], start + batch_size))
+            ])
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        epoch = timezone.now() - timedelta(days=365)
+
+        for start in range(0, options['orders'], batch_size):
+            orders = Order.objects.bulk_create([
+                Order(user=user, total_amount=Decimal('10.00'), created_at=epoch + timedelta(minutes=i))
+                for i in range(start, min(options['orders'], start + batch_size))
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=rng.choice(product_ids), name='Item',
+                          quantity=rng.randint(1, 3), price_at_purchase=Decimal('5.00'))
+                for order in orders
+                for _ in range(options['items_per_order'])
+            ])
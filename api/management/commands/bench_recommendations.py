@@ -0,0 +1,104 @@
+# api/management/commands/bench_recommendations.py
+
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import recommendations
+from api.benchmarks import rss_kb, scratch_database
+from api.models import Category, Order, OrderItem, Product, ProductPair, ProductRecommendation
+
+
+class Command(BaseCommand):
+    help = "Builds the frequently-bought-together tables from generated orders; reports throughput and memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=300000)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--max-items', type=int, default=6, help="Most distinct products per order.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._run(options)
+
+    def _orders(self, rng, products, count, user, placed):
+        # Popularity falls off with the product's position, as in most catalogs
+        weights = [1 / (index + 1) for index in range(len(products))]
+        lines = 0
+        for start in range(0, count, 10000):
+            orders = Order.objects.bulk_create([
+                Order(user=user, created_at=placed) for _ in range(min(10000, count - start))
+            ])
+            items = []
+            for order in orders:
+                basket = set(rng.choices(products, weights, k=rng.randint(1, self.max_items)))
+                items.extend(
+                    OrderItem(order=order, product=product, name='', quantity=1, price_at_purchase=product.price)
+                    for product in basket
+                )
+            OrderItem.objects.bulk_create(items, batch_size=5000)
+            lines += len(items)
+        return lines
+
+    def _timed(self, label, lines, **kwargs):
+        baseline = peak = rss_kb()
+        running = True
+
+        def sample():
+            nonlocal peak
+            while running:
+                peak = max(peak, rss_kb())
+                time.sleep(0.05)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        result = recommendations.update(**kwargs)
+        elapsed = time.perf_counter() - started
+        running = False
+        sampler.join()
+        self.stdout.write(
+            f"{label:<12} {result['orders']:>9} {lines:>9} {elapsed:>8.2f} {lines / elapsed:>9.0f} "
+            f"{result['ranked']:>8} {max(peak, rss_kb()) - baseline:>9}"
+        )
+
+    def _run(self, options):
+        self.max_items = options['max_items']
+        rng = random.Random(options['seed'])
+        user = get_user_model().objects.create(username='bench-recommendations')
+        category = Category.objects.create(name='Bench')
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f'Product {i}', description='', price=Decimal('5.00'))
+            for i in range(options['products'])
+        ])
+        placed = timezone.now() - timedelta(days=1)
+
+        self.stdout.write(
+            f"{'run':<12} {'orders':>9} {'lines':>9} {'seconds':>8} {'lines/s':>9} {'ranked':>8} {'+RSS KiB':>9}"
+        )
+        lines = self._orders(rng, products, options['orders'], user, placed)
+        self._timed('full', lines, full=True)
+        # A tenth more orders since the last run
+        lines = self._orders(rng, products, options['orders'] // 10, user, placed)
+        self._timed('incremental', lines)
+
+        self.stdout.write(
+            f"pairs: {ProductPair.objects.count()}, recommendations: {ProductRecommendation.objects.count()}"
+        )
+        product = products[0]
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            rows = list(ProductRecommendation.objects.filter(product=product).select_related('recommended'))
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"read of {len(rows)} recommendations: {len(queries)} query, {elapsed * 1000:.2f} ms"
+        )
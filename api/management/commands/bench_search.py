@@ -0,0 +1,77 @@
+# api/management/commands/bench_search.py
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import percentile, scratch_database
+from api.models import Category, Product
+from api.search import ProductSearchFilter
+from api.views import ProductViewSet
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'zen', 'bar', 'cor', 'dex', 'fil', 'gan']
+
+
+class Command(BaseCommand):
+    help = "Compares p50/p99 product search latency: icontains SearchFilter vs the full-text index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+            help="Catalog sizes to measure (the catalog grows between steps).",
+        )
+        parser.add_argument('--queries', type=int, default=200, help="Searches per backend and size.")
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._run(options)
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        vocabulary = sorted({
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(3000)
+        })
+        categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(50)])
+        factory = APIRequestFactory()
+        view = ProductViewSet()
+        backends = [('icontains', SearchFilter()), ('fulltext', ProductSearchFilter())]
+
+        self.stdout.write(f"{'products':>10} {'backend':>10} {'p50 ms':>9} {'p99 ms':>9}")
+        for size in sorted(options['sizes']):
+            self._grow_catalog(size, vocabulary, categories, rng)
+            terms = [
+                ' '.join(rng.sample(vocabulary, rng.choice([1, 1, 2])))[:rng.choice([4, 6, 40])]
+                for _ in range(options['queries'])
+            ]
+            for label, backend in backends:
+                timings = []
+                for term in terms:
+                    request = Request(factory.get('/api/v1/products/', {'search': term}))
+                    started = time.perf_counter()
+                    queryset = backend.filter_queryset(request, Product.objects.all(), view)
+                    list(queryset[:options['page_size']])
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f"{size:>10} {label:>10} {percentile(timings, 50):>9.2f} {percentile(timings, 99):>9.2f}"
+                )
+
+    def _grow_catalog(self, size, vocabulary, categories, rng, batch_size=5000):
+        existing = Product.objects.count()
+        for start in range(existing, size, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    category=rng.choice(categories),
+                    name=' '.join(rng.sample(vocabulary, 3)).title(),
+                    description=' '.join(rng.choices(vocabulary, k=30)),
+                    price=Decimal(rng.randint(100, 100000)) / 100,
+                    stock_quantity=rng.randint(0, 500),
+                )
+                for _ in range(start, min(size, start + batch_size))
+            ])
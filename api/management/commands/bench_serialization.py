@@ -0,0 +1,62 @@
+# api/management/commands/bench_serialization.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api import representations
+from api.benchmarks import scratch_database
+from api.benchmarks.data import SCALES, generate
+from api.models import Order, Product
+from api.renderers import FastJSONRenderer
+from api.serializers import OrderSerializer, ProductSerializer
+
+
+def _per_page_ms(render, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        render()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Times serializing and rendering one list page with the serializers versus "
+        "the dict representations (api/representations.py); queries are not timed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[20, 100, 1000])
+        parser.add_argument('--rounds', type=int, default=50)
+
+    def handle(self, *args, **options):
+        cases = [
+            ('products', ProductSerializer, representations.products, representations.PRODUCT_FIELDS,
+             Product.objects.select_related('category').order_by('pk')),
+            ('orders', OrderSerializer, representations.orders, representations.ORDER_FIELDS,
+             Order.objects.prefetch_related('items').order_by('pk')),
+        ]
+        with scratch_database():
+            generate(SCALES[options['scale']])
+            self.stdout.write(f"{'endpoint':<10} {'rows':>6} {'serializer ms':>14} {'fast ms':>9} {'speedup':>8}")
+            for name, serializer, representation, fields, queryset in cases:
+                for size in options['page_sizes']:
+                    # Rows are loaded once, up front: only the per-page CPU work is timed
+                    rows = list(queryset[:size])
+                    narrow_rows = list(queryset.only(*fields)[:size])
+
+                    def slow():
+                        return JSONRenderer().render(serializer(rows, many=True).data)
+
+                    def fast():
+                        return FastJSONRenderer().render(representation(narrow_rows))
+
+                    if slow() != fast():
+                        raise CommandError(f"{name}: the representations differ")
+                    slow_ms = _per_page_ms(slow, options['rounds'])
+                    fast_ms = _per_page_ms(fast, options['rounds'])
+                    self.stdout.write(
+                        f"{name:<10} {len(rows):>6} {slow_ms:>14.3f} {fast_ms:>9.3f} {slow_ms / fast_ms:>7.1f}x"
+                    )
@@ -0,0 +1,28 @@
+# api/management/commands/bench_throttles.py
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks.throttles import MODES, measure
+
+BUDGET_US = 100
+
+
+class Command(BaseCommand):
+    help = "Times the throttle decision (check_throttles) per request for each kind of client."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help="Decisions timed per case.")
+        parser.add_argument('--clients', type=int, default=100, help="Distinct users / addresses per case.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':<9} {'case':<18} {'p50 µs':>8} {'p99 µs':>8} {'rejected':>9}")
+        worst = 0.0
+        for mode in MODES:
+            figures = measure(mode, options['iterations'], options['clients'])
+            for label, row in figures.items():
+                self.stdout.write(
+                    f"{mode:<9} {label:<18} {row['p50_us']:>8.1f} {row['p99_us']:>8.1f} {row['rejected']:>9}"
+                )
+                worst = max(worst, row['p50_us'])
+        style = self.style.SUCCESS if worst < BUDGET_US else self.style.ERROR
+        self.stdout.write(style(f"worst p50: {worst:.1f} µs (budget {BUDGET_US} µs)"))
@@ -0,0 +1,67 @@
+# api/management/commands/bench_transitions.py
+
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import fulfilment
+from api.benchmarks import scratch_database
+from api.models import Category, Order, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = "Moves many orders through their statuses with one transition call each and reports throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20000, help="Orders per transition call.")
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._run(options)
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        user = get_user_model().objects.create(username='bench-fulfilment')
+        category = Category.objects.create(name='Bench')
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f'Product {i}', description='', price=Decimal('5.00'), stock_quantity=0)
+            for i in range(options['products'])
+        ])
+
+        # Two batches of pending orders with 1-3 items each: one is fulfilled, one cancelled
+        orders = Order.objects.bulk_create([Order(user=user) for _ in range(2 * options['orders'])])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, name=product.name, quantity=rng.randint(1, 3),
+                      price_at_purchase=product.price)
+            for order in orders for product in rng.sample(products, rng.randint(1, 3))
+        ], batch_size=5000)
+        ids = [order.pk for order in orders]
+        fulfilled, cancelled = ids[:options['orders']], ids[options['orders']:]
+
+        self.stdout.write(f"{'transition':<24} {'orders':>8} {'seconds':>8} {'orders/s':>10} {'queries':>8}")
+        for label, batch, status in [
+            ('PENDING -> PROCESSING', fulfilled, 'PROCESSING'),
+            ('PROCESSING -> SHIPPED', fulfilled, 'SHIPPED'),
+            ('SHIPPED -> DELIVERED', fulfilled, 'DELIVERED'),
+            ('PENDING -> CANCELLED', cancelled, 'CANCELLED'),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                result = fulfilment.transition(batch, status, user=user)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<24} {result['updated']:>8} {elapsed:>8.2f} {result['updated'] / elapsed:>10.0f} "
+                f"{len(queries):>8}"
+            )
+
+        restocked = sum(Product.objects.values_list('stock_quantity', flat=True))
+        sold = sum(OrderItem.objects.filter(order_id__in=cancelled).values_list('quantity', flat=True))
+        style = self.style.SUCCESS if restocked == sold else self.style.ERROR
+        self.stdout.write(style(f"units restocked: {restocked} (cancelled orders held {sold})"))
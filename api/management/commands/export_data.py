@@ -0,0 +1,39 @@
+# api/management/commands/export_data.py
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from api import exports
+
+
+class Command(BaseCommand):
+    help = "Streams products or orders (with items) as NDJSON or CSV, optionally as a delta export."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--output', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--since', help="Only rows created at/after this ISO datetime.")
+        parser.add_argument('--after-id', type=int, help="Only rows with an id above this watermark.")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+        parser.add_argument('--file', help="Write here instead of stdout.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since datetime: {options['since']}")
+
+        lines = exports.export_lines(
+            options['dataset'], options['output'],
+            since=since, after_id=options['after_id'], chunk_size=options['chunk_size'],
+        )
+        stream = open(options['file'], 'w', newline='') if options['file'] else sys.stdout
+        try:
+            for line in lines:
+                stream.write(line)
+        finally:
+            if options['file']:
+                stream.close()
@@ -0,0 +1,98 @@
+# api/management/commands/import_catalog.py
+
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalog_import import IMPORT_FIELDS, CatalogWriter, clean_chunk, read_records
+
+
+def _chunks(records, size):
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-imports a supplier catalog (CSV with a header row, or JSON Lines) and upserts "
+        f"products keyed on SKU. Columns: {', '.join(IMPORT_FIELDS)}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'jsonl'],
+                            help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows per transaction.")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Processes for parsing/validation (0 = validate in this process).")
+        parser.add_argument('--errors', help="Write rejected rows (line, error) to this CSV file.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+        file_format = options['file_format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        writer = CatalogWriter()
+        errors_file = open(options['errors'], 'w', newline='') if options['errors'] else None
+        error_writer = csv.writer(errors_file) if errors_file else None
+        if error_writer:
+            error_writer.writerow(['line', 'error'])
+
+        rejected = 0
+        started = time.perf_counter()
+        chunks = _chunks(read_records(path, file_format), options['batch_size'])
+        try:
+            for rows, errors in self._validated(chunks, file_format, options['workers']):
+                if rows:
+                    writer.write(rows)
+                rejected += len(errors)
+                if error_writer:
+                    error_writer.writerows(errors)
+                elif errors and options['verbosity'] > 1:
+                    for line_number, message in errors:
+                        self.stderr.write(f"line {line_number}: {message}")
+
+                done = writer.created + writer.updated + writer.merged + rejected
+                elapsed = time.perf_counter() - started
+                if options['verbosity'] > 0:
+                    self.stderr.write(f"\r{done} rows, {done / elapsed:.0f} rows/sec", ending='')
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        elapsed = time.perf_counter() - started
+        done = writer.created + writer.updated + writer.merged + rejected
+        if options['verbosity'] > 0:
+            self.stderr.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {done} rows in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.0f} rows/sec): "
+            f"{writer.created} created, {writer.updated} updated, "
+            f"{writer.merged} merged (repeated SKU), {rejected} rejected."
+        ))
+
+    def _validated(self, chunks, file_format, workers):
+        """Yields (rows, errors) per chunk, in file order."""
+        if workers <= 0:
+            for chunk in chunks:
+                yield clean_chunk(chunk, file_format)
+            return
+
+        # Keep a bounded number of chunks in flight so memory stays flat
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(clean_chunk, chunk, file_format))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
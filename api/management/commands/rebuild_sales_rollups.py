@@ -0,0 +1,20 @@
+# api/management/commands/rebuild_sales_rollups.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from api import analytics
+
+
+class Command(BaseCommand):
+    help = "Recomputes the daily sales rollups from the orders (all days, or --start..--end)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day to rebuild (YYYY-MM-DD), inclusive.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Orders rolled up per transaction.")
+
+    def handle(self, *args, **options):
+        counted = analytics.rebuild(options['start'], options['end'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {counted} order(s)."))
@@ -0,0 +1,15 @@
+# api/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the product full-text search index from the Product and Category tables."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("The configured database has no product search index (SQLite or PostgreSQL only).")
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Product search index rebuilt."))
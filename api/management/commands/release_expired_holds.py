@@ -0,0 +1,24 @@
+# api/management/commands/release_expired_holds.py
+
+from django.core.management.base import BaseCommand
+
+from api import reservations
+
+
+class Command(BaseCommand):
+    help = "Releases cart reservation holds whose TTL has lapsed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Cart lines released per transaction.")
+        parser.add_argument(
+            '--reconcile', action='store_true',
+            help="Afterwards, recompute Product.reserved_quantity from the remaining holds.",
+        )
+
+    def handle(self, *args, **options):
+        released = reservations.release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired hold(s)."))
+
+        if options['reconcile']:
+            products = reservations.reconcile()
+            self.stdout.write(f"Reconciled reserved stock for {products} product(s).")
@@ -0,0 +1,76 @@
+# api/management/commands/run_workers.py
+
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import tasks
+from api.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = "Runs queued background tasks (api/tasks.py) on a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Worker threads.")
+        parser.add_argument('--batch-size', type=int, help="Tasks claimed at a time (default TASKS['BATCH_SIZE']).")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once no task is due instead of polling.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        outcomes, lags = Counter(), []
+
+        def work():
+            while not stop.is_set():
+                batch = tasks.claim(options['batch_size'])
+                if not batch:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+                    continue
+                for claimed in batch:
+                    outcome = tasks.run(claimed)
+                    with lock:
+                        outcomes[outcome] += 1
+                        lags.append(claimed.lag_seconds)
+
+        def worker():
+            try:
+                work()
+            finally:
+                connection.close()
+
+        threads = []
+        started = time.perf_counter()
+        try:
+            if options['workers'] == 1:
+                # On the calling thread (and its connection)
+                work()
+            else:
+                threads = [threading.Thread(target=worker, daemon=True) for _ in range(options['workers'])]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stderr.write("Stopping after the current tasks...")
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - started
+        ran = sum(outcomes.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {ran} task(s) in {elapsed:.1f}s: {outcomes['done']} done, {outcomes['retry']} to retry, "
+            f"{outcomes['dead']} dead, {outcomes['lost']} lost."
+        ))
+        if lags:
+            self.stdout.write(
+                f"Queue lag p50/p99: {percentile(lags, 50):.3f}s / {percentile(lags, 99):.3f}s"
+            )
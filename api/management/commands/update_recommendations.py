@@ -0,0 +1,26 @@
+# api/management/commands/update_recommendations.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = "Counts the orders placed since the last run into the co-purchase matrix and re-ranks their products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recount every order and re-rank every product.")
+        parser.add_argument('--chunk-size', type=int, help="Orders counted per transaction (CHUNK_ORDERS).")
+
+    def handle(self, *args, **options):
+        config = recommendations._config()
+        if options['chunk_size']:
+            config['CHUNK_ORDERS'] = options['chunk_size']
+        try:
+            result = recommendations.update(full=options['full'], config=config)
+        except recommendations.ConcurrentRun as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Counted {result['orders']} order(s) up to #{result['last_order_id']}; "
+            f"re-ranked {result['ranked']} product(s)."
+        ))
@@ -0,0 +1,422 @@
+# api/metrics.py
+"""
+Per-view request metrics, aggregated in process and exposed in the Prometheus
+text format at /metrics.
+
+Every request counts towards the request counter and latency histogram.
+A sampled share of requests (METRICS['SAMPLE_RATE']) also records SQL query
+counts and time, serialization time (building `serializer.data` in the list
+and retrieve views that use SerializationTimingMixin), render (JSON encoding)
+time and response size; the per-query
+execute wrapper is the only measurable overhead, so sampling bounds it. Every
+request slower than METRICS['SLOW_REQUEST_MS'] is logged, with its slowest
+queries when it was sampled. Each
+server process aggregates its own figures: scrape every process, or let
+Prometheus sum them.
+
+Background task queue gauges (api/tasks.py) are read from the database at
+scrape time, so every process reports the same figures.
+
+Request latency and SQL time also feed the load monitor behind load shedding
+(api/throttling.py), latency even with METRICS disabled; throttled and shed
+requests are left out of it.
+"""
+
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import tasks, throttling
+
+logger = logging.getLogger('api.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _config():
+    config = {
+        'ENABLED': True,
+        'SAMPLE_RATE': 1.0,
+        'SLOW_REQUEST_MS': 500,
+        'SLOW_QUERIES_LOGGED': 5,
+        'BEARER_TOKEN': None,
+    }
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense (callers hold the registry lock)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield str(bound), cumulative
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sampled = 0
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.query_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, status, seconds, sample=None):
+        """
+        `sample` is a (queries, query_seconds, serialize_seconds, render_seconds,
+        response_bytes) tuple, or None.
+        """
+        status_class = f'{status // 100}xx'
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.statuses[status_class] = metrics.statuses.get(status_class, 0) + 1
+            metrics.latency.observe(seconds)
+            if sample is not None:
+                queries, query_seconds, serialize_seconds, render_seconds, response_bytes = sample
+                metrics.sampled += 1
+                metrics.queries.observe(queries)
+                metrics.query_seconds += query_seconds
+                metrics.serialize_seconds += serialize_seconds
+                metrics.render_seconds += render_seconds
+                if response_bytes is not None:
+                    metrics.response_bytes.observe(response_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+    def exposition(self):
+        """The registry in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def header(name, kind, text):
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, view, hist):
+            for bound, count in hist.samples():
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{view="{view}"}} {hist.total:.6f}')
+            lines.append(f'{name}_count{{view="{view}"}} {sum(hist.counts)}')
+
+        with self._lock:
+            views = sorted(self._views.items())
+
+            header('api_requests_total', 'counter', 'Requests by view and status class.')
+            for view, metrics in views:
+                for status_class, count in sorted(metrics.statuses.items()):
+                    lines.append(f'api_requests_total{{view="{view}",status="{status_class}"}} {count}')
+
+            header('api_request_duration_seconds', 'histogram', 'Request latency by view.')
+            for view, metrics in views:
+                histogram('api_request_duration_seconds', view, metrics.latency)
+
+            header('api_sampled_requests_total', 'counter', 'Requests that recorded query/serialize/render/size metrics.')
+            for view, metrics in views:
+                lines.append(f'api_sampled_requests_total{{view="{view}"}} {metrics.sampled}')
+
+            header('api_request_queries', 'histogram', 'SQL queries per sampled request.')
+            for view, metrics in views:
+                histogram('api_request_queries', view, metrics.queries)
+
+            header('api_query_seconds_total', 'counter', 'SQL time spent by sampled requests.')
+            for view, metrics in views:
+                lines.append(f'api_query_seconds_total{{view="{view}"}} {metrics.query_seconds:.6f}')
+
+            header('api_serialize_seconds_total', 'counter', 'Serializer (.data) time of sampled list/retrieve requests.')
+            for view, metrics in views:
+                lines.append(f'api_serialize_seconds_total{{view="{view}"}} {metrics.serialize_seconds:.6f}')
+
+            header('api_render_seconds_total', 'counter', 'Response rendering (JSON encoding) time of sampled requests.')
+            for view, metrics in views:
+                lines.append(f'api_render_seconds_total{{view="{view}"}} {metrics.render_seconds:.6f}')
+
+            header('api_response_bytes', 'histogram', 'Body size of sampled, non-streaming responses.')
+            for view, metrics in views:
+                histogram('api_response_bytes', view, metrics.response_bytes)
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() callable counting queries and keeping the slowest few."""
+
+    def __init__(self, keep):
+        self.count = 0
+        self.seconds = 0.0
+        self.keep = keep
+        self.slowest = []  # min-heap of (seconds, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+
+def view_name(request):
+    """'ProductViewSet.list'-style label for the resolved view; 'unresolved' for 404s."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    cls = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+    if cls is None:
+        return f'{view.__module__}.{view.__name__}'
+    actions = getattr(view, 'actions', None) or {}
+    method = request.method.lower()
+    return f'{cls.__name__}.{actions.get(method, method)}'
+
+
+class MetricsMiddleware:
+    """
+    Records every request in `registry` and feeds the load monitor (also with
+    METRICS disabled); place it first in MIDDLEWARE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = _config()
+        started = time.perf_counter()
+        if not config['ENABLED']:
+            response = self.get_response(request)
+            self._observe_load(response, time.perf_counter() - started, None)
+            return response
+
+        recorder = self._recorder(request, config)
+        with self._recording(recorder):
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, recorder, config)
+        return response
+
+    async def __acall__(self, request):
+        config = _config()
+        started = time.perf_counter()
+        if not config['ENABLED']:
+            response = await self.get_response(request)
+            self._observe_load(response, time.perf_counter() - started, None)
+            return response
+
+        recorder = self._recorder(request, config)
+        # Connections are per thread: register the wrappers from the thread that runs
+        # this request's (thread-sensitive) ORM calls, as sampled requests only
+        recording = await sync_to_async(self._recording)(recorder) if recorder is not None else None
+        try:
+            response = await self.get_response(request)
+        finally:
+            if recording is not None:
+                await sync_to_async(recording.close)()
+        self._record(request, response, time.perf_counter() - started, recorder, config)
+        return response
+
+    @staticmethod
+    def _recorder(request, config):
+        """A QueryRecorder for sampled requests, else None."""
+        if config['SAMPLE_RATE'] < 1 and random.random() >= config['SAMPLE_RATE']:
+            return None
+        request._metrics_render = [0.0, 0.0]
+        request._metrics_serialize = [0.0]
+        return QueryRecorder(config['SLOW_QUERIES_LOGGED'])
+
+    @staticmethod
+    def _recording(recorder):
+        stack = ExitStack()
+        if recorder is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    @staticmethod
+    def _observe_load(response, elapsed, recorder):
+        if response.status_code not in (429, 503):
+            throttling.monitor.observe(elapsed, recorder.seconds if recorder is not None else None)
+
+    def _record(self, request, response, elapsed, recorder, config):
+        view = view_name(request)
+        self._observe_load(response, elapsed, recorder)
+        if recorder is None:
+            registry.record(view, response.status_code, elapsed)
+        else:
+            render_started, render_finished = request._metrics_render
+            size = None if response.streaming else len(response.content)
+            registry.record(
+                view, response.status_code, elapsed,
+                (recorder.count, recorder.seconds, request._metrics_serialize[0],
+             max(render_finished - render_started, 0.0), size),
+            )
+        if elapsed * 1000 >= config['SLOW_REQUEST_MS']:
+            self._log_slow(request, view, elapsed, recorder)
+
+    @staticmethod
+    def _log_slow(request, view, elapsed, recorder):
+        if recorder is None:
+            # Only sampled requests record their queries
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms, queries not recorded (unsampled)',
+                request.method, request.get_full_path(), view, elapsed * 1000,
+            )
+            return
+        top = '\n'.join(
+            f'  {seconds * 1000:.1f} ms  {sql}' for seconds, sql in sorted(recorder.slowest, reverse=True)
+        )
+        logger.warning(
+            'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms\n%s',
+            request.method, request.get_full_path(), view, elapsed * 1000,
+            recorder.count, recorder.seconds * 1000, top,
+        )
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook; time it with a post-render callback
+        marks = getattr(request, '_metrics_render', None)
+        if marks is not None:
+            marks[0] = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: marks.__setitem__(1, time.perf_counter()))
+        return response
+
+
+class _TimedSerializer:
+    """Stands in for a read serializer, adding the time its `.data` takes to `seconds`."""
+
+    def __init__(self, serializer, seconds):
+        self._serializer, self._seconds = serializer, seconds
+
+    @property
+    def data(self):
+        started = time.perf_counter()
+        try:
+            return self._serializer.data
+        finally:
+            self._seconds[0] += time.perf_counter() - started
+
+    def __getattr__(self, name):
+        return getattr(self._serializer, name)
+
+
+class SerializationTimingMixin:
+    """
+    Viewset mixin: times building the representation of `list` and `retrieve`
+    (get_serializer() and its `.data`) for sampled requests; list it first so
+    it wraps the other mixins' get_serializer().
+    """
+    timed_actions = ('list', 'retrieve')
+
+    def get_serializer(self, *args, **kwargs):
+        request = getattr(self, 'request', None)
+        seconds = getattr(request, '_metrics_serialize', None) if self.action in self.timed_actions else None
+        if seconds is None or not args:
+            return super().get_serializer(*args, **kwargs)
+        started = time.perf_counter()
+        serializer = super().get_serializer(*args, **kwargs)
+        seconds[0] += time.perf_counter() - started
+        return _TimedSerializer(serializer, seconds)
+
+
+def task_exposition():
+    """Queue depth, lag and dead-letter gauges per task name (two grouped queries)."""
+    lines = []
+    figures = sorted(tasks.stats().items())
+    for name, kind, key, text in (
+        ('api_tasks_queued', 'gauge', 'queued', 'Background tasks waiting to run (due or backing off).'),
+        ('api_tasks_running', 'gauge', 'running', 'Background tasks claimed by a worker.'),
+        ('api_task_queue_lag_seconds', 'gauge', 'lag_seconds', 'How long the oldest queued task has been due.'),
+        ('api_tasks_dead', 'gauge', 'dead', 'Tasks in the dead-letter table.'),
+    ):
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for task_name, entry in figures:
+            value = f'{entry[key]:.3f}' if key == 'lag_seconds' else entry[key]
+            lines.append(f'{name}{{task="{task_name}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def throttle_exposition():
+    """Throttled and shed request counters and the load monitor's state (this process)."""
+    monitor, store = throttling.monitor, throttling.store
+    lines = [
+        '# HELP api_throttled_requests_total Requests rejected by a token bucket, by scope.',
+        '# TYPE api_throttled_requests_total counter',
+    ]
+    for scope, count in sorted(store.throttled.items()):
+        lines.append(f'api_throttled_requests_total{{scope="{scope}"}} {count}')
+    lines += [
+        '# HELP api_shed_requests_total Low-priority requests shed in overload mode.',
+        '# TYPE api_shed_requests_total counter',
+        f'api_shed_requests_total {monitor.shed}',
+        '# HELP api_overloaded Whether overload mode (load shedding) is on.',
+        '# TYPE api_overloaded gauge',
+        f'api_overloaded {int(monitor.overloaded())}',
+        '# HELP api_load_latency_seconds Request latency percentile the load monitor last judged.',
+        '# TYPE api_load_latency_seconds gauge',
+        f'api_load_latency_seconds {monitor.latency:.6f}',
+        '# HELP api_load_query_seconds SQL time percentile (sampled requests) the load monitor last judged.',
+        '# TYPE api_load_query_seconds gauge',
+        f'api_load_query_seconds {monitor.query_time:.6f}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """GET /metrics — Prometheus scrape target."""
+    token = _config()['BEARER_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.exposition() + throttle_exposition() + task_exposition(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_order_orderitem_cartitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='held_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reserved_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
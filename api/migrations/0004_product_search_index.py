@@ -0,0 +1,16 @@
+# Full-text search index for products; the SQL lives in _search_index.py.
+
+from django.db import migrations
+
+from ._search_index import create_index, drop_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
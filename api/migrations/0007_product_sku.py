@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+from ._search_index import create_triggers, drop_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_row_versions'),
+    ]
+
+    operations = [
+        # SQLite rebuilds api_product for the unique column; keep the search triggers out of the way
+        migrations.RunPython(drop_triggers, create_triggers),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from ._search_index import create_triggers, drop_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_product_facet_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The new indexes first: the FK indexes dropped below are prefixes of them
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(condition=models.Q(('held_quantity__gt', 0)), fields=['hold_expires_at'], name='cartitem_active_hold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'id'], name='order_status_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name', 'id'], name='product_cat_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('stock_quantity__gt', 0)), fields=['name', 'id'], name='product_in_stock_name_idx'),
+        ),
+        # SQLite rebuilds api_product to drop its category index; keep the search triggers out of the way
+        migrations.RunPython(drop_triggers, create_triggers),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(db_index=False, help_text='The category this product belongs to.', on_delete=django.db.models.deletion.CASCADE, related_name='products', to='api.category'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
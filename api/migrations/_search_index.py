@@ -0,0 +1,170 @@
+# Shared SQL for the product full-text search index (see api/search.py).
+#
+# SQLite gets an FTS5 virtual table and Postgres a tsvector side table with a
+# GIN index. Both are maintained by triggers, so bulk_create(), update() and
+# raw SQL writes stay in sync; renaming a category re-indexes only its products.
+# Other backends are left alone and keep using the icontains SearchFilter.
+#
+# SQLite caveat: Django rebuilds a table (create copy, drop, rename) for most
+# schema changes, which drops that table's triggers and fails on triggers that
+# reference it. Any later migration that alters api_product or api_category must
+# run `drop_triggers` first and `create_triggers` last (see 0006_row_versions).
+# This module starts with an underscore so the migration loader skips it.
+
+SQLITE_TABLE = [
+    """
+    CREATE VIRTUAL TABLE api_product_fts USING fts5(
+        name, description, category_name, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO api_product_fts (rowid, name, description, category_name)
+    SELECT p.id, p.name, p.description, c.name
+    FROM api_product p JOIN api_category c ON c.id = p.category_id
+    """,
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER api_product_fts_insert AFTER INSERT ON api_product BEGIN
+        INSERT INTO api_product_fts (rowid, name, description, category_name)
+        VALUES (new.id, new.name, new.description,
+                (SELECT name FROM api_category WHERE id = new.category_id));
+    END
+    """,
+    """
+    CREATE TRIGGER api_product_fts_update AFTER UPDATE OF name, description, category_id ON api_product
+    WHEN old.name IS NOT new.name
+      OR old.description IS NOT new.description
+      OR old.category_id IS NOT new.category_id
+    BEGIN
+        DELETE FROM api_product_fts WHERE rowid = old.id;
+        INSERT INTO api_product_fts (rowid, name, description, category_name)
+        VALUES (new.id, new.name, new.description,
+                (SELECT name FROM api_category WHERE id = new.category_id));
+    END
+    """,
+    """
+    CREATE TRIGGER api_product_fts_delete AFTER DELETE ON api_product BEGIN
+        DELETE FROM api_product_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_category_fts_update AFTER UPDATE OF name ON api_category
+    WHEN old.name IS NOT new.name
+    BEGIN
+        UPDATE api_product_fts SET category_name = new.name
+        WHERE rowid IN (SELECT id FROM api_product WHERE category_id = new.id);
+    END
+    """,
+]
+
+SQLITE_DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS api_category_fts_update",
+    "DROP TRIGGER IF EXISTS api_product_fts_delete",
+    "DROP TRIGGER IF EXISTS api_product_fts_update",
+    "DROP TRIGGER IF EXISTS api_product_fts_insert",
+]
+
+SQLITE_DROP_TABLE = [
+    "DROP TABLE IF EXISTS api_product_fts",
+]
+
+POSTGRES_TABLE = [
+    """
+    CREATE FUNCTION api_product_document(name text, description text, category_name text)
+    RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(category_name, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    $$
+    """,
+    """
+    CREATE TABLE api_product_search (
+        product_id bigint PRIMARY KEY REFERENCES api_product (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX api_product_search_document ON api_product_search USING gin (document)",
+    """
+    INSERT INTO api_product_search (product_id, document)
+    SELECT p.id, api_product_document(p.name, p.description, c.name)
+    FROM api_product p JOIN api_category c ON c.id = p.category_id
+    """,
+]
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE FUNCTION api_product_search_refresh() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO api_product_search (product_id, document)
+        SELECT NEW.id, api_product_document(NEW.name, NEW.description, c.name)
+        FROM api_category c WHERE c.id = NEW.category_id
+        ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER api_product_search_insert AFTER INSERT ON api_product
+    FOR EACH ROW EXECUTE FUNCTION api_product_search_refresh()
+    """,
+    """
+    CREATE TRIGGER api_product_search_update AFTER UPDATE OF name, description, category_id ON api_product
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name
+       OR OLD.description IS DISTINCT FROM NEW.description
+       OR OLD.category_id IS DISTINCT FROM NEW.category_id)
+    EXECUTE FUNCTION api_product_search_refresh()
+    """,
+    """
+    CREATE FUNCTION api_category_search_refresh() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE api_product_search s
+        SET document = api_product_document(p.name, p.description, NEW.name)
+        FROM api_product p
+        WHERE p.id = s.product_id AND p.category_id = NEW.id;
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER api_category_search_update AFTER UPDATE OF name ON api_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION api_category_search_refresh()
+    """,
+]
+
+POSTGRES_DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS api_category_search_update ON api_category",
+    "DROP FUNCTION IF EXISTS api_category_search_refresh()",
+    "DROP TRIGGER IF EXISTS api_product_search_update ON api_product",
+    "DROP TRIGGER IF EXISTS api_product_search_insert ON api_product",
+    "DROP FUNCTION IF EXISTS api_product_search_refresh()",
+]
+
+POSTGRES_DROP_TABLE = [
+    "DROP TABLE IF EXISTS api_product_search",
+    "DROP FUNCTION IF EXISTS api_product_document(text, text, text)",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_index = _run({
+    'sqlite': SQLITE_TABLE + SQLITE_TRIGGERS,
+    'postgresql': POSTGRES_TABLE + POSTGRES_TRIGGERS,
+})
+drop_index = _run({
+    'sqlite': SQLITE_DROP_TRIGGERS + SQLITE_DROP_TABLE,
+    'postgresql': POSTGRES_DROP_TRIGGERS + POSTGRES_DROP_TABLE,
+})
+
+# Only SQLite loses triggers on table rebuilds; Postgres ALTER TABLE keeps them.
+drop_triggers = _run({'sqlite': SQLITE_DROP_TRIGGERS})
+create_triggers = _run({'sqlite': SQLITE_TRIGGERS})
@@ -7,10 +7,36 @@ from django.contrib.auth import get_user_model # To reference the custom User mo
 from django.utils.html import mark_safe 
 
 User = get_user_model()
+
+
+# 0. Versioned base (row validators for ETag / Last-Modified, see api/conditional.py)
+class VersionedModel(models.Model):
+    """
+    Adds a row `version` that every save() increments and an `updated_at` time.
+    Queryset.update() call sites that change what the API shows must bump both
+    themselves (`version=F('version') + 1, updated_at=Now()`).
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+
+
 # 1. Category Model
 class Category(models.Model):
     
     name = models.CharField(max_length=100, unique=True)
+    # Category names are embedded in product responses, so they feed product validators too
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = "Categories"
@@ -20,26 +46,46 @@ class Category(models.Model):
         return self.name
 
 # 2. Product Model
-class Product(models.Model):
+class Product(VersionedModel):
 
     # Foreign Key (FK) to Category for the one-to-many relationship
     category = models.ForeignKey(
         Category, 
         on_delete=models.CASCADE, 
         related_name='products',
-        help_text="The category this product belongs to."
+        help_text="The category this product belongs to.",
+        # Indexed as the leading column of the composite indexes below
+        db_index=False,
     )
+    # Stable supplier/external identifier used by bulk catalog imports (import_catalog)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=255)
     description = models.TextField()
     # Price uses DecimalField for financial accuracy
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = models.IntegerField(default=0)
+    # Units held by active cart reservations (see api/reservations.py)
+    reserved_quantity = models.PositiveIntegerField(default=0)
     image_url = models.URLField(blank=True, null=True, help_text="URL for the product image.")
     created_date = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['name']
-        
+        # Keyset pagination seeks on (<ordering field>, id); see api/pagination.py
+        indexes = [
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['stock_quantity', 'id'], name='product_stock_id_idx'),
+            models.Index(fields=['created_date', 'id'], name='product_created_id_idx'),
+            # ?category= with a price range or ?ordering=price (api/filters.py); the facet
+            # query reads category, price and stock from this index alone
+            models.Index(fields=['category', 'price', 'stock_quantity', 'id'], name='product_cat_price_idx'),
+            # ?category= in the default (name) order
+            models.Index(fields=['category', 'name', 'id'], name='product_cat_name_idx'),
+            # ?in_stock=true in the default order, without sorting every in-stock product
+            models.Index(fields=['name', 'id'], name='product_in_stock_name_idx',
+                         condition=models.Q(stock_quantity__gt=0)),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.price} RWF)"
@@ -47,6 +93,11 @@ class Product(models.Model):
     def is_in_stock(self):
         """Convenience method to check stock status."""
         return self.stock_quantity > 0
+
+    @property
+    def available_quantity(self):
+        """Stock that is not currently held by someone's cart."""
+        return self.stock_quantity - self.reserved_quantity
     
     # Custom property for admin display
     is_in_stock.boolean = True
@@ -63,24 +114,34 @@ class Product(models.Model):
 
 
 # 3. CartItem Model
-class CartItem(models.Model):
+class CartItem(VersionedModel):
     """
     Represents a single item in a user's current shopping cart.
     This model creates a unique combination constraint on user and product.
     """
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items')
+    # Indexed by unique_together below (user first)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items', db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Reservation hold: units counted in Product.reserved_quantity and when they lapse
+    held_quantity = models.PositiveIntegerField(default=0)
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         # Ensures a user can only have one entry for a given product in their cart.
         unique_together = ('user', 'product')
+        indexes = [
+            models.Index(fields=['user', 'id'], name='cartitem_user_id_idx'),
+            # release_expired_holds: only the (few) lines holding stock, soonest expiry first
+            models.Index(fields=['hold_expires_at'], name='cartitem_active_hold_idx',
+                         condition=models.Q(held_quantity__gt=0)),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in {self.user.username}'s cart"
 
 # 4. Order Model
-class Order(models.Model):
+class Order(VersionedModel):
     """Represents a final, completed order placed by a user."""
     STATUS_CHOICES = (
         ('PENDING', 'Pending'),
@@ -90,13 +151,22 @@ class Order(models.Model):
         ('CANCELLED', 'Cancelled'),
     )
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    # Indexed as the leading column of order_user_created_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders', db_index=False)
     created_at = models.DateTimeField(default=timezone.now)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's order history, newest first, with id as the keyset tiebreak
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # Everyone's orders by date: delta exports (`?since=`) and the admin changelist
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            # The admin's status filter in its (-pk) order
+            models.Index(fields=['status', 'id'], name='order_status_id_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username} - {self.status}"
@@ -114,4 +184,176 @@ class OrderItem(models.Model):
     price_at_purchase = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.quantity} x {self.name} for Order {self.order.id}"
\ No newline at end of file
+        return f"{self.quantity} x {self.name} for Order {self.order.id}"
+
+# 6. Sales rollups (maintained by api/analytics.py)
+class SalesRollup(models.Model):
+    """
+    Counters of placed (not cancelled) orders for one day, in the current time
+    zone. Updated incrementally as orders are placed or cancelled; rebuilt
+    from the orders by `manage.py rebuild_sales_rollups`. Counters are plain
+    integers: an increment and a rebuild may briefly disagree.
+    """
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    COUNTERS = ('orders', 'units', 'revenue')
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    day = models.DateField(unique=True)
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+        ordering = ['day']
+
+
+class DailyCategorySales(SalesRollup):
+    """
+    `orders` counts the orders with at least one item of the category. Items
+    count under their product's category at the time the row is written.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+
+    class Meta:
+        verbose_name_plural = "Daily category sales"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='category_sales_day_uniq'),
+        ]
+
+
+class DailyProductSales(SalesRollup):
+    """`orders` counts the orders with at least one item of the product."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+
+    class Meta:
+        verbose_name_plural = "Daily product sales"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='product_sales_day_uniq'),
+        ]
+
+# 7. Background tasks (run by `manage.py run_workers`, see api/tasks.py)
+class Task(models.Model):
+    """
+    A queued call of a registered task function, deleted once it succeeds.
+    `run_after` is when a worker may take it: its due time while queued, the
+    end of the claiming worker's lease while running (a crashed worker's
+    tasks are taken again once it passes).
+    """
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+    )
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Token of the worker batch holding the task (empty while queued)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            # Workers claim the tasks due first
+            models.Index(fields=['run_after', 'id'], name='task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class DeadTask(models.Model):
+    """A task that failed TASKS['MAX_ATTEMPTS'] times (the dead-letter table)."""
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField()
+    created_at = models.DateTimeField()
+    failed_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-failed_at']
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} (failed {self.attempts}x)"
+
+# 8. Order status history (written by api/fulfilment.py)
+class OrderStatusChange(models.Model):
+    """One status transition of an order: the audit log of fulfilment."""
+    # Indexed as the leading column of order_status_change_idx
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_changes', db_index=False)
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        indexes = [
+            # An order's history, oldest first
+            models.Index(fields=['order', 'changed_at'], name='order_status_change_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status} -> {self.to_status}"
+
+# 9. Frequently bought together (computed by api/recommendations.py)
+class ProductPair(models.Model):
+    """
+    One cell of the product co-occurrence matrix: the number of counted orders
+    containing both products. Stored in both directions; on the diagonal
+    (product == other), the number of counted orders containing the product.
+    """
+    # Indexed as the leading column of product_pair_uniq
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', db_index=False)
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='product_pair_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Products {self.product_id} & {self.other_id}: {self.orders} order(s)"
+
+
+class ProductRecommendation(models.Model):
+    """The TOP_K products most often bought with a product, best (rank 1) first."""
+    # Indexed as the leading column of recommendation_rank_uniq
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations', db_index=False)
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    orders = models.IntegerField(help_text="Counted orders containing both products.")
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            # A product's recommendations in rank order, read by one index range scan
+            models.UniqueConstraint(fields=['product', 'rank'], name='recommendation_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
+
+
+class RecommendationState(models.Model):
+    """Progress of the recommendations job; a single row."""
+    last_order_id = models.BigIntegerField(default=0, help_text="Orders up to this id are counted.")
+    orders = models.IntegerField(default=0, help_text="Counted orders.")
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Orders up to #{self.last_order_id} ({self.orders} counted)"
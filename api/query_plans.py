@@ -0,0 +1,75 @@
+# api/query_plans.py
+"""
+EXPLAIN plans of captured SQL and the full table scans in them.
+
+The query-plan regression tests (QueryPlanTests in api/tests.py) capture the
+queries behind each endpoint and fail when one of them reads a table without
+an index. SQLite's EXPLAIN QUERY PLAN reports such a read as `SCAN <table>`
+(an index scan says `USING [COVERING] INDEX`). PostgreSQL plans are read with
+sequential scans disabled: at test scale a sequential scan is often the
+cheaper plan even when an index fits, so one that still shows up means no
+usable index exists.
+
+A walk along a whole index is not reported: a keyset page ordered by the index
+stops after one page. Tests that rely on a particular index name it as well.
+"""
+
+import json
+import re
+
+from django.db import connection
+
+# Statements with a plan worth checking; SAVEPOINTs, INSERTs and the like are skipped
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+# Subqueries SQLite runs as co-routines or materializes; scanning their rows is no table scan
+_SQLITE_SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)$')
+# The databases' own catalogs (e.g. the statistics behind ApproximateCountPaginator)
+SYSTEM_TABLES = ('sqlite_', 'pg_')
+
+
+def is_explained(sql):
+    return sql.lstrip().upper().startswith(EXPLAINED)
+
+
+def explain(sql, using=connection):
+    """The plan of an (already interpolated, e.g. captured) statement as a list of lines."""
+    with using.cursor() as cursor:
+        if using.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        if using.vendor == 'postgresql':
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+            finally:
+                cursor.execute('RESET enable_seqscan')
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return list(_pg_lines(plan[0]['Plan']))
+        raise NotImplementedError(f'No plan reader for {using.vendor}')
+
+
+def _pg_lines(node, depth=0):
+    relation = f" on {node['Relation Name']}" if 'Relation Name' in node else ''
+    index = f" using {node['Index Name']}" if 'Index Name' in node else ''
+    yield f"{'  ' * depth}{node['Node Type']}{relation}{index}"
+    for child in node.get('Plans', ()):
+        yield from _pg_lines(child, depth + 1)
+
+
+def full_scans(plan, using=connection):
+    """Tables (other than system catalogs) an explain() plan reads with a full table scan."""
+    tables, subqueries = [], set()
+    for line in plan:
+        line = line.strip()
+        if using.vendor == 'sqlite':
+            subquery, match = _SQLITE_SUBQUERY.match(line), _SQLITE_SCAN.match(line)
+            if subquery:
+                subqueries.add(subquery.group(1))
+            elif match:
+                tables.append(match.group(1))
+        elif line.startswith('Seq Scan on '):
+            tables.append(line.split()[3])
+    return [table for table in tables if table not in subqueries and not table.startswith(SYSTEM_TABLES)]
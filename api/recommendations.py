@@ -0,0 +1,202 @@
+# api/recommendations.py
+"""
+"Frequently bought together": product recommendations computed in batch from
+OrderItem by `manage.py update_recommendations`, never on request.
+
+ProductPair holds a sparse product co-occurrence matrix: for every two
+products, the number of counted (not cancelled) orders containing both, and
+on its diagonal the number containing each product. A run:
+  1. streams the OrderItem rows of the orders placed since the last run in
+     order id order, CHUNK_ORDERS orders per transaction, and counts the
+     product pairs of each order (orders with more than MAX_BASKET distinct
+     products are left out: they pair everything with everything);
+  2. adds the counts to ProductPair with INSERT ... ON CONFLICT DO UPDATE
+     every MAX_PAIRS distinct pairs, and moves the watermark
+     (RecommendationState) in the same transaction, so a chunk is counted
+     exactly once even if two runs overlap or one dies half-way;
+  3. re-ranks the products of those orders: scores their pairs seen in at
+     least MIN_ORDERS orders and keeps the TOP_K best in ProductRecommendation,
+     which the product `recommendations` endpoint reads with one index scan.
+Memory is bounded by MAX_PAIRS counters and the ids of the re-ranked
+products, however many order lines there are.
+
+SCORE is 'lift', how many times more often two products are bought together
+than if they were independent, orders(a, b) * N / (orders(a) * orders(b)); or
+'cosine', orders(a, b) / sqrt(orders(a) * orders(b)), which favours popular
+products.
+
+Incremental runs only re-rank the products of new orders: other products'
+scores drift as the order totals grow. Orders cancelled or deleted after they
+were counted stay counted. Orders younger than SETTLE_SECONDS wait for the
+next run, as an order with a lower id may still be committing. `full=True`
+(`--full`) recounts everything.
+"""
+
+import heapq
+import math
+from collections import Counter
+from datetime import timedelta
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .analytics import EXCLUDED_STATUSES, increment
+from .models import Order, OrderItem, ProductPair, ProductRecommendation, RecommendationState
+
+
+def _config():
+    config = {
+        'TOP_K': 10,
+        'MIN_ORDERS': 2,
+        'SCORE': 'lift',
+        'CHUNK_ORDERS': 10000,
+        'MAX_PAIRS': 200000,
+        'MAX_BASKET': 50,
+        'RANK_CHUNK': 500,
+        'SETTLE_SECONDS': 60,
+    }
+    config.update(getattr(settings, 'RECOMMENDATIONS', {}))
+    return config
+
+
+class ConcurrentRun(Exception):
+    """Another run moved the watermark first; this chunk was rolled back."""
+
+
+def lift(together, orders_a, orders_b, total):
+    return together * total / (orders_a * orders_b)
+
+
+def cosine(together, orders_a, orders_b, total):
+    return together / math.sqrt(orders_a * orders_b)
+
+
+SCORES = {'lift': lift, 'cosine': cosine}
+
+
+def _baskets(items):
+    """The distinct product ids of each order, from (order_id, product_id) rows sorted by order."""
+    for _, rows in groupby(items.iterator(chunk_size=5000), key=itemgetter(0)):
+        yield sorted({product_id for _, product_id in rows})
+
+
+def _add(counts):
+    """Adds {(a, b): orders} (a <= b) to ProductPair in both directions, in key order."""
+    rows = []
+    for (a, b), orders in counts.items():
+        rows.append((a, b, orders))
+        if a != b:
+            rows.append((b, a, orders))
+    rows.sort()
+    increment(ProductPair, ('product', 'other'), ('orders',), rows)
+
+
+def _count(after, upto, config, touched):
+    """
+    Counts the orders with ids in (after, upto] and moves the watermark past
+    them, in one transaction. Adds their products to `touched`; returns the
+    number of orders counted.
+    """
+    items = (
+        OrderItem.objects.filter(order_id__gt=after, order_id__lte=upto)
+        .exclude(order__status__in=EXCLUDED_STATUSES)
+        .order_by('order_id').values_list('order_id', 'product_id')
+    )
+    counts, counted = Counter(), 0
+    with transaction.atomic():
+        for basket in _baskets(items):
+            if len(basket) > config['MAX_BASKET']:
+                continue
+            counted += 1
+            touched.update(basket)
+            counts.update(zip(basket, basket))
+            counts.update(combinations(basket, 2))
+            if len(counts) >= config['MAX_PAIRS']:
+                _add(counts)
+                counts.clear()
+        _add(counts)
+        moved = RecommendationState.objects.filter(pk=1, last_order_id=after).update(
+            last_order_id=upto, orders=F('orders') + counted, updated_at=Now(),
+        )
+        if not moved:
+            raise ConcurrentRun(f"Orders after #{after} were counted by another run.")
+    return counted
+
+
+def rank(product_ids, config=None):
+    """Rewrites the ProductRecommendation rows of the given products, RANK_CHUNK products per query."""
+    config = config or _config()
+    score = SCORES[config['SCORE']]
+    total = RecommendationState.objects.get(pk=1).orders
+    product_ids = sorted(product_ids)
+    other_orders = ProductPair.objects.filter(product=OuterRef('other'), other=OuterRef('other')).values('orders')
+
+    for start in range(0, len(product_ids), config['RANK_CHUNK']):
+        chunk = product_ids[start:start + config['RANK_CHUNK']]
+        rows = (
+            ProductPair.objects.filter(product_id__in=chunk)
+            .filter(Q(other=F('product')) | Q(orders__gte=config['MIN_ORDERS']))
+            .annotate(other_orders=Subquery(other_orders[:1]))
+            .order_by('product_id')
+            .values_list('product_id', 'other_id', 'orders', 'other_orders')
+        )
+        recommendations = []
+        for product_id, pairs in groupby(rows.iterator(), key=itemgetter(0)):
+            pairs = list(pairs)
+            own = next((orders for _, other_id, orders, _ in pairs if other_id == product_id), 0)
+            if not own:
+                continue
+            scored = (
+                (score(orders, own, other, total), orders, -other_id)
+                for _, other_id, orders, other in pairs if other_id != product_id and orders > 0 and other
+            )
+            for position, (value, orders, other_id) in enumerate(heapq.nlargest(config['TOP_K'], scored), 1):
+                recommendations.append(ProductRecommendation(
+                    product_id=product_id, recommended_id=-other_id, rank=position, score=value, orders=orders,
+                ))
+        with transaction.atomic():
+            ProductRecommendation.objects.filter(product_id__in=chunk).delete()
+            ProductRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+    return len(product_ids)
+
+
+def update(full=False, config=None):
+    """
+    Counts the orders placed since the last run (all orders with `full`) and
+    re-ranks their products. Returns {'orders': <counted>, 'ranked': <products>,
+    'last_order_id': <watermark>}. Raises ConcurrentRun if another run
+    overtook this one; the chunks counted so far are kept.
+    """
+    config = config or _config()
+    RecommendationState.objects.get_or_create(pk=1)
+    if full:
+        with transaction.atomic():
+            ProductPair.objects.all().delete()
+            RecommendationState.objects.filter(pk=1).update(last_order_id=0, orders=0, updated_at=Now())
+
+    last = RecommendationState.objects.get(pk=1).last_order_id
+    settled = timezone.now() - timedelta(seconds=config['SETTLE_SECONDS'])
+    orders = Order.objects.filter(created_at__lt=settled)
+    counted, touched = 0, set()
+    while True:
+        # The id of the CHUNK_ORDERS-th order after the watermark (or the last one): one index scan
+        ids = orders.filter(pk__gt=last).values_list('pk', flat=True)
+        upto = next(iter(ids.order_by('pk')[config['CHUNK_ORDERS'] - 1:config['CHUNK_ORDERS']]), None)
+        upto = upto or ids.order_by('-pk').first()
+        if upto is None:
+            break
+        counted += _count(last, upto, config, touched)
+        last = upto
+
+    if full:
+        # Every product with orders, and none of the others
+        counted_products = ProductPair.objects.filter(product=F('other')).values_list('product_id', flat=True)
+        ProductRecommendation.objects.exclude(product_id__in=counted_products).delete()
+        touched = set(counted_products)
+    ranked = rank(touched, config)
+    return {'orders': counted, 'ranked': ranked, 'last_order_id': last}
@@ -0,0 +1,39 @@
+# api/renderers.py
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional: without it FastJSONRenderer is plain JSONRenderer
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    For compact, unicode, strict output (DRF's defaults) the bytes are the
+    same as JSONRenderer's as long as the data holds no floats: orjson spells
+    exponents `1e16` where the json module writes `1e+16`, and writes NaN as
+    null. Use it for representations without floats (api/representations.py).
+    Indented output, other JSON settings and anything orjson cannot encode go
+    through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or not (self.compact and self.strict and not self.ensure_ascii)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Dates and times go to DRF's encoder, which formats them differently from orjson
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer: escape the two characters that are valid JSON but not valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,202 @@
+# api/representations.py
+"""
+Read-only list representations built directly as dicts.
+
+On a large page, ProductSerializer and OrderSerializer spend most of their
+time per row instantiating fields, resolving sources, calling
+SerializerMethodFields and nesting serializers. The functions here produce the
+same dicts (keys, order and value formatting; the tests compare rendered
+bytes) from rows loaded with only the columns they read. FastListMixin serves
+viewset `list` pages through them and FastJSONRenderer.
+
+Keep them in step with the serializers in api/serializers.py.
+"""
+
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from operator import attrgetter
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .renderers import FastJSONRenderer, orjson
+from .sparse import SparseFieldsetMixin
+
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    """DecimalField(decimal_places=2) as DRF renders it: '9.50'."""
+    return f'{value.quantize(CENT):f}'
+
+
+def _datetime(value, tz):
+    """DateTimeField as DRF renders it: ISO 8601 in the current time zone, UTC as 'Z'."""
+    if not value:
+        return None
+    if tz is not None and value.tzinfo is not tz:
+        value = value.astimezone(tz)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _datetimes(values, tz):
+    """_datetime() over a page; UTC pages are formatted by orjson in one call (same strings)."""
+    if orjson is not None and tz is dt_timezone.utc and all(value is None or value.tzinfo is tz for value in values):
+        return orjson.loads(orjson.dumps(values, option=orjson.OPT_UTC_Z))
+    return [_datetime(value, tz) for value in values]
+
+
+def _prefetched(instance, name):
+    """A prefetched to-many relation without cloning a queryset per row, as `.all()` does."""
+    cache = getattr(instance, '_prefetched_objects_cache', {})
+    return cache[name] if name in cache else getattr(instance, name).all()
+
+
+def _timezone():
+    if not settings.USE_TZ:
+        return None
+    tz = timezone.get_current_timezone()
+    # Database rows come back in datetime.timezone.utc: skip converting them to ZoneInfo('UTC')
+    return dt_timezone.utc if getattr(tz, 'key', None) == 'UTC' else tz
+
+
+# ProductSerializer (with the category joined by select_related)
+PRODUCT_FIELDS = (
+    'id', 'name', 'description', 'price', 'stock_quantity', 'image_url', 'created_date',
+    'category', 'category__name',
+)
+
+
+def _sparse(rows, values, fields, dates=None):
+    """Dicts of just the selected `fields`, in representation order; `values` maps field -> row -> value."""
+    getters = [(name, get) for name, get in values.items() if name in fields]
+    data = [{name: get(row) for name, get in getters} for row in rows]
+    if dates is not None:
+        name, formatted = dates
+        for item, value in zip(data, formatted):
+            item[name] = value
+    return data
+
+
+# A sparse fieldset (api/sparse.py) loads only the columns of its fields: read nothing else
+PRODUCT_VALUES = {
+    'id': attrgetter('id'),
+    'name': attrgetter('name'),
+    'description': attrgetter('description'),
+    'price': lambda product: _money(product.price),
+    'stock_quantity': attrgetter('stock_quantity'),
+    'image_url': attrgetter('image_url'),
+    'created_date': lambda product: None,  # formatted per page, see _sparse()
+    'category_detail': lambda product: {'id': product.category.id, 'name': product.category.name},
+    'is_in_stock': lambda product: product.stock_quantity > 0,
+}
+
+
+def products(rows, fields=None):
+    rows = list(rows)
+    if fields is not None:
+        dates = None
+        if 'created_date' in fields:
+            dates = ('created_date', _datetimes([product.created_date for product in rows], _timezone()))
+        return _sparse(rows, PRODUCT_VALUES, fields, dates)
+
+    created = _datetimes([product.created_date for product in rows], _timezone())
+    return [
+        {
+            'id': product.id,
+            'name': product.name,
+            'description': product.description,
+            'price': _money(product.price),
+            'stock_quantity': product.stock_quantity,
+            'image_url': product.image_url,
+            'created_date': created_date,
+            'category_detail': {'id': product.category.id, 'name': product.category.name},
+            'is_in_stock': product.stock_quantity > 0,
+        }
+        for product, created_date in zip(rows, created)
+    ]
+
+
+# OrderSerializer (with `items` prefetched)
+ORDER_FIELDS = ('id', 'user', 'total_amount', 'status', 'created_at')
+
+
+def _order_items(order):
+    return [
+        {
+            'id': item.id,
+            'product': item.product_id,
+            'name': item.name,
+            'quantity': item.quantity,
+            'price_at_purchase': _money(item.price_at_purchase),
+        }
+        for item in _prefetched(order, 'items')
+    ]
+
+
+ORDER_VALUES = {
+    'id': attrgetter('id'),
+    'user': attrgetter('user_id'),
+    'total_amount': lambda order: _money(order.total_amount),
+    'status': attrgetter('status'),
+    'created_at': lambda order: None,  # formatted per page, see _sparse()
+    'items': _order_items,
+}
+
+
+def orders(rows, fields=None):
+    rows = list(rows)
+    if fields is not None:
+        dates = None
+        if 'created_at' in fields:
+            dates = ('created_at', _datetimes([order.created_at for order in rows], _timezone()))
+        return _sparse(rows, ORDER_VALUES, fields, dates)
+
+    created = _datetimes([order.created_at for order in rows], _timezone())
+    return [
+        {
+            'id': order.id,
+            'user': order.user_id,
+            'total_amount': _money(order.total_amount),
+            'status': order.status,
+            'created_at': created_at,
+            'items': _order_items(order),
+        }
+        for order, created_at in zip(rows, created)
+    ]
+
+
+class _Represented:
+    """Stands in for `get_serializer(page, many=True)`, of which list views only read `.data`."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FastListMixin(SparseFieldsetMixin):
+    """
+    Serves viewset `list` pages with `list_representation` (one of the functions
+    above, given the sparse fieldset if any) instead of the serializer, loading
+    only `list_fields` and rendering JSON with FastJSONRenderer. Other actions
+    are untouched.
+    """
+    list_fields = ()
+    list_representation = None
+
+    def prune_queryset(self, queryset):
+        if self.action == 'list' and self.list_fields and self.sparse_selection() is None:
+            return queryset.only(*self.list_fields)
+        return super().prune_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list' and kwargs.get('many') and args:
+            return _Represented(self.list_representation(args[0], self.sparse_selection()))
+        return super().get_serializer(*args, **kwargs)
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action == 'list':
+            renderers = [FastJSONRenderer() if type(renderer) is JSONRenderer else renderer for renderer in renderers]
+        return renderers
@@ -0,0 +1,279 @@
+# api/reservations.py
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import CartItem, Product
+
+
+def hold_ttl():
+    """How long a cart line keeps its units reserved (settings.CART_HOLD_TTL_SECONDS)."""
+    return timedelta(seconds=getattr(settings, 'CART_HOLD_TTL_SECONDS', 15 * 60))
+
+
+def _adjust_reserved(product_id, delta):
+    """
+    Moves `delta` units in or out of Product.reserved_quantity in one UPDATE.
+    Growing a hold only succeeds while enough unreserved stock is left.
+    """
+    products = Product.objects.filter(pk=product_id)
+    if delta > 0:
+        products = products.filter(stock_quantity__gte=F('reserved_quantity') + delta)
+    return products.update(reserved_quantity=F('reserved_quantity') + delta) == 1
+
+
+@transaction.atomic
+def hold(user, product_id, quantity):
+    """
+    Adds or updates a cart line and (re)takes a time-limited hold for it.
+
+    Returns (cart_item, created). Raises ValidationError when the requested
+    quantity is not available once other shoppers' holds are accounted for.
+    """
+    expires_at = timezone.now() + hold_ttl()
+
+    for attempt in range(2):
+        cart_item = CartItem.objects.select_for_update().filter(user=user, product_id=product_id).first()
+        delta = quantity - (cart_item.held_quantity if cart_item else 0)
+        if not delta or _adjust_reserved(product_id, delta):
+            break
+        if attempt == 0:
+            # Lapsed holds may still be counted; release them for this product and retry once
+            release_expired(product_ids=[product_id])
+    else:
+        product = Product.objects.get(pk=product_id)
+        raise serializers.ValidationError(
+            f"Only {max(product.available_quantity, 0)} units of {product.name} are available."
+        )
+
+    if cart_item is None:
+        try:
+            with transaction.atomic():
+                cart_item = CartItem.objects.create(
+                    user=user, product_id=product_id, quantity=quantity,
+                    held_quantity=quantity, hold_expires_at=expires_at,
+                )
+            return cart_item, True
+        except IntegrityError:
+            # A concurrent first add of this product inserted the line: update it instead,
+            # giving back what it held (its units are part of the `quantity` just reserved)
+            cart_item = CartItem.objects.select_for_update().get(user=user, product_id=product_id)
+            if cart_item.held_quantity:
+                _adjust_reserved(product_id, -cart_item.held_quantity)
+
+    cart_item.quantity = quantity
+    cart_item.held_quantity = quantity
+    cart_item.hold_expires_at = expires_at
+    cart_item.save(update_fields=['quantity', 'held_quantity', 'hold_expires_at'])
+    return cart_item, False
+
+
+def _short(growing):
+    """The products (in id order) with fewer unreserved units than {product_id: units} asks for."""
+    return [
+        product for product in Product.objects.filter(pk__in=growing).order_by('pk')
+        if product.available_quantity < growing[product.pk]
+    ]
+
+
+def _grow(growing):
+    """
+    Adds {product_id: units} to Product.reserved_quantity in one UPDATE, for
+    every product or (when any is short) for none. Returns the rows updated:
+    fewer than all only if a concurrent hold took stock in between.
+    """
+    wanted = Case(*[When(pk=pk, then=delta) for pk, delta in growing.items()], output_field=IntegerField())
+    short = Product.objects.filter(pk__in=growing, stock_quantity__lt=F('reserved_quantity') + wanted)
+    return Product.objects.filter(
+        ~Exists(short), pk__in=growing, stock_quantity__gte=F('reserved_quantity') + wanted
+    ).update(reserved_quantity=F('reserved_quantity') + wanted)
+
+
+@transaction.atomic
+def hold_many(user, quantities):
+    """
+    Sets many cart lines at once from a {product_id: quantity} map; quantity 0
+    removes the line. Missing lines are inserted empty and every line is locked
+    before any hold moves; holds are then adjusted with at most two CASE
+    updates, lines written with one bulk INSERT .. ON CONFLICT and removed with
+    one DELETE. Raises ValidationError (rolling everything back) if any increase
+    does not fit, even once lapsed holds on the short products are released.
+    """
+    expires_at = timezone.now() + hold_ttl()
+
+    # 1. Insert missing lines empty: a concurrent first add of the same product then
+    #    waits on (or conflicts with) this row instead of being overwritten below
+    CartItem.objects.bulk_create(
+        [
+            CartItem(user=user, product_id=product_id, quantity=0, held_quantity=0, version=0)
+            for product_id, quantity in quantities.items() if quantity > 0
+        ],
+        ignore_conflicts=True,
+    )
+
+    # 2. Grow holds only where enough unreserved stock is left, against the locked lines
+    for attempt in range(2):
+        existing = {
+            product_id: (held_quantity, version)
+            for product_id, held_quantity, version in CartItem.objects.select_for_update()
+            .filter(user=user, product_id__in=quantities)
+            .values_list('product_id', 'held_quantity', 'version')
+        }
+        deltas = {
+            product_id: quantity - existing.get(product_id, (0, 0))[0]
+            for product_id, quantity in quantities.items()
+        }
+        growing = {product_id: delta for product_id, delta in deltas.items() if delta > 0}
+        grown = _grow(growing) if growing else 0
+        if grown == len(growing):
+            break
+        if attempt == 0 and not grown:
+            # Lapsed holds may still be counted; release them for the short products and retry once
+            release_expired(product_ids=[product.pk for product in _short(growing)])
+            continue
+        names = [product.name for product in _short(growing)]
+        raise serializers.ValidationError(f"Not enough stock available for: {', '.join(names)}.")
+
+    # 3. Shrink the other holds freely
+    shrinking = {product_id: delta for product_id, delta in deltas.items() if delta < 0}
+    if shrinking:
+        Product.objects.filter(pk__in=shrinking).update(
+            reserved_quantity=F('reserved_quantity') + Case(
+                *[When(pk=pk, then=delta) for pk, delta in shrinking.items()], output_field=IntegerField()
+            )
+        )
+
+    # 4. Write the remaining lines, keeping row versions increasing
+    CartItem.objects.bulk_create(
+        [
+            CartItem(
+                user=user, product_id=product_id, quantity=quantity,
+                held_quantity=quantity, hold_expires_at=expires_at,
+                version=existing[product_id][1] + 1,
+            )
+            for product_id, quantity in quantities.items() if quantity > 0
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'product'],
+        update_fields=['quantity', 'held_quantity', 'hold_expires_at', 'version', 'updated_at'],
+    )
+
+    # 5. Drop zeroed lines
+    removed = [product_id for product_id, quantity in quantities.items() if quantity == 0]
+    if removed:
+        CartItem.objects.filter(user=user, product_id__in=removed).delete()
+
+
+@transaction.atomic
+def write_back(user, quantities):
+    """
+    Writes cart line quantities changed outside the database (CacheCartStore,
+    api/carts.py) without taking new holds: units held above a line's new
+    quantity are given back, increases stay unheld (checkout takes them from
+    unreserved stock, like a lapsed hold). Three statements whatever the number
+    of lines. Lines removed meanwhile are skipped; returns the product ids written.
+    """
+    held = dict(
+        CartItem.objects.select_for_update()
+        .filter(user=user, product_id__in=quantities)
+        .values_list('product_id', 'held_quantity')
+    )
+    if not held:
+        return set()
+
+    # 1. Give back the units held above the new quantities
+    excess = {
+        product_id: held_quantity - quantities[product_id]
+        for product_id, held_quantity in held.items() if held_quantity > quantities[product_id]
+    }
+    if excess:
+        Product.objects.filter(pk__in=excess).update(
+            reserved_quantity=F('reserved_quantity') - Case(
+                *[When(pk=pk, then=units) for pk, units in excess.items()], output_field=IntegerField()
+            )
+        )
+
+    # 2. Write the lines, keeping row versions increasing
+    CartItem.objects.filter(user=user, product_id__in=held).update(
+        quantity=Case(
+            *[When(product_id=pk, then=quantities[pk]) for pk in held], output_field=IntegerField()
+        ),
+        held_quantity=Case(
+            *[When(product_id=pk, then=min(units, quantities[pk])) for pk, units in held.items()],
+            output_field=IntegerField(),
+        ),
+        version=F('version') + 1,
+        updated_at=Now(),
+    )
+    return set(held)
+
+
+@transaction.atomic
+def release(cart_item):
+    """Gives a cart line's held units back before the line is removed."""
+    if cart_item.held_quantity:
+        _adjust_reserved(cart_item.product_id, -cart_item.held_quantity)
+        CartItem.objects.filter(pk=cart_item.pk).update(held_quantity=0, hold_expires_at=None)
+        cart_item.held_quantity = 0
+        cart_item.hold_expires_at = None
+
+
+def release_expired(batch_size=1000, now=None, product_ids=None):
+    """
+    Releases every lapsed hold, `batch_size` cart lines per transaction.
+
+    Each batch costs three statements regardless of its size: claim the
+    expired lines, subtract their units per product with one CASE update, and
+    clear the lines. Returns the number of cart lines released.
+    """
+    now = now or timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    released = 0
+
+    while True:
+        with transaction.atomic():
+            expired = CartItem.objects.filter(held_quantity__gt=0, hold_expires_at__lte=now)
+            if product_ids is not None:
+                expired = expired.filter(product_id__in=product_ids)
+            batch = list(
+                expired.select_for_update(skip_locked=skip_locked)
+                .order_by('hold_expires_at')
+                .values_list('id', 'product_id', 'held_quantity')[:batch_size]
+            )
+            if not batch:
+                return released
+
+            units = Counter()
+            for _, product_id, held_quantity in batch:
+                units[product_id] += held_quantity
+            Product.objects.filter(pk__in=units).update(
+                reserved_quantity=F('reserved_quantity') - Case(
+                    *[When(pk=product_id, then=count) for product_id, count in units.items()],
+                    output_field=IntegerField(),
+                )
+            )
+            CartItem.objects.filter(pk__in=[row[0] for row in batch]).update(
+                held_quantity=0, hold_expires_at=None
+            )
+            released += len(batch)
+
+        if len(batch) < batch_size:
+            return released
+
+
+def reconcile():
+    """Recomputes every Product.reserved_quantity from the cart lines that still hold units."""
+    held = (
+        CartItem.objects.filter(product=OuterRef('pk'), held_quantity__gt=0)
+        .values('product')
+        .annotate(units=Sum('held_quantity'))
+        .values('units')
+    )
+    return Product.objects.update(reserved_quantity=Coalesce(Subquery(held), 0))
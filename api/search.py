@@ -0,0 +1,101 @@
+# api/search.py
+
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+# The index tables are created and kept in sync by migration 0004_product_search_index.
+# Matches are joined to api_product (rather than correlated per row) so the index
+# drives the query and the rank is computed once per matching row.
+SEARCH_SQL = {
+    'sqlite': {
+        'table': 'api_product_fts',
+        'join': "api_product_fts.rowid = api_product.id",
+        'match': "api_product_fts MATCH %s",
+        # bm25() is "lower is better"; negate it so every backend sorts rank descending.
+        # Column weights: name, description, category_name.
+        'rank': "-bm25(api_product_fts, 10.0, 1.0, 5.0)",
+        'rank_params': False,
+        'rebuild': [
+            "DELETE FROM api_product_fts",
+            "INSERT INTO api_product_fts (rowid, name, description, category_name) "
+            "SELECT p.id, p.name, p.description, c.name "
+            "FROM api_product p JOIN api_category c ON c.id = p.category_id",
+        ],
+    },
+    'postgresql': {
+        'table': 'api_product_search',
+        'join': "api_product_search.product_id = api_product.id",
+        'match': "api_product_search.document @@ to_tsquery('simple', %s)",
+        'rank': "ts_rank(api_product_search.document, to_tsquery('simple', %s))",
+        'rank_params': True,
+        'rebuild': [
+            "TRUNCATE api_product_search",
+            "INSERT INTO api_product_search (product_id, document) "
+            "SELECT p.id, api_product_document(p.name, p.description, c.name) "
+            "FROM api_product p JOIN api_category c ON c.id = p.category_id",
+        ],
+    },
+}
+
+
+def is_available(using=connection):
+    """True when the current database has a full-text index for products."""
+    return using.vendor in SEARCH_SQL
+
+
+def build_query(text, vendor=None):
+    """
+    Turns free text into an index query where every word must match as a prefix,
+    mirroring SearchFilter's "all terms, partial match" behaviour. Returns None
+    when the text contains no searchable words.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    if (vendor or connection.vendor) == 'postgresql':
+        return ' & '.join(f'{word}:*' for word in words)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_products(queryset, text, ranked=True):
+    """
+    Restricts a Product queryset to index matches, best match first when `ranked`.
+    The rank is a regular `search_rank` annotation, so it can be filtered on
+    (keyset pagination does) as well as ordered by.
+    """
+    query = build_query(text)
+    if query is None:
+        return queryset
+    sql = SEARCH_SQL[connection.vendor]
+    queryset = queryset.extra(tables=[sql['table']], where=[sql['join'], sql['match']], params=[query])
+    if ranked:
+        rank = RawSQL(sql['rank'], [query] if sql['rank_params'] else [], output_field=FloatField())
+        queryset = queryset.annotate(search_rank=rank).order_by('-search_rank', 'pk')
+    return queryset
+
+
+def rebuild_index():
+    """Repopulates the product index from scratch (e.g. after restoring a dump without triggers)."""
+    with connection.cursor() as cursor:
+        for statement in SEARCH_SQL[connection.vendor]['rebuild']:
+            cursor.execute(statement)
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    `?search=` backed by the full-text index instead of OR-ed icontains scans.
+
+    Results are ranked by relevance unless the client also asks for an explicit
+    `?ordering=`. Databases without an index fall back to DRF's SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not is_available() or build_query(text) is None:
+            return super().filter_queryset(request, queryset, view)
+        ranked = not request.query_params.get('ordering')
+        return search_products(queryset, text, ranked=ranked)
@@ -1,8 +1,12 @@
 # api/serializers.py
 
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Category, Product, CartItem, Order, OrderItem
-from django.db import transaction
+from .models import Category, Product, CartItem, Order, OrderItem, ProductRecommendation
+from .carts import cart_store
+from .sparse import SparseFieldsMixin
 
 # 1. Category Serializer (Read/Write for simple category management)
 class CategorySerializer(serializers.ModelSerializer):
@@ -12,13 +16,17 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 # 2. Product Serializer (Read/Write for CRUD)
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_detail = CategorySerializer(source='category', read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True
     )
     is_in_stock = serializers.SerializerMethodField()
 
+    # Sparse fieldsets (?fields= / ?expand=, see api/sparse.py)
+    expandable_fields = ('category_detail',)
+    method_field_sources = {'is_in_stock': ('stock_quantity',)}
+
     class Meta:
         model = Product
         fields = [
@@ -42,17 +50,24 @@ class SimpleProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name', 'price', 'image_url', 'stock_quantity']
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = SimpleProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True) # Used for adding/updating items
     sub_total = serializers.SerializerMethodField()
 
+    expandable_fields = ('product',)
+    # `line_total` is annotated by CartItemViewSet; the fallback reads these
+    method_field_sources = {'sub_total': ('quantity', 'product__price')}
+
     class Meta:
         model = CartItem
         fields = ['id', 'product', 'product_id', 'quantity', 'sub_total']
         read_only_fields = ['user']
 
     def get_sub_total(self, obj):
+        # CartItemViewSet annotates `line_total` in the database
+        if hasattr(obj, 'line_total'):
+            return obj.line_total
         return obj.quantity * obj.product.price
 
     def validate(self, data):
@@ -76,6 +91,40 @@ class CartItemSerializer(serializers.ModelSerializer):
 
         return data
 
+class CartSummarySerializer(serializers.Serializer):
+    """Cart-wide figures, computed by one aggregate query (see CartItemViewSet.list)."""
+    line_count = serializers.IntegerField()
+    total_quantity = serializers.IntegerField()
+    grand_total = serializers.DecimalField(max_digits=12, decimal_places=2)
+    out_of_stock_lines = serializers.IntegerField()
+
+class CartBatchLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0) # 0 removes the line
+
+class CartBatchSerializer(serializers.Serializer):
+    """Sets many cart lines in one request (POST /cart/items/batch/)."""
+    items = CartBatchLineSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_items(self, items):
+        quantities = {}
+        for line in items:
+            if line['product_id'] in quantities:
+                raise serializers.ValidationError(f"Product {line['product_id']} is listed more than once.")
+            quantities[line['product_id']] = line['quantity']
+
+        # One IN query validates every line
+        rows = Product.objects.filter(pk__in=quantities).order_by().values_list('pk', 'name', 'stock_quantity')
+        products = {pk: (name, stock) for pk, name, stock in rows}
+        missing = sorted(set(quantities) - set(products))
+        if missing:
+            raise serializers.ValidationError(f"Products do not exist: {missing}.")
+        for product_id, quantity in quantities.items():
+            name, stock = products[product_id]
+            if quantity > stock:
+                raise serializers.ValidationError(f"Only {stock} units of {name} are in stock.")
+        return quantities
+
 # 4. OrderItem Serializer (Snapshot for order history)
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -84,60 +133,80 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = fields # Order items are permanent records
 
 # 5. Order Serializer (Read/Write for history and creation)
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status = serializers.CharField(read_only=True) # Status should not be set by API user
     
     # Custom field to accept a "cart" signal for order creation
     place_order = serializers.BooleanField(write_only=True, required=False)
+
+    expandable_fields = ('items',)
     
     class Meta:
         model = Order
         fields = ['id', 'user', 'total_amount', 'status', 'created_at', 'items', 'place_order']
         read_only_fields = ['user', 'total_amount', 'created_at']
 
-    @transaction.atomic
     def create(self, validated_data):
-        """Transactional logic to move items from cart to order."""
+        """Transactional logic to move items from cart to order (see api/checkout.py)."""
         user = self.context['request'].user
-        
-        # 1. Retrieve cart items for the user
-        cart_items = CartItem.objects.filter(user=user).select_related('product')
+        # Writes back cart changes still pending in the cart store in the same transaction
+        return cart_store().checkout(user)
 
-        if not cart_items.exists():
-            raise serializers.ValidationError("Cannot place an order with an empty cart.")
-        
-        # 2. Calculate total and check stock again (critical security check)
-        total_amount = sum(item.quantity * item.product.price for item in cart_items)
-
-        # 3. Create the Order
-        order = Order.objects.create(user=user, total_amount=total_amount)
-
-        # 4. Create OrderItems and deduct stock
-        order_items_to_create = []
-        for cart_item in cart_items:
-            product = cart_item.product
-            
-            # Final stock validation
-            if cart_item.quantity > product.stock_quantity:
-                raise serializers.ValidationError(f"Insufficient stock for {product.name}.")
-                
-            # Create OrderItem snapshot
-            order_items_to_create.append(OrderItem(
-                order=order,
-                product=product,
-                name=product.name,
-                quantity=cart_item.quantity,
-                price_at_purchase=product.price 
-            ))
-            
-            # Deduct stock
-            product.stock_quantity -= cart_item.quantity
-            product.save() # Save product with new stock level
-
-        OrderItem.objects.bulk_create(order_items_to_create)
-
-        # 5. Clear the Cart
-        cart_items.delete()
-
-        return order
\ No newline at end of file
+
+# 6. Export parameters (streaming NDJSON/CSV exports, see api/exports.py)
+class ExportParamsSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=['ndjson', 'csv'], default='ndjson')
+    since = serializers.DateTimeField(required=False) # created at/after (delta exports)
+    after_id = serializers.IntegerField(required=False, min_value=0) # id watermark (delta exports)
+
+
+# 7. Sales reports (rollups, see api/analytics.py)
+class SalesReportParamsSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False) # first day; default 30 days up to `end`
+    end = serializers.DateField(required=False) # last day (inclusive); default today
+    rank_by = serializers.ChoiceField(choices=['revenue', 'units', 'orders'], default='revenue')
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+
+    def validate(self, data):
+        end = data.get('end') or timezone.localdate()
+        start = data.get('start') or end - timedelta(days=29)
+        if start > end:
+            raise serializers.ValidationError({'start': "Must not be after end."})
+        if (end - start).days >= 366:
+            raise serializers.ValidationError({'start': "Reports cover at most 366 days."})
+        return {**data, 'start': start, 'end': end}
+
+
+class SalesFiguresSerializer(serializers.Serializer):
+    orders = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    average_order_value = serializers.DecimalField(max_digits=14, decimal_places=2, allow_null=True)
+
+
+class DailySalesSerializer(SalesFiguresSerializer):
+    day = serializers.DateField()
+
+
+class RankedSalesSerializer(SalesFiguresSerializer):
+    """A category or product with its sales."""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+# 8. Order status transitions (api/fulfilment.py)
+class OrderTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=50000
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
+
+# 9. Frequently bought together (api/recommendations.py)
+class ProductRecommendationSerializer(serializers.ModelSerializer):
+    product = SimpleProductSerializer(source='recommended', read_only=True)
+
+    class Meta:
+        model = ProductRecommendation
+        fields = ['rank', 'score', 'orders', 'product']
@@ -0,0 +1,70 @@
+# api/signals.py
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import analytics, cache
+from .authentication import token_cache
+from .models import Category, Order, Product
+
+User = get_user_model()
+
+
+# --- Catalog response cache invalidation (api/cache.py) ---
+# Queryset.update() does not send signals; those call sites bump explicitly.
+
+@receiver([post_save, post_delete], sender=Product, dispatch_uid='catalog_cache_product')
+def invalidate_product(sender, instance, **kwargs):
+    cache.bump_products([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Category, dispatch_uid='catalog_cache_category')
+def invalidate_category(sender, instance, **kwargs):
+    cache.bump_categories()
+
+
+# --- Cached token authentication (api/authentication.py) ---
+
+@receiver([post_save, post_delete], sender=Token, dispatch_uid='token_cache_token')
+def invalidate_token(sender, instance, **kwargs):
+    # Rotation deletes the old key; a save covers a token moved to another user
+    token_cache.invalidate([instance.key])
+
+
+@receiver([post_save, post_delete], sender=User, dispatch_uid='token_cache_user')
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    # Deactivation, permission and profile changes; logins only touch last_login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    token_cache.invalidate_user(instance.pk)
+
+
+# --- Sales rollups (api/analytics.py) ---
+# Orders are counted once placed and uncounted while cancelled.
+
+@receiver(pre_save, sender=Order, dispatch_uid='sales_rollups_order_status_before')
+def remember_order_status(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or instance._state.adding or (update_fields is not None and 'status' not in update_fields):
+        return
+    instance._saved_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order, dispatch_uid='sales_rollups_order_status')
+def roll_up_order(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if analytics.is_counted(instance.status):
+            analytics.record_orders([instance.pk])
+        return
+    before = instance.__dict__.pop('_saved_status', None)
+    if before is not None and analytics.is_counted(before) != analytics.is_counted(instance.status):
+        analytics.record_orders([instance.pk], 1 if analytics.is_counted(instance.status) else -1)
+
+
+@receiver(pre_delete, sender=Order, dispatch_uid='sales_rollups_order_delete')
+def roll_down_order(sender, instance, **kwargs):
+    if analytics.is_counted(instance.status):
+        analytics.record_deletion([instance.pk])
@@ -0,0 +1,176 @@
+# api/sparse.py
+"""
+Sparse fieldsets for read requests.
+
+`?fields=id,name,price` returns only those fields. Nested relations (a
+serializer's `expandable_fields`, e.g. `category_detail`) are left out of a
+sparse response unless listed too, or added with `?expand=category_detail`.
+Without `?fields=` the representation is unchanged, every relation included.
+
+SparseFieldsMixin prunes the serializer. SparseFieldsetMixin prunes the
+viewset's query to match: only() the columns the selected fields read, and
+select_related()/prefetch_related() only the selected relations.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+_readable = {}  # serializer class -> names of its readable fields
+
+
+def _readable_fields(serializer_class):
+    if serializer_class not in _readable:
+        _readable[serializer_class] = [
+            name for name, field in serializer_class().fields.items() if not field.write_only
+        ]
+    return _readable[serializer_class]
+
+
+def _names(request, param):
+    return [name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()]
+
+
+def sparse_selection(serializer_class, request):
+    """
+    The field names a read request selects, or None for the full representation.
+    Raises ValidationError for names the serializer does not have.
+    """
+    if request is None or request.method not in SAFE_METHODS or not hasattr(request, 'query_params'):
+        return None
+    fields, expand = _names(request, FIELDS_PARAM), _names(request, EXPAND_PARAM)
+    readable = _readable_fields(serializer_class)
+    expandable = getattr(serializer_class, 'expandable_fields', ())
+
+    errors = {}
+    unknown = [name for name in fields if name not in readable]
+    if unknown:
+        errors[FIELDS_PARAM] = [f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(readable)}."]
+    unknown = [name for name in expand if name not in expandable]
+    if unknown:
+        errors[EXPAND_PARAM] = [f"Cannot expand: {', '.join(unknown)}. Choose from: {', '.join(expandable)}."]
+    if errors:
+        raise serializers.ValidationError(errors)
+    if not fields:
+        return None  # `expand` alone: everything is expanded already
+    return frozenset(fields) | frozenset(expand)
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin: drops the fields a request's `?fields=`/`?expand=` leave out.
+
+    `method_field_sources` names the columns (`relation__column` for joined
+    ones) each SerializerMethodField reads, so the query can be pruned too.
+    """
+    expandable_fields = ()
+    method_field_sources = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = sparse_selection(type(self), self.context.get('request'))
+        if selection is not None:
+            fields = {name: field for name, field in fields.items() if name in selection}
+        return fields
+
+
+def _column_paths(model, field, prefix=''):
+    """Column paths (for only()) a plain or related field reads; None when it can't be told."""
+    source = field.source
+    if source == '*' or '.' in source:
+        return None
+    try:
+        model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None  # a property or method
+    return [prefix + source]
+
+
+def queryset_plan(serializer_class, selection):
+    """
+    (columns, select_related, prefetch_related) serving the selected fields.
+    `columns` is None when some selected field reads something other than
+    known columns, in which case no column is deferred.
+    """
+    serializer = serializer_class()
+    model = serializer_class.Meta.model
+    columns, joins, prefetches = {model._meta.pk.name}, set(), set()
+
+    for name in selection:
+        field = serializer.fields[name]
+        if isinstance(field, serializers.ListSerializer):
+            prefetches.add(field.source)
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            # A nested object: join it and load the columns its own fields read
+            relation = field.source
+            related_model = model._meta.get_field(relation).related_model
+            joins.add(relation)
+            paths = [relation, f'{relation}__{related_model._meta.pk.name}']
+            for nested in field.fields.values():
+                nested_paths = _column_paths(related_model, nested, f'{relation}__')
+                if nested_paths is None:
+                    nested_paths = [f'{relation}__{column.name}' for column in related_model._meta.concrete_fields]
+                paths += nested_paths
+        elif isinstance(field, serializers.SerializerMethodField):
+            paths = serializer_class.method_field_sources.get(name)
+        else:
+            paths = _column_paths(model, field)
+
+        if paths is None:
+            columns = None
+        elif columns is not None:
+            columns.update(paths)
+        for path in paths or ():
+            if '__' in path:
+                joins.add(path.split('__')[0])
+
+    if columns is not None:
+        columns.update(joins)  # the foreign keys themselves
+    return columns, joins, prefetches
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin: prunes the queryset of `list`/`retrieve` to the request's
+    sparse fieldset (see the module docstring). Keyset pagination's ordering
+    columns are always loaded, so encoding cursors never hits a deferred field.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def sparse_selection(self):
+        if not hasattr(self, '_sparse_selection'):
+            self._sparse_selection = sparse_selection(self.get_serializer_class(), self.request)
+        return self._sparse_selection
+
+    def filter_queryset(self, queryset):
+        return self.prune_queryset(super().filter_queryset(queryset))
+
+    def prune_queryset(self, queryset):
+        if self.action not in self.sparse_actions:
+            return queryset
+        selection = self.sparse_selection()
+        if selection is None:
+            return queryset
+
+        columns, joins, prefetches = queryset_plan(self.get_serializer_class(), selection)
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if joins:
+            queryset = queryset.select_related(*joins)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if columns is not None:
+            columns |= self._ordering_columns(queryset)
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def _ordering_columns(self, queryset):
+        get_ordering = getattr(self.paginator, 'get_ordering', None)
+        if self.action != 'list' or get_ordering is None:
+            return set()
+        names = {name.lstrip('-') for name in get_ordering(self.request, queryset, self)}
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        return names & concrete
@@ -0,0 +1,190 @@
+# api/tasks.py
+"""
+Database-backed background tasks.
+
+Code that should not run inside a request (rollups, notifications, ...)
+registers a function with @task('<name>') and queues calls to it with
+enqueue('<name>', *args). Arguments must be JSON serializable. Calls are
+inserted into the Task table once the current transaction commits, so a
+rolled back request queues nothing. `manage.py run_workers` runs them.
+
+Workers claim due tasks in batches with one guarded UPDATE (after a
+SELECT ... FOR UPDATE SKIP LOCKED where the database has it), so two workers
+never run the same call. A claimed task is leased for LEASE_SECONDS and
+taken again after that if its worker died. A call and the deletion of its
+task commit together: the database writes of a successful call happen once.
+A failing call is retried after an exponential backoff (BACKOFF_SECONDS,
+doubled per attempt, capped at MAX_BACKOFF_SECONDS, jittered); after
+MAX_ATTEMPTS it moves to the DeadTask table.
+"""
+
+import logging
+import random
+import traceback
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import DeadTask, Task
+
+logger = logging.getLogger('api.tasks')
+
+
+def _config():
+    config = {
+        'MAX_ATTEMPTS': 5,
+        'BACKOFF_SECONDS': 10,
+        'MAX_BACKOFF_SECONDS': 60 * 60,
+        'LEASE_SECONDS': 5 * 60,
+        'BATCH_SIZE': 10,
+    }
+    config.update(getattr(settings, 'TASKS', {}))
+    return config
+
+
+# name -> task function
+registry = {}
+
+
+def task(name):
+    """Registers the decorated function as the task `name`."""
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, *args, **kwargs):
+    """Queues a call of the task `name` once the current transaction commits."""
+    if name not in registry:
+        raise KeyError(f"Unknown task {name!r}.")
+    transaction.on_commit(lambda: Task.objects.create(name=name, args=list(args), kwargs=kwargs))
+
+
+class LeaseLost(Exception):
+    """The task's lease ran out and another worker took it over."""
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a task that failed `attempts` times."""
+    config = _config()
+    delay = min(config['BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['MAX_BACKOFF_SECONDS'])
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(limit=None, now=None):
+    """
+    Claims up to `limit` due tasks for this worker and returns them, each with
+    `lag_seconds`: how long it had been due when claimed.
+    """
+    config = _config()
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    skip_locked = connection.features.has_select_for_update_skip_locked
+
+    # Without SKIP LOCKED (SQLite) the guarded UPDATE alone keeps claims exclusive
+    with transaction.atomic() if skip_locked else nullcontext():
+        due = Task.objects.filter(run_after__lte=now).order_by('run_after', 'id')
+        if skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        due_at = dict(due.values_list('pk', 'run_after')[:limit or config['BATCH_SIZE']])
+        if not due_at:
+            return []
+        Task.objects.filter(pk__in=due_at, run_after__lte=now).update(
+            status='RUNNING',
+            claimed_by=token,
+            run_after=now + timedelta(seconds=config['LEASE_SECONDS']),
+            attempts=F('attempts') + 1,
+        )
+    claimed = list(Task.objects.filter(claimed_by=token).order_by('id'))
+    for row in claimed:
+        row.lag_seconds = (now - due_at[row.pk]).total_seconds()
+    return claimed
+
+
+def run(claimed):
+    """
+    Runs a claimed task: 'done', 'retry', 'dead' or 'lost' (its lease ran out
+    and the task was taken over; nothing it wrote is kept).
+    """
+    try:
+        with transaction.atomic():
+            if claimed.name not in registry:
+                raise KeyError(f"Unknown task {claimed.name!r}.")
+            registry[claimed.name](*claimed.args, **claimed.kwargs)
+            if not Task.objects.filter(pk=claimed.pk, claimed_by=claimed.claimed_by).delete()[0]:
+                raise LeaseLost
+        return 'done'
+    except LeaseLost:
+        logger.warning('Task %s #%s outlived its lease; its writes were rolled back.', claimed.name, claimed.pk)
+        return 'lost'
+    except Exception:
+        return _failed(claimed, traceback.format_exc())
+
+
+def _failed(claimed, error):
+    if claimed.attempts >= _config()['MAX_ATTEMPTS']:
+        with transaction.atomic():
+            if Task.objects.filter(pk=claimed.pk, claimed_by=claimed.claimed_by).delete()[0]:
+                DeadTask.objects.create(
+                    name=claimed.name, args=claimed.args, kwargs=claimed.kwargs,
+                    attempts=claimed.attempts, created_at=claimed.created_at, error=error,
+                )
+        logger.error('Task %s #%s failed %d times, moved to DeadTask:\n%s',
+                     claimed.name, claimed.pk, claimed.attempts, error)
+        return 'dead'
+
+    Task.objects.filter(pk=claimed.pk, claimed_by=claimed.claimed_by).update(
+        status='QUEUED',
+        claimed_by='',
+        run_after=timezone.now() + timedelta(seconds=backoff(claimed.attempts)),
+        last_error=error,
+    )
+    logger.warning('Task %s #%s failed (attempt %d), retrying.', claimed.name, claimed.pk, claimed.attempts)
+    return 'retry'
+
+
+def run_pending(limit=None):
+    """Runs due tasks on the calling thread until none is left (or `limit` ran); returns their outcomes."""
+    outcomes = []
+    while limit is None or len(outcomes) < limit:
+        batch = claim(min(_config()['BATCH_SIZE'], limit - len(outcomes)) if limit else None)
+        if not batch:
+            break
+        outcomes.extend(run(claimed) for claimed in batch)
+    return outcomes
+
+
+def requeue_dead(queryset=None):
+    """Moves dead tasks (all, or a DeadTask queryset) back to the queue with a fresh attempt count."""
+    with transaction.atomic():
+        dead = list((queryset if queryset is not None else DeadTask.objects.all()).select_for_update())
+        Task.objects.bulk_create([
+            Task(name=row.name, args=row.args, kwargs=row.kwargs, created_at=row.created_at) for row in dead
+        ])
+        DeadTask.objects.filter(pk__in=[row.pk for row in dead]).delete()
+    return len(dead)
+
+
+def stats(now=None):
+    """
+    Per task name: queued and running counts, queue lag (how long the oldest
+    due task has waited, in seconds) and dead tasks. Two grouped queries.
+    """
+    now = now or timezone.now()
+    figures = {}
+    rows = Task.objects.values('name', 'status').annotate(count=Count('pk'), oldest=Min('run_after')).order_by()
+    for row in rows:
+        entry = figures.setdefault(row['name'], {'queued': 0, 'running': 0, 'lag_seconds': 0.0, 'dead': 0})
+        entry[row['status'].lower()] = row['count']
+        if row['status'] == 'QUEUED':
+            entry['lag_seconds'] = max((now - row['oldest']).total_seconds(), 0.0)
+    for row in DeadTask.objects.values('name').annotate(count=Count('pk')).order_by():
+        entry = figures.setdefault(row['name'], {'queued': 0, 'running': 0, 'lag_seconds': 0.0, 'dead': 0})
+        entry['dead'] = row['count']
+    return figures
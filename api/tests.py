@@ -1,3 +1,1748 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.core.wsgi import get_wsgi_application
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import analytics, carts, query_plans, recommendations, representations, reservations, tasks, throttling
+from .benchmarks import results as bench_results, throttles as throttle_bench
+from .benchmarks.data import SCALES, generate
+from .benchmarks.scenarios import SCENARIOS, run_scenario
+from .benchmarks.servers import asgi_get, wsgi_get
+from .admin_tools import ApproximateCountPaginator
+from .authentication import token_cache
+from .cache import catalog_cache
+from .metrics import registry
+from .models import (
+    Category, Product, CartItem, Order, OrderItem, DailySales, DailyCategorySales, DailyProductSales, Task,
+    DeadTask, OrderStatusChange, ProductPair, ProductRecommendation,
+)
+from .renderers import FastJSONRenderer
+from .serializers import OrderSerializer, ProductSerializer
+
+User = get_user_model()
+
+
+class CheckoutTests(TestCase):
+    """Order placement through POST /api/v1/orders/ (api/checkout.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Books')
+        self.book = Product.objects.create(
+            category=category, name='Book', description='', price=Decimal('12.50'), stock_quantity=5
+        )
+        self.pen = Product.objects.create(
+            category=category, name='Pen', description='', price=Decimal('1.25'), stock_quantity=10
+        )
+
+    def test_checkout_decrements_stock_and_clears_cart(self):
+        CartItem.objects.create(user=self.user, product=self.book, quantity=2)
+        CartItem.objects.create(user=self.user, product=self.pen, quantity=4)
+
+        response = self.client.post('/api/v1/orders/', {'place_order': True}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('30.00'))
+        self.assertEqual(len(response.data['items']), 2)
+        self.book.refresh_from_db()
+        self.pen.refresh_from_db()
+        self.assertEqual((self.book.stock_quantity, self.pen.stock_quantity), (3, 6))
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_insufficient_stock_rolls_back_everything(self):
+        CartItem.objects.create(user=self.user, product=self.book, quantity=1)
+        CartItem.objects.create(user=self.user, product=self.pen, quantity=11)
+
+        response = self.client.post('/api/v1/orders/', {'place_order': True}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock_quantity, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 2)
+
+    def test_empty_cart_is_rejected(self):
+        response = self.client.post('/api/v1/orders/', {'place_order': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReservationTests(TestCase):
+    """Cart holds against Product.reserved_quantity (api/reservations.py)."""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+        category = Category.objects.create(name='Games')
+        self.game = Product.objects.create(
+            category=category, name='Game', description='', price=Decimal('40.00'), stock_quantity=3
+        )
+        self.client = APIClient()
+
+    def add_to_cart(self, user, quantity):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/v1/cart/items/', {'product_id': self.game.pk, 'quantity': quantity}, format='json')
+
+    def test_hold_blocks_other_carts_until_released(self):
+        self.assertEqual(self.add_to_cart(self.alice, 2).status_code, 201)
+        self.assertEqual(self.add_to_cart(self.bob, 2).status_code, 400)
+
+        # Shrinking alice's line frees a unit for bob
+        self.assertEqual(self.add_to_cart(self.alice, 1).status_code, 200)
+        self.assertEqual(self.add_to_cart(self.bob, 2).status_code, 201)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.reserved_quantity, 3)
+
+    def test_concurrent_first_adds_update_one_line(self):
+        # Another request for the same cart inserted the line (holding 1 unit) after this one looked
+        reservations.hold(self.alice, self.game.pk, 1)
+        select_for_update, lookups = CartItem.objects.select_for_update, []
+
+        def first_lookup_misses():
+            lookups.append(1)
+            return CartItem.objects.none() if len(lookups) == 1 else select_for_update()
+
+        with mock.patch.object(CartItem.objects, 'select_for_update', side_effect=first_lookup_misses):
+            cart_item, created = reservations.hold(self.alice, self.game.pk, 2)
+
+        self.assertFalse(created)
+        self.assertEqual(CartItem.objects.values_list('quantity', 'held_quantity').get(pk=cart_item.pk), (2, 2))
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.reserved_quantity, 2)
+
+    def test_deleting_line_releases_hold(self):
+        item_id = self.add_to_cart(self.alice, 3).data['id']
+        self.client.delete(f'/api/v1/cart/items/{item_id}/')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.reserved_quantity, 0)
+
+    def test_sweeper_releases_expired_holds_in_batches(self):
+        self.add_to_cart(self.alice, 1)
+        self.add_to_cart(self.bob, 2)
+        CartItem.objects.update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(reservations.release_expired(batch_size=1), 2)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.reserved_quantity, 0)
+        self.assertFalse(CartItem.objects.filter(held_quantity__gt=0).exists())
+
+    def test_checkout_converts_hold_into_stock_decrement(self):
+        self.add_to_cart(self.alice, 3)
+        response = self.client.post('/api/v1/orders/', {'place_order': True}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.stock_quantity, self.game.reserved_quantity), (0, 0))
+
+
+class ProductSearchTests(TestCase):
+    """`?search=` served by the full-text index (api/search.py)."""
+
+    def setUp(self):
+        self.kitchen = Category.objects.create(name='Kitchen')
+        self.kettle = Product.objects.create(
+            category=self.kitchen, name='Steel Kettle', description='Boils water fast', price=Decimal('30.00')
+        )
+        self.mug = Product.objects.create(
+            category=self.kitchen, name='Mug', description='Holds a kettle worth of tea', price=Decimal('8.00')
+        )
+
+    def search(self, term):
+        response = APIClient().get('/api/v1/products/', {'search': term})
+        return [row['id'] for row in response.data['results']]
+
+    def test_name_matches_rank_first_and_prefixes_match(self):
+        self.assertEqual(self.search('kett'), [self.kettle.pk, self.mug.pk])
+        self.assertEqual(self.search('steel boil'), [self.kettle.pk])
+
+    def test_index_follows_product_and_category_writes(self):
+        Product.objects.filter(pk=self.mug.pk).update(name='Teacup')
+        self.assertEqual(self.search('teacup'), [self.mug.pk])
+
+        self.kitchen.name = 'Cookware'
+        self.kitchen.save()
+        self.assertEqual(set(self.search('cookware')), {self.kettle.pk, self.mug.pk})
+
+        self.kettle.delete()
+        self.assertEqual(self.search('steel'), [])
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages over the product catalog and order history (api/pagination.py)."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Tools')
+        # Duplicate prices force the id tiebreak to do its job
+        self.products = [
+            Product.objects.create(category=category, name=f'Tool {i:02}', description='', price=Decimal(i % 4))
+            for i in range(11)
+        ]
+        self.client = APIClient()
+
+    def walk(self, url, params):
+        seen, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            pages += 1
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                return seen, pages, response
+            response = self.client.get(response.data['next'])
+
+    def test_pages_follow_ordering_filter_without_gaps_or_repeats(self):
+        seen, pages, _ = self.walk('/api/v1/products/', {'ordering': '-price', 'page_size': 3})
+
+        expected = sorted(self.products, key=lambda p: (-p.price, -p.pk))
+        self.assertEqual(seen, [p.pk for p in expected])
+        self.assertEqual(pages, 4)
+
+    def test_previous_link_returns_the_prior_page(self):
+        first = self.client.get('/api/v1/products/', {'page_size': 4})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertNotIn('count', first.data)
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_order_history_is_paged_newest_first(self):
+        user = User.objects.create_user(username='buyer', password='pass')
+        now = timezone.now()
+        orders = [Order.objects.create(user=user, created_at=now - timedelta(days=i % 3)) for i in range(5)]
+        self.client.force_authenticate(user)
+
+        seen, _, _ = self.walk('/api/v1/orders/', {'page_size': 2})
+
+        expected = sorted(orders, key=lambda o: (o.created_at, o.pk), reverse=True)
+        self.assertEqual(seen, [o.pk for o in expected])
+
+    def test_tampered_cursor_is_rejected(self):
+        response = self.client.get('/api/v1/products/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogCacheTests(TestCase):
+    """Generation-stamped caching of product list/detail responses (api/cache.py)."""
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.category = Category.objects.create(name='Audio')
+        self.speaker = Product.objects.create(
+            category=self.category, name='Speaker', description='', price=Decimal('99.00'), stock_quantity=2
+        )
+        self.client = APIClient()
+
+    def test_repeat_reads_are_hits_until_a_write(self):
+        url = f'/api/v1/products/{self.speaker.pk}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        self.category.name = 'Hi-Fi'
+        self.category.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['category_detail']['name'], 'Hi-Fi')
+
+    def test_query_string_is_normalized(self):
+        self.client.get('/api/v1/products/', {'ordering': 'price', 'page_size': 5})
+        response = self.client.get('/api/v1/products/?page_size=5&ordering=price')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(catalog_cache.stats()['hits'], 1)
+
+    def test_checkout_invalidates_stock_levels(self):
+        url = f'/api/v1/products/{self.speaker.pk}/'
+        self.client.get(url)
+        user = User.objects.create_user(username='listener', password='pass')
+        CartItem.objects.create(user=user, product=self.speaker, quantity=2)
+        self.client.force_authenticate(user)
+        self.client.post('/api/v1/orders/', {'place_order': True}, format='json')
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertFalse(response.data['is_in_stock'])
+
+    @override_settings(CATALOG_CACHE={'ALIAS': 'catalog', 'MAX_ENTRIES': 2, 'TIMEOUT': 60})
+    def test_lru_bound_evicts_oldest_entries(self):
+        for size in (1, 2, 3):
+            self.client.get('/api/v1/products/', {'page_size': size})
+
+        self.assertEqual(catalog_cache.stats()['evictions'], 1)
+        self.assertEqual(self.client.get('/api/v1/products/', {'page_size': 1})['X-Cache'], 'MISS')
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified validators and 304 responses (api/conditional.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='poller', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name='Phones')
+        self.phone = Product.objects.create(
+            category=self.category, name='Phone', description='', price=Decimal('300.00'), stock_quantity=4
+        )
+
+    def test_product_detail_revalidates_until_product_or_category_changes(self):
+        url = f'/api/v1/products/{self.phone.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.phone.price = Decimal('280.00')
+        self.phone.save()
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(self.phone.version, 2)
+
+        Category.objects.filter(pk=self.category.pk).update(updated_at=timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=fresh['ETag']).status_code, 200)
+
+    def test_product_detail_etag_depends_on_the_sparse_fieldset(self):
+        url = f'/api/v1/products/{self.phone.pk}/'
+        sparse = self.client.get(url, {'fields': 'id,name'})['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=sparse).status_code, 200)
+        # Same selection, normalized
+        reordered = self.client.get(url, {'fields': 'name, id'}, HTTP_IF_NONE_MATCH=sparse)
+        self.assertEqual(reordered.status_code, 304)
+        expanded = self.client.get(url, {'fields': 'id,name', 'expand': 'category_detail'}, HTTP_IF_NONE_MATCH=sparse)
+        self.assertEqual(expanded.status_code, 200)
+
+    def test_product_detail_honours_if_modified_since(self):
+        url = f'/api/v1/products/{self.phone.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_cart_list_etag_tracks_lines_and_products(self):
+        url = '/api/v1/cart/items/'
+        self.client.post(url, {'product_id': self.phone.pk, 'quantity': 1}, format='json')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Checkout elsewhere changes the embedded stock level through a queryset update
+        other = User.objects.create_user(username='other', password='pass')
+        CartItem.objects.create(user=other, product=self.phone, quantity=1)
+        self.client.force_authenticate(other)
+        self.client.post('/api/v1/orders/', {'place_order': True}, format='json')
+        self.client.force_authenticate(self.user)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_order_detail_changes_with_status(self):
+        order = Order.objects.create(user=self.user)
+        url = f'/api/v1/orders/{order.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        order.status = 'SHIPPED'
+        order.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CartBatchTests(TestCase):
+    """POST /api/v1/cart/items/batch/ (reservations.hold_many)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='restorer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Snacks')
+        self.chips, self.nuts, self.gum = [
+            Product.objects.create(category=category, name=name, description='', price=Decimal('2.00'), stock_quantity=5)
+            for name in ('Chips', 'Nuts', 'Gum')
+        ]
+        CartItem.objects.create(user=self.user, product=self.gum, quantity=1)
+
+    def batch(self, lines):
+        return self.client.post('/api/v1/cart/items/batch/', {'items': lines}, format='json')
+
+    def test_upserts_removes_and_returns_the_whole_cart(self):
+        self.batch([{'product_id': self.chips.pk, 'quantity': 2}])
+
+        with self.assertNumQueries(9):  # missing lines are inserted, then every line locked
+            response = self.batch([
+                {'product_id': self.chips.pk, 'quantity': 4},
+                {'product_id': self.nuts.pk, 'quantity': 1},
+                {'product_id': self.gum.pk, 'quantity': 0},
+            ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted((row['product']['name'], row['quantity']) for row in response.data),
+            [('Chips', 4), ('Nuts', 1)],
+        )
+        self.chips.refresh_from_db()
+        self.assertEqual(self.chips.reserved_quantity, 4)
+        self.assertEqual(CartItem.objects.get(user=self.user, product=self.chips).version, 2)
+
+    def test_lapsed_holds_are_released_for_short_products(self):
+        other = User.objects.create_user(username='hoarder', password='pass')
+        reservations.hold(other, self.chips.pk, 5)
+        CartItem.objects.filter(user=other).update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+
+        response = self.batch([
+            {'product_id': self.chips.pk, 'quantity': 3},
+            {'product_id': self.nuts.pk, 'quantity': 2},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.chips.refresh_from_db()
+        self.nuts.refresh_from_db()
+        self.assertEqual((self.chips.reserved_quantity, self.nuts.reserved_quantity), (3, 2))
+
+        # Still short: nothing moves
+        response = self.batch([
+            {'product_id': self.chips.pk, 'quantity': 1},
+            {'product_id': self.nuts.pk, 'quantity': 6},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Nuts', str(response.data))
+        self.chips.refresh_from_db()
+        self.assertEqual(self.chips.reserved_quantity, 3)
+
+    def test_one_bad_line_rejects_the_batch(self):
+        response = self.batch([
+            {'product_id': self.chips.pk, 'quantity': 1},
+            {'product_id': 999999, 'quantity': 1},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.filter(product=self.chips).exists())
+
+
+class CartListingTests(TestCase):
+    """Cart list query count and summary envelope (CartItemViewSet.list)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulk', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name='Parts')
+
+    def fill_cart(self, lines):
+        products = Product.objects.bulk_create([
+            Product(category=self.category, name=f'Part {i}', description='', price=Decimal('1.50'), stock_quantity=i % 3)
+            for i in range(lines)
+        ])
+        CartItem.objects.bulk_create([CartItem(user=self.user, product=p, quantity=2) for p in products])
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.fill_cart(5)
+        with self.assertNumQueries(2):  # validators + summary, then the page of lines
+            self.client.get('/api/v1/cart/items/', {'page_size': 100})
+
+        self.fill_cart(45)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/cart/items/', {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 50)
+
+    def test_summary_is_computed_by_the_database(self):
+        self.fill_cart(6)
+        response = self.client.get('/api/v1/cart/items/', {'page_size': 2})
+
+        self.assertEqual(response.data['summary'], {
+            'line_count': 6,
+            'total_quantity': 12,
+            'grand_total': '18.00',
+            'out_of_stock_lines': 4,  # stock 0 or 1 against a quantity of 2
+        })
+        self.assertEqual(response.data['results'][0]['sub_total'], Decimal('3.00'))
+
+
+class ExportTests(TestCase):
+    """Streaming NDJSON/CSV exports (api/exports.py)."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='finance', password='pass', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        category = Category.objects.create(name='Office')
+        self.stapler = Product.objects.create(category=category, name='Stapler', description='', price=Decimal('7.00'))
+        self.orders = []
+        for quantity in (1, 2, 3):
+            order = Order.objects.create(user=self.admin, total_amount=Decimal('7.00') * quantity)
+            OrderItem.objects.create(
+                order=order, product=self.stapler, name='Stapler', quantity=quantity, price_at_purchase=Decimal('7.00')
+            )
+            self.orders.append(order)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_orders_ndjson_nests_items_and_supports_id_watermark(self):
+        body = self.read(self.client.get('/api/v1/orders/export/', {'after_id': self.orders[0].pk}))
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [o.pk for o in self.orders[1:]])
+        self.assertEqual(rows[0]['items'][0]['quantity'], 2)
+        self.assertEqual(rows[0]['total_amount'], '14.00')
+
+    def test_products_csv(self):
+        body = self.read(self.client.get('/api/v1/products/export/', {'output': 'csv'}))
+
+        header, row = body.splitlines()
+        self.assertTrue(header.startswith('id,name,description,price'))
+        self.assertIn('Stapler', row)
+        self.assertTrue(row.endswith(',Office'))
+
+    def test_exports_are_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='nosy', password='pass'))
+        self.assertEqual(self.client.get('/api/v1/orders/export/').status_code, 403)
+
+
+class CatalogImportTests(TestCase):
+    """`manage.py import_catalog` (api/catalog_import.py)."""
+
+    def write_file(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_import_creates_products_and_categories(self):
+        path = self.write_file('.csv', (
+            "sku,name,description,price,stock_quantity,image_url,category\n"
+            "A-1,Desk,Oak desk,199.00,4,,Furniture\n"
+            "A-2,Chair,,49.50,10,https://example.com/chair.png,Furniture\n"
+            "A-3,Lamp,,cheap,1,,Lighting\n"
+        ))
+        errors = self.write_file('.csv', '')
+
+        call_command('import_catalog', path, '--errors', errors, verbosity=0, stdout=io.StringIO())
+
+        self.assertEqual(Product.objects.count(), 2)
+        chair = Product.objects.get(sku='A-2')
+        self.assertEqual((chair.price, chair.stock_quantity, chair.category.name), (Decimal('49.50'), 10, 'Furniture'))
+        self.assertFalse(Category.objects.filter(name='Lighting').exists())
+        with open(errors) as f:
+            self.assertEqual(f.read().splitlines()[1:], ["4,'price' is not a number"])
+
+    def test_jsonl_import_upserts_on_sku(self):
+        category = Category.objects.create(name='Furniture')
+        desk = Product.objects.create(category=category, sku='A-1', name='Desk', description='', price=Decimal('199.00'))
+        path = self.write_file('.jsonl', (
+            '{"sku": "A-1", "name": "Standing desk", "price": "249.00", "stock_quantity": 2, "category": "Furniture"}\n'
+            '{"sku": "A-9", "name": "Shelf", "price": "30", "category": "Storage"}\n'
+        ))
+
+        call_command('import_catalog', path, '--batch-size', '1', verbosity=0, stdout=io.StringIO())
+
+        desk.refresh_from_db()
+        self.assertEqual((desk.name, desk.price, desk.version), ('Standing desk', Decimal('249.00'), 2))
+        self.assertEqual(Product.objects.get(sku='A-9').category.name, 'Storage')
+
+
+    def test_repeated_skus_are_counted_as_merged(self):
+        path = self.write_file('.csv', (
+            "sku,name,price,category\n"
+            "A-1,Desk,199.00,Furniture\n"
+            "A-1,Oak desk,209.00,Furniture\n"
+            "A-2,Chair,49.50,Furniture\n"
+        ))
+        out = io.StringIO()
+
+        call_command('import_catalog', path, verbosity=0, stdout=out)
+
+        self.assertIn("Imported 3 rows", out.getvalue())
+        self.assertIn("2 created, 0 updated, 1 merged (repeated SKU), 0 rejected.", out.getvalue())
+        self.assertEqual(Product.objects.get(sku='A-1').name, 'Oak desk')
+
+class ProductAdminTests(TestCase):
+    """Large-table admin settings (api/admin.py, api/admin_tools.py)."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('boss', 'boss@example.com', 'pass')
+        self.client.force_login(self.admin)
+        category = Category.objects.create(name='Garden')
+        self.hose = Product.objects.create(category=category, name='Hose', description='', price=Decimal('25.00'), stock_quantity=4)
+        self.rake = Product.objects.create(category=category, name='Rake', description='', price=Decimal('150.00'), stock_quantity=30)
+
+    def test_decrease_stock_is_set_based_and_floors_at_held_units(self):
+        Product.objects.filter(pk=self.rake.pk).update(reserved_quantity=25)
+        with CaptureQueriesContext(connection) as captured:
+            self.client.post('/admin/api/product/', {
+                'action': 'decrease_stock', '_selected_action': [self.hose.pk, self.rake.pk],
+            })
+
+        updates = [q['sql'] for q in captured.captured_queries if q['sql'].startswith('UPDATE "api_product"')]
+        self.assertEqual(len(updates), 1)
+
+        self.hose.refresh_from_db()
+        self.rake.refresh_from_db()
+        self.assertEqual((self.hose.stock_quantity, self.rake.stock_quantity), (0, 25))
+        self.assertEqual(self.rake.available_quantity, 0)
+        self.assertEqual(self.rake.version, 2)
+
+    def test_bucketed_filters(self):
+        response = self.client.get('/admin/api/product/', {'stock_level': 'low'})
+        self.assertEqual([p.name for p in response.context['cl'].result_list], ['Hose'])
+
+        response = self.client.get('/admin/api/product/', {'price_band': '100-1000'})
+        self.assertEqual([p.name for p in response.context['cl'].result_list], ['Rake'])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "fakes SQLite planner statistics")
+    def test_paginator_uses_row_estimate_for_unfiltered_lists(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '2000000 1' WHERE tbl = 'api_product'")
+
+        self.assertEqual(ApproximateCountPaginator(Product.objects.all(), 20).count, 2_000_000)
+        self.assertEqual(ApproximateCountPaginator(Product.objects.filter(stock_quantity__gt=10), 20).count, 1)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Token -> user lookups served from api/authentication.py's cache."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='regular', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def queries_for_cart(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/v1/cart/items/')
+        self.assertEqual(response.status_code, 200)
+        return len(captured.captured_queries)
+
+    def test_repeat_requests_skip_the_token_query(self):
+        first, second = self.queries_for_cart(), self.queries_for_cart()
+
+        self.assertEqual(first - second, 1)
+        stats = token_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_deleted_token_is_rejected(self):
+        self.queries_for_cart()
+        self.token.delete()
+
+        self.assertEqual(self.client.get('/api/v1/cart/items/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.queries_for_cart()
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get('/api/v1/cart/items/').status_code, 401)
+
+    def test_login_does_not_invalidate(self):
+        self.queries_for_cart()
+        self.assertTrue(APIClient().login(username='regular', password='pass'))  # saves last_login
+
+        self.assertEqual(token_cache.stats()['entries'], 1)
+
+
+@override_settings(METRICS={'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 10_000})
+class MetricsTests(TestCase):
+    """Per-view request metrics and the /metrics endpoint (api/metrics.py)."""
+
+    def setUp(self):
+        registry.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Toys')
+        Product.objects.create(category=category, name='Kite', description='', price=Decimal('9.00'))
+
+    def test_exposition_labels_views_and_counts_queries(self):
+        self.client.get('/api/v1/products/')
+        self.client.get('/api/v1/products/', {'ordering': 'price'})
+        self.client.get('/api/v1/no-such-endpoint/')
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('api_requests_total{view="ProductViewSet.list",status="2xx"} 2', body)
+        self.assertIn('api_requests_total{view="unresolved",status="4xx"} 1', body)
+        self.assertIn('api_request_duration_seconds_count{view="ProductViewSet.list"} 2', body)
+        self.assertIn('api_request_queries_count{view="ProductViewSet.list"} 2', body)
+        self.assertNotIn('api_request_queries_sum{view="ProductViewSet.list"} 0.000000', body)
+
+    def test_serialization_is_timed_apart_from_rendering(self):
+        product = Product.objects.get()
+        self.client.get('/api/v1/products/')
+        self.client.get(f'/api/v1/products/{product.pk}/')
+
+        body = self.client.get('/metrics').content.decode()
+        for view in ('ProductViewSet.list', 'ProductViewSet.retrieve'):
+            self.assertIn(f'api_serialize_seconds_total{{view="{view}"}}', body)
+            self.assertNotIn(f'api_serialize_seconds_total{{view="{view}"}} 0.000000', body)
+            self.assertNotIn(f'api_render_seconds_total{{view="{view}"}} 0.000000', body)
+
+    def test_slow_requests_log_their_queries(self):
+        with override_settings(METRICS={'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 0}):
+            with self.assertLogs('api.metrics', 'WARNING') as logs:
+                self.client.get('/api/v1/products/')
+
+        self.assertIn('ProductViewSet.list', logs.output[0])
+        self.assertIn('FROM "api_product"', logs.output[0])
+
+    def test_unsampled_slow_requests_are_logged_too(self):
+        with override_settings(METRICS={'SAMPLE_RATE': 0.0, 'SLOW_REQUEST_MS': 0}):
+            with self.assertLogs('api.metrics', 'WARNING') as logs:
+                self.client.get('/api/v1/products/')
+
+        self.assertIn('ProductViewSet.list', logs.output[0])
+        self.assertIn('queries not recorded', logs.output[0])
+
+    @override_settings(METRICS={'SAMPLE_RATE': 0.0, 'BEARER_TOKEN': 's3cret'})
+    def test_unsampled_requests_and_bearer_token(self):
+        self.client.get('/api/v1/products/')
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+        self.assertIn('api_requests_total{view="ProductViewSet.list",status="2xx"} 1', body)
+        self.assertIn('api_sampled_requests_total{view="ProductViewSet.list"} 0', body)
+
+
+class BenchmarkSuiteTests(TestCase):
+    """The bench_api building blocks (api/benchmarks/) stay runnable."""
+
+    def generate_and_rollback(self, seed):
+        with transaction.atomic():
+            data = generate(SCALES['tiny'], seed=seed)
+            names = list(Product.objects.order_by('sku').values_list('name', flat=True))
+            transaction.set_rollback(True)
+        return data.words, names
+
+    def test_generator_is_deterministic(self):
+        self.assertEqual(self.generate_and_rollback(3), self.generate_and_rollback(3))
+        self.assertNotEqual(self.generate_and_rollback(3), self.generate_and_rollback(4))
+
+    def test_scenarios_run_cleanly(self):
+        data = generate(SCALES['tiny'], seed=3)
+        self.assertEqual(Order.objects.count(), SCALES['tiny'].users * SCALES['tiny'].orders_per_user)
+
+        for name in SCENARIOS:
+            figures = run_scenario(name, data, iterations=5, seed=3)
+            self.assertEqual(figures['errors'], 0, f"{name}: {figures['first_error']}")
+            self.assertGreater(figures['queries_per_request'], 0)
+
+    def test_compare_flags_query_regressions_regardless_of_timing(self):
+        figures = {'throughput_rps': 100.0, 'p50_ms': 5.0, 'p95_ms': 8.0, 'p99_ms': 9.0,
+                   'errors': 0, 'queries_per_request': 2.0}
+        baseline = {'scenarios': {'detail': figures}}
+        current = {'scenarios': {'detail': dict(figures, p50_ms=5.5, queries_per_request=3.0)}}
+
+        _, regressions = bench_results.compare(baseline, current, threshold_pct=25)
+        self.assertEqual(regressions, ['detail.queries_per_request'])
+
+
+class FastListRepresentationTests(TestCase):
+    """List pages built by api/representations.py render exactly like the serializers."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='pass')
+        category = Category.objects.create(name='Jouets été')
+        moment = timezone.now().replace(microsecond=123456)
+        names = ['Kite "Red" \\   line', 'Ballon 🎈', 'Tab\tand\nnewline']
+        self.products = [
+            Product.objects.create(
+                category=category, name=name, description='<b>bold</b> & ü \u2028',
+                price=price, stock_quantity=stock, created_date=moment + timedelta(seconds=i),
+                image_url='https://example.com/k.png' if i else None,
+            )
+            for i, (name, price, stock) in enumerate(zip(names, ['10.5', '0.99', '12000'], [0, 3, 7]))
+        ]
+        order = Order.objects.create(user=self.user, total_amount=Decimal('21.49'))
+        for product in self.products[:2]:
+            OrderItem.objects.create(order=order, product=product, name=product.name,
+                                     quantity=2, price_at_purchase=product.price)
+        Order.objects.create(user=self.user, total_amount=Decimal('0'))
+
+    def assertSameBytes(self, serializer, representation, queryset, fields):
+        expected = JSONRenderer().render(serializer(queryset, many=True).data)
+        actual = FastJSONRenderer().render(representation(queryset.only(*fields)))
+        self.assertEqual(actual, expected)
+
+    def test_products_render_like_the_serializer(self):
+        queryset = Product.objects.select_related('category').order_by('pk')
+        self.assertSameBytes(ProductSerializer, representations.products, queryset, representations.PRODUCT_FIELDS)
+        with timezone.override('Africa/Kigali'):
+            self.assertSameBytes(ProductSerializer, representations.products, queryset, representations.PRODUCT_FIELDS)
+
+    def test_orders_render_like_the_serializer(self):
+        queryset = Order.objects.prefetch_related('items').order_by('pk')
+        self.assertSameBytes(OrderSerializer, representations.orders, queryset, representations.ORDER_FIELDS)
+
+    def test_list_endpoints_serve_the_fast_representation(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for path, serializer, queryset in [
+            ('/api/v1/products/', ProductSerializer, Product.objects.select_related('category').order_by('name', 'pk')),
+            ('/api/v1/orders/', OrderSerializer, Order.objects.prefetch_related('items').order_by('-created_at', '-pk')),
+        ]:
+            expected = JSONRenderer().render(
+                {'next': None, 'previous': None, 'results': serializer(queryset, many=True).data}
+            )
+            self.assertEqual(client.get(path).content, expected, path)
+
+    def test_renderer_falls_back_for_indented_output(self):
+        data = {'price': '1.00', 'ratio': 1e16}
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= / ?expand= prune the representation and the query (api/sparse.py)."""
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.user = User.objects.create_user(username='shopper', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Toys')
+        self.kite = Product.objects.create(category=category, name='Kite', description='x' * 5000,
+                                           price=Decimal('9.50'), stock_quantity=4)
+        order = Order.objects.create(user=self.user, total_amount=Decimal('19.00'))
+        OrderItem.objects.create(order=order, product=self.kite, name='Kite', quantity=2,
+                                 price_at_purchase=Decimal('9.50'))
+        CartItem.objects.create(user=self.user, product=self.kite, quantity=3)
+
+    def get(self, path, params):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [query['sql'] for query in captured.captured_queries]
+
+    def test_product_grid_fields_prune_columns_and_joins(self):
+        data, queries = self.get('/api/v1/products/', {'fields': 'id,name,price,image_url'})
+
+        self.assertEqual(data['results'], [{'id': self.kite.pk, 'name': 'Kite', 'price': '9.50', 'image_url': None}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0])
+        self.assertNotIn('api_category', queries[0])
+
+    def test_expand_adds_the_nested_relation(self):
+        data, queries = self.get('/api/v1/products/', {'fields': 'id,is_in_stock', 'expand': 'category_detail'})
+
+        self.assertEqual(list(data['results'][0]), ['id', 'category_detail', 'is_in_stock'])
+        self.assertIn('JOIN "api_category"', queries[0])
+        self.assertNotIn('description', queries[0])
+
+    def test_orders_skip_the_items_prefetch_unless_expanded(self):
+        narrow, narrow_queries = self.get('/api/v1/orders/', {'fields': 'id,total_amount'})
+        expanded, expanded_queries = self.get('/api/v1/orders/', {'fields': 'id', 'expand': 'items'})
+
+        self.assertEqual(narrow['results'][0], {'id': self.kite.orderitem_set.get().order_id, 'total_amount': '19.00'})
+        self.assertEqual(len(expanded_queries), len(narrow_queries) + 1)
+        self.assertEqual(expanded['results'][0]['items'][0]['quantity'], 2)
+
+    def test_cart_and_detail_fields(self):
+        cart, _ = self.get('/api/v1/cart/items/', {'fields': 'id,quantity,sub_total'})
+        self.assertEqual(list(cart['results'][0]), ['id', 'quantity', 'sub_total'])
+        self.assertEqual(Decimal(str(cart['results'][0]['sub_total'])), Decimal('28.50'))
+
+        detail, queries = self.get(f'/api/v1/products/{self.kite.pk}/', {'fields': 'name,stock_quantity'})
+        self.assertEqual(detail, {'name': 'Kite', 'stock_quantity': 4})
+        self.assertNotIn('description', queries[-1])
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/v1/products/', {'fields': 'id,secret', 'expand': 'items'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+
+    def test_sparse_fast_representation_matches_the_serializer(self):
+        selection = {'id', 'price', 'created_date', 'is_in_stock'}
+        queryset = Product.objects.select_related('category')
+        full = ProductSerializer(queryset, many=True).data
+        expected = [{name: row[name] for name in row if name in selection} for row in full]
+
+        rows = Product.objects.only('id', 'price', 'created_date', 'stock_quantity')
+        self.assertEqual(FastJSONRenderer().render(representations.products(rows, selection)),
+                         JSONRenderer().render(expected))
+
+
+class FacetNavigationTests(TestCase):
+    """ProductFilter and /products/facets/ (api/filters.py)."""
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.toys = Category.objects.create(name='Toys')
+        self.books = Category.objects.create(name='Books')
+        for name, category, price, stock in [
+            ('Yo-yo', self.toys, '5.00', 0), ('Red kite', self.toys, '50.00', 3), ('Blue kite', self.toys, '500.00', 1),
+            ('Atlas', self.books, '20000.00', 2), ('Comic', self.books, '15.00', 0),
+        ]:
+            Product.objects.create(category=category, name=name, description='', price=Decimal(price),
+                                   stock_quantity=stock)
+        self.client = APIClient()
+
+    def names(self, params):
+        response = self.client.get('/api/v1/products/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [product['name'] for product in response.json()['results']]
+
+    def test_price_range_stock_and_several_categories(self):
+        self.assertEqual(self.names({'price_min': '15', 'price_max': '500'}), ['Blue kite', 'Comic', 'Red kite'])
+        self.assertEqual(self.names({'in_stock': 'false'}), ['Comic', 'Yo-yo'])
+        self.assertEqual(self.names({'category': [self.toys.pk, self.books.pk], 'in_stock': 'true'}),
+                         ['Atlas', 'Blue kite', 'Red kite'])
+        self.assertEqual(self.client.get('/api/v1/products/', {'category': 999}).status_code, 400)
+
+    def test_each_facet_ignores_its_own_filter(self):
+        params = {'category': self.toys.pk, 'in_stock': 'true', 'price_max': '100'}
+        # Validating ?category= and the grouped facet query
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/v1/products/facets/', params).json()
+
+        self.assertEqual(data['count'], 1)  # Red kite
+        self.assertEqual(data['category'], [
+            {'id': self.books.pk, 'name': 'Books', 'count': 0}, {'id': self.toys.pk, 'name': 'Toys', 'count': 1},
+        ])
+        self.assertEqual([bucket['count'] for bucket in data['price']], [0, 1, 1, 0, 0])
+        self.assertEqual(data['price'][1], {'min': '10.00', 'max': '99.99', 'count': 1})
+        self.assertEqual(data['in_stock'], [{'value': True, 'count': 1}, {'value': False, 'count': 1}])
+
+    def test_facets_follow_search_and_are_cached_until_the_catalog_changes(self):
+        first = self.client.get('/api/v1/products/facets/', {'search': 'kite'})
+        self.assertEqual((first['X-Cache'], first.json()['count']), ('MISS', 2))
+        self.assertEqual(self.client.get('/api/v1/products/facets/', {'search': 'kite'})['X-Cache'], 'HIT')
+
+        kite = Product.objects.get(name='Blue kite')
+        kite.stock_quantity = 0
+        kite.save()
+        again = self.client.get('/api/v1/products/facets/', {'search': 'kite'})
+        self.assertEqual(again['X-Cache'], 'MISS')
+        self.assertEqual(again.json()['in_stock'], [{'value': True, 'count': 1}, {'value': False, 'count': 1}])
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get('/api/v1/products/facets/', {'price_min': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price', response.json())
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAINs every query behind the endpoints at the 'small' benchmark scale and
+    fails when one reads a table with a full scan (api/query_plans.py). Runs on
+    SQLite, and on PostgreSQL when POSTGRES_DB is set.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = generate(SCALES['small'], seed=11)
+        # Some of a real catalog is sold out (generated stock never is)
+        Product.objects.filter(pk__in=cls.data.product_ids[::4]).update(stock_quantity=0)
+        cls.user_id = next(iter(cls.data.tokens))
+        cls.admin = User.objects.create_superuser(username='plans-admin', password='pass')
+        cls.admin_token = Token.objects.create(user=cls.admin)
+        # Planner statistics, as a production database would have them
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        catalog_cache.clear()
+        token_cache.clear()
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Token {self.data.tokens[self.user_id]}')
+
+    def assertIndexed(self, label, run, uses=(), allow=()):
+        """
+        Runs `run()` and checks the plan of every query it issued: no full scans
+        but of the tables in `allow`, and each index in `uses` used by one of them.
+        """
+        with CaptureQueriesContext(connection) as captured:
+            run()
+        plans = [
+            (query['sql'], query_plans.explain(query['sql']))
+            for query in captured.captured_queries if query_plans.is_explained(query['sql'])
+        ]
+        self.assertTrue(plans, label)
+        for sql, plan in plans:
+            scans = [table for table in query_plans.full_scans(plan) if table not in allow]
+            self.assertEqual(scans, [], f"{label}: full scan of {', '.join(scans)}\n{sql}\n" + '\n'.join(plan))
+        lines = [line for _, plan in plans for line in plan]
+        for index in uses:
+            self.assertTrue(any(index in line for line in lines), f"{label}: {index} unused\n" + '\n'.join(lines))
+
+    def get(self, path, params=None, client=None):
+        def run():
+            response = (client or self.client).get(path, params)
+            self.assertEqual(response.status_code, 200, response)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return run
+
+    def test_catalog_reads(self):
+        category = self.data.category_ids[0]
+        first_page = self.client.get('/api/v1/products/', {'ordering': 'price'}).json()
+        cases = [
+            ({}, ['product_name_id_idx']),
+            ({'ordering': '-price'}, ['product_price_id_idx']),
+            ({'ordering': 'created_date'}, ['product_created_id_idx']),
+            ({'ordering': 'stock_quantity'}, ['product_stock_id_idx']),
+            ({'category': category}, ['product_cat_name_idx']),
+            ({'category': category, 'ordering': 'price', 'price_min': '10'}, ['product_cat_price_idx']),
+            ({'in_stock': 'true'}, ['product_in_stock_name_idx']),
+            ({'price_min': '10', 'price_max': '20'}, []),
+            ({'search': self.data.words[5]}, []),
+        ]
+        for params, uses in cases:
+            with self.subTest(params=params):
+                self.assertIndexed(f'products {params}', self.get('/api/v1/products/', params), uses)
+
+        self.assertIndexed('products, second page', self.get(first_page['next']), ['product_price_id_idx'])
+        self.assertIndexed('facets', self.get('/api/v1/products/facets/'))
+        self.assertIndexed('facets of a category', self.get('/api/v1/products/facets/', {'category': category}))
+        self.assertIndexed('product detail', self.get(f'/api/v1/products/{self.data.product_ids[10]}/'))
+
+    def test_account_reads_and_checkout(self):
+        order = Order.objects.filter(user_id=self.user_id).first()
+        self.assertIndexed('order history', self.get('/api/v1/orders/'), ['order_user_created_idx'])
+        self.assertIndexed('order detail', self.get(f'/api/v1/orders/{order.pk}/'))
+        self.assertIndexed('cart', self.get('/api/v1/cart/items/'), ['cartitem_user_id_idx'])
+
+        product_id = self.data.product_ids[-1]
+        self.assertIndexed('add to cart', lambda: self.client.post(
+            '/api/v1/cart/items/', {'product_id': product_id, 'quantity': 1}, format='json'
+        ))
+        self.assertIndexed('checkout', lambda: self.client.post('/api/v1/orders/', {'place_order': True}, format='json'))
+
+    def test_admin_exports_and_hold_release(self):
+        admin = APIClient()
+        admin.force_login(self.admin)
+        # OrderAdmin pages in pk order, which SQLite reports as a (bare) rowid SCAN
+        self.assertIndexed('order changelist', self.get('/admin/api/order/', client=admin),
+                           allow=['api_order'] if connection.vendor == 'sqlite' else [])
+        self.assertIndexed('orders by status', self.get('/admin/api/order/', {'status__exact': 'PENDING'}, admin),
+                           ['order_status_id_idx'])
+        self.assertIndexed('orders by date', self.get('/admin/api/order/', {
+            'created_at__gte': '2025-12-01 00:00:00+00:00', 'created_at__lt': '2025-12-08 00:00:00+00:00',
+        }, admin), ['order_created_id_idx'])
+
+        api = APIClient(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+        if connection.vendor == 'sqlite':
+            # Without column statistics (no STAT4) SQLite guesses an open date range covers
+            # a quarter of the table and reads it in id order rather than sort it
+            uses, allow = [], ['api_order']
+        else:
+            uses, allow = ['order_created_id_idx'], []
+        self.assertIndexed('order delta export',
+                           self.get('/api/v1/orders/export/', {'since': '2025-12-01T00:00:00Z'}, api), uses, allow)
+        self.assertIndexed('order id watermark export',
+                           self.get('/api/v1/orders/export/', {'after_id': Order.objects.order_by('-pk')[100].pk}, api))
+        self.assertIndexed('release expired holds', reservations.release_expired, ['cartitem_active_hold_idx'])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class SalesRollupTests(TestCase):
+    """Daily sales rollups (api/analytics.py) and the /analytics/sales/ reports."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.books = Category.objects.create(name='Books')
+        self.book = Product.objects.create(
+            category=self.books, name='Book', description='', price=Decimal('12.50'), stock_quantity=50
+        )
+        self.pen = Product.objects.create(
+            category=self.books, name='Pen', description='', price=Decimal('1.25'), stock_quantity=50
+        )
+        self.today = timezone.localdate()
+
+    @contextmanager
+    def committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            yield
+        # Rollup changes are applied by a background task
+        tasks.run_pending()
+
+    def checkout(self, *lines):
+        for product, quantity in lines:
+            CartItem.objects.create(user=self.user, product=product, quantity=quantity)
+        with self.committed():
+            response = self.client.post('/api/v1/orders/', {'place_order': True}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Order.objects.get(pk=response.data['id'])
+
+    def figures(self, row):
+        return (row.orders, row.units, row.revenue)
+
+    def test_checkout_cancel_and_delete_update_the_rollups(self):
+        first = self.checkout((self.book, 2), (self.pen, 4))
+        self.checkout((self.pen, 1))
+        self.assertEqual(self.figures(DailySales.objects.get(day=self.today)), (2, 7, Decimal('31.25')))
+        self.assertEqual(self.figures(DailyCategorySales.objects.get(category=self.books)), (2, 7, Decimal('31.25')))
+        self.assertEqual(self.figures(DailyProductSales.objects.get(product=self.pen)), (2, 5, Decimal('6.25')))
+
+        first.status = 'CANCELLED'
+        with self.committed():
+            first.save()
+        self.assertEqual(self.figures(DailySales.objects.get(day=self.today)), (1, 1, Decimal('1.25')))
+        self.assertEqual(self.figures(DailyProductSales.objects.get(product=self.book)), (0, 0, Decimal('0.00')))
+
+        first.status = 'PROCESSING'
+        with self.committed():
+            first.save()
+        self.assertEqual(self.figures(DailySales.objects.get(day=self.today)), (2, 7, Decimal('31.25')))
+
+        with self.committed():
+            first.delete()
+        self.assertEqual(self.figures(DailySales.objects.get(day=self.today)), (1, 1, Decimal('1.25')))
+
+    def test_rebuild_matches_the_orders(self):
+        # bulk_create fires no signals: the rollups start empty
+        generate(SCALES['tiny'], seed=5)
+        out = io.StringIO()
+        call_command('rebuild_sales_rollups', '--chunk-size', '7', stdout=out)
+
+        placed = OrderItem.objects.exclude(order__status='CANCELLED')
+        orders = placed.values('order_id').distinct().count()
+        units = sum(placed.values_list('quantity', flat=True))
+        revenue = sum(quantity * price for quantity, price in placed.values_list('quantity', 'price_at_purchase'))
+        self.assertIn(f"Rolled up {orders} order(s).", out.getvalue())
+        for model in (DailySales, DailyCategorySales, DailyProductSales):
+            rows = model.objects.all()
+            self.assertEqual((sum(row.units for row in rows), sum(row.revenue for row in rows)), (units, revenue))
+        self.assertEqual(sum(DailySales.objects.values_list('orders', flat=True)), orders)
+
+        # Rebuilding one day leaves the others as they were
+        before = {row.day: self.figures(row) for row in DailySales.objects.all()}
+        day = next(iter(before))
+        analytics.rebuild(day, day)
+        self.assertEqual({row.day: self.figures(row) for row in DailySales.objects.all()}, before)
+
+    def test_rebuild_drops_queued_changes_to_the_rebuilt_days(self):
+        # Checkout queues its rollup change; the rebuild runs before any worker does
+        yesterday = self.today - timedelta(days=1)
+        CartItem.objects.create(user=self.user, product=self.book, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/v1/orders/', {'place_order': True}, format='json').status_code, 201)
+            tasks.enqueue('analytics.apply', [['api.DailySales', [yesterday.isoformat()], [1, 1, '5.00']],
+                                              ['api.DailySales', [self.today.isoformat()], [1, 1, '5.00']]])
+
+        self.assertEqual(analytics.rebuild(self.today, self.today), 1)
+        tasks.run_pending()
+        self.assertEqual(self.figures(DailySales.objects.get(day=self.today)), (1, 2, Decimal('25.00')))
+        # Changes to other days are still applied
+        self.assertEqual(self.figures(DailySales.objects.get(day=yesterday)), (1, 1, Decimal('5.00')))
+
+    def test_reports_are_admin_only_and_read_the_rollups(self):
+        self.checkout((self.book, 2), (self.pen, 4))
+        self.assertEqual(self.client.get('/api/v1/analytics/sales/').status_code, 403)
+        admin = User.objects.create_superuser(username='boss', password='pass')
+        self.client.force_authenticate(admin)
+
+        params = {'start': str(self.today - timedelta(days=1)), 'end': str(self.today)}
+        with self.assertNumQueries(1):
+            report = self.client.get('/api/v1/analytics/sales/', params).json()
+        self.assertEqual(report['totals'], {
+            'orders': 1, 'units': 6, 'revenue': '30.00', 'average_order_value': '30.00',
+        })
+        self.assertEqual([day['orders'] for day in report['days']], [0, 1])
+
+        categories = self.client.get('/api/v1/analytics/sales/categories/', params).json()
+        self.assertEqual([(row['name'], row['revenue']) for row in categories['results']], [('Books', '30.00')])
+        products = self.client.get('/api/v1/analytics/sales/products/', {**params, 'rank_by': 'units', 'limit': 1})
+        self.assertEqual([row['name'] for row in products.json()['results']], ['Pen'])
+
+        self.assertEqual(self.client.get('/api/v1/analytics/sales/', {'start': '2026-02-01', 'end': '2026-01-01'})
+                         .status_code, 400)
+
+    def test_category_report_honours_limit(self):
+        toys = Category.objects.create(name='Toys')
+        ball = Product.objects.create(category=toys, name='Ball', description='', price=Decimal('3.00'), stock_quantity=5)
+        self.checkout((self.book, 1), (ball, 1))
+        self.client.force_authenticate(User.objects.create_superuser(username='boss', password='pass'))
+
+        url = '/api/v1/analytics/sales/categories/'
+        self.assertEqual([row['name'] for row in self.client.get(url).json()['results']], ['Books', 'Toys'])
+        self.assertEqual([row['name'] for row in self.client.get(url, {'limit': 1}).json()['results']], ['Books'])
+
+
+@override_settings(CART_STORE={'BACKEND': 'api.carts.CacheCartStore', 'ALIAS': 'default',
+                                'WRITE_BACK_CHANGES': 3, 'WRITE_BACK_SECONDS': 60})
+class CacheCartStoreTests(TestCase):
+    """Write-back cart store (api/carts.py)."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='browser', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Garden')
+        self.hose = Product.objects.create(
+            category=category, name='Hose', description='', price=Decimal('8.00'), stock_quantity=10
+        )
+
+    def request(self, method, path, data=None):
+        # The store updates its cache entry once the database write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(path, data, format='json')
+
+    def set_quantity(self, quantity):
+        return self.request('post', '/api/v1/cart/items/', {'product_id': self.hose.pk, 'quantity': quantity})
+
+    def line(self):
+        return CartItem.objects.values_list('quantity', 'held_quantity').get(user=self.user)
+
+    def test_quantity_changes_are_written_back_when_the_cart_is_read(self):
+        self.assertEqual(self.set_quantity(4).status_code, 201)
+        response = self.set_quantity(2)
+        self.assertEqual((response.status_code, response.data['quantity']), (200, 2))
+        self.assertEqual(Decimal(response.data['sub_total']), Decimal('16.00'))
+        self.assertEqual(self.line(), (4, 4))
+
+        listing = self.request('get', '/api/v1/cart/items/')
+        self.assertEqual([item['quantity'] for item in listing.data['results']], [2])
+        self.assertEqual(self.line(), (2, 2))
+        self.hose.refresh_from_db()
+        self.assertEqual(self.hose.reserved_quantity, 2)
+
+    def test_write_back_after_enough_changes_and_at_checkout(self):
+        self.set_quantity(1)
+        self.set_quantity(2)
+        self.set_quantity(3)
+        self.assertEqual(self.line(), (1, 1))
+        self.set_quantity(5)  # third pending change
+        self.assertEqual(self.line(), (5, 1))
+
+        self.set_quantity(6)
+        response = self.request('post', '/api/v1/orders/', {'place_order': True})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual([item['quantity'] for item in response.data['items']], [6])
+        self.hose.refresh_from_db()
+        self.assertEqual((self.hose.stock_quantity, self.hose.reserved_quantity), (4, 0))
+
+    def test_pending_increases_are_checked_against_other_holds(self):
+        self.set_quantity(2)
+        other = User.objects.create_user(username='neighbour', password='pass')
+        reservations.hold(other, self.hose.pk, 7)
+        self.assertEqual(self.set_quantity(4).status_code, 400)
+        self.assertEqual(self.set_quantity(3).status_code, 200)
+
+    def test_evicted_entries_keep_every_item(self):
+        self.set_quantity(3)
+        self.set_quantity(1)
+        caches['default'].clear()
+
+        listing = self.request('get', '/api/v1/cart/items/')
+        self.assertEqual([item['quantity'] for item in listing.data['results']], [3])
+        self.assertEqual(self.set_quantity(2).status_code, 200)
+        item_id = listing.data['results'][0]['id']
+        self.assertEqual(self.request('delete', f'/api/v1/cart/items/{item_id}/').status_code, 204)
+        self.assertEqual(self.request('get', '/api/v1/cart/items/').data['results'], [])
+
+    def test_a_released_hold_no_longer_counts(self):
+        self.set_quantity(2)
+        CartItem.objects.update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+        reservations.release_expired()
+        other = User.objects.create_user(username='neighbour', password='pass')
+        reservations.hold(other, self.hose.pk, 8)
+        # The cached entry still says 2 units are held; only 2 are left for anyone
+        self.assertEqual(self.set_quantity(3).status_code, 400)
+        self.assertEqual(self.set_quantity(2).status_code, 200)
+
+    def test_concurrent_changes_keep_every_pending_quantity(self):
+        rake = Product.objects.create(
+            category=self.hose.category, name='Rake', description='', price=Decimal('12.00'), stock_quantity=5
+        )
+        self.set_quantity(1)
+        self.request('post', '/api/v1/cart/items/', {'product_id': rake.pk, 'quantity': 1})
+        store = carts.cart_store()
+        locked = threading.Event()
+
+        def other_tab():
+            # Another request changing the rake line in the same entry
+            with store._locked(self.user.pk):
+                entry = store._get(self.user.pk)
+                locked.set()
+                time.sleep(0.1)
+                entry['pending'][rake.pk] = 3
+                store._set(self.user.pk, entry)
+
+        thread = threading.Thread(target=other_tab)
+        thread.start()
+        locked.wait()
+        self.assertEqual(self.set_quantity(2).status_code, 200)
+        thread.join()
+        self.assertEqual(store._get(self.user.pk)['pending'], {self.hose.pk: 2, rake.pk: 3})
+
+
+@tasks.task('tests.record')
+def record_task(name, fail=False):
+    Category.objects.create(name=name)
+    if fail:
+        raise RuntimeError(f'{name} failed')
+
+
+@override_settings(TASKS={'MAX_ATTEMPTS': 2, 'BACKOFF_SECONDS': 10, 'LEASE_SECONDS': 60, 'BATCH_SIZE': 10})
+class TaskQueueTests(TestCase):
+    """Background tasks (api/tasks.py) and `manage.py run_workers`."""
+
+    def enqueue(self, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue('tests.record', *args, **kwargs)
+
+    def test_tasks_are_queued_on_commit_and_run_once(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            tasks.enqueue('tests.record', 'rolled back')
+        self.assertFalse(Task.objects.exists())  # nothing until the transaction commits
+        self.assertEqual(len(callbacks), 1)
+        self.enqueue('first')
+        self.enqueue('second')
+
+        out = io.StringIO()
+        call_command('run_workers', '--once', '--workers', '1', stdout=out)
+        self.assertIn('Ran 2 task(s)', out.getvalue())
+        self.assertEqual(sorted(Category.objects.values_list('name', flat=True)), ['first', 'second'])
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(tasks.run_pending(), [])
+
+    def test_failures_back_off_then_move_to_the_dead_letter_table(self):
+        self.enqueue('flaky', fail=True)
+        with self.assertLogs('api.tasks', 'WARNING'):
+            self.assertEqual(tasks.run_pending(), ['retry'])
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ('QUEUED', 1))
+        self.assertIn('flaky failed', queued.last_error)
+        self.assertGreater(queued.run_after, timezone.now() + timedelta(seconds=4))
+        self.assertFalse(Category.objects.exists())  # the failed call's writes were rolled back
+        self.assertEqual(tasks.run_pending(), [])  # not due yet
+
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('api.tasks', 'ERROR'):
+            self.assertEqual(tasks.run_pending(), ['dead'])
+        dead = DeadTask.objects.get()
+        self.assertEqual((dead.name, dead.args, dead.kwargs, dead.attempts), ('tests.record', ['flaky'], {'fail': True}, 2))
+        self.assertFalse(Task.objects.exists())
+
+        self.assertEqual(tasks.requeue_dead(), 1)
+        self.assertEqual(Task.objects.get().attempts, 0)
+
+    def test_claims_are_exclusive_until_the_lease_runs_out(self):
+        self.enqueue('leased')
+        [claimed] = tasks.claim()
+        self.assertEqual(tasks.claim(), [])
+
+        # The worker stalled past its lease: another one takes the task over
+        [again] = tasks.claim(now=timezone.now() + timedelta(seconds=61))
+        self.assertEqual((again.pk, again.attempts), (claimed.pk, 2))
+        with self.assertLogs('api.tasks', 'WARNING'):
+            self.assertEqual(tasks.run(claimed), 'lost')
+        self.assertEqual(tasks.run(again), 'done')
+        self.assertEqual(list(Category.objects.values_list('name', flat=True)), ['leased'])
+
+    def test_checkout_leaves_rollups_to_a_worker_and_metrics_show_the_queue(self):
+        user = User.objects.create_user(username='quick', password='pass')
+        product = Product.objects.create(
+            category=Category.objects.create(name='Tea'), name='Tea', description='', price=Decimal('3.00'),
+            stock_quantity=5,
+        )
+        CartItem.objects.create(user=user, product=product, quantity=2)
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post('/api/v1/orders/', {'place_order': True}, format='json').status_code, 201)
+
+        self.assertFalse(DailySales.objects.exists())
+        Task.objects.update(run_after=timezone.now() - timedelta(seconds=30))
+        body = client.get('/metrics').content.decode()
+        self.assertIn('api_tasks_queued{task="analytics.apply"} 1', body)
+        lag = next(line for line in body.splitlines() if line.startswith('api_task_queue_lag_seconds{'))
+        self.assertGreaterEqual(float(lag.split()[-1]), 30)
+
+        self.assertEqual(tasks.run_pending(), ['done'])
+        self.assertEqual(DailySales.objects.get().units, 2)
+
+
+class OrderTransitionTests(TestCase):
+    """Order status transitions (api/fulfilment.py): bulk endpoint and admin actions."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('dispatch', 'dispatch@example.com', 'pass')
+        self.shopper = User.objects.create_user(username='shopper', password='pass')
+        category = Category.objects.create(name='Kitchen')
+        self.pan = Product.objects.create(category=category, name='Pan', description='', price=Decimal('20.00'),
+                                          stock_quantity=0)
+        self.pot = Product.objects.create(category=category, name='Pot', description='', price=Decimal('30.00'),
+                                          stock_quantity=1)
+        self.orders = []
+        for status, pans, pots in [('PENDING', 1, 2), ('PROCESSING', 3, 0), ('SHIPPED', 1, 1), ('PENDING', 2, 1)]:
+            order = Order.objects.create(user=self.shopper, status=status)
+            for product, quantity in ((self.pan, pans), (self.pot, pots)):
+                if quantity:
+                    OrderItem.objects.create(order=order, product=product, name=product.name, quantity=quantity,
+                                             price_at_purchase=product.price)
+            self.orders.append(order)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def transition(self, ids, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/v1/orders/transition/', {'ids': ids, 'status': status}, format='json')
+
+    def statuses(self):
+        return list(Order.objects.order_by('pk').values_list('status', flat=True))
+
+    def test_only_allowed_moves_are_applied_and_audited(self):
+        pending, processing, shipped, _ = self.orders
+        response = self.transition([pending.pk, processing.pk, shipped.pk, 999], 'SHIPPED')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['rejected'], [
+            {'id': pending.pk, 'status': 'PENDING'}, {'id': shipped.pk, 'status': 'SHIPPED'},
+            {'id': 999, 'status': None},
+        ])
+        self.assertEqual(self.statuses(), ['PENDING', 'SHIPPED', 'SHIPPED', 'PENDING'])
+        change = OrderStatusChange.objects.get()
+        self.assertEqual((change.order_id, change.from_status, change.to_status, change.changed_by),
+                         (processing.pk, 'PROCESSING', 'SHIPPED', self.admin))
+        processing.refresh_from_db()
+        self.assertEqual(processing.version, 2)
+
+        self.assertEqual(self.transition([pending.pk], 'LOST').status_code, 400)
+        self.client.force_authenticate(self.shopper)
+        self.assertEqual(self.transition([pending.pk], 'PROCESSING').status_code, 403)
+
+    def test_cancelling_restocks_with_one_product_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.record_orders([order.pk for order in self.orders])
+        tasks.run_pending()
+
+        ids = [order.pk for order in self.orders]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.transition(ids, 'CANCELLED')
+        self.assertEqual((response.data['updated'], len(response.data['rejected'])), (3, 1))
+        product_updates = [q['sql'] for q in captured.captured_queries if q['sql'].startswith('UPDATE "api_product"')]
+        self.assertEqual(len(product_updates), 1)
+
+        self.pan.refresh_from_db()
+        self.pot.refresh_from_db()
+        # The shipped order keeps its units
+        self.assertEqual((self.pan.stock_quantity, self.pot.stock_quantity), (6, 4))
+        tasks.run_pending()
+        self.assertEqual(DailySales.objects.get().orders, 1)
+        self.assertEqual(self.statuses(), ['CANCELLED', 'CANCELLED', 'SHIPPED', 'CANCELLED'])
+
+    def test_admin_actions_move_the_selection(self):
+        browser = self.client_class()
+        browser.force_login(self.admin)
+        response = browser.post('/admin/api/order/', {
+            'action': 'mark_processing', '_selected_action': [order.pk for order in self.orders],
+        }, follow=True)
+
+        self.assertEqual(self.statuses(), ['PROCESSING', 'PROCESSING', 'SHIPPED', 'PROCESSING'])
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['2 order(s) marked as processing.', '2 order(s) cannot move to processing from their status.'],
+        )
+        self.assertEqual(OrderStatusChange.objects.filter(changed_by=self.admin).count(), 2)
+
+
+class ThrottlingTests(TestCase):
+    """Token-bucket throttles and load shedding (api/throttling.py)."""
+
+    def setUp(self):
+        throttling.store.clear()
+        throttling.monitor.clear()
+        self.addCleanup(throttling.store.clear)
+        self.addCleanup(throttling.monitor.clear)
+        self.user = User.objects.create_user(username='shopper', password='pass')
+        token = Token.objects.create(user=self.user)
+        category = Category.objects.create(name='Garden')
+        Product.objects.create(category=category, name='Spade', description='Steel spade', price=Decimal('15.00'))
+        self.anonymous = APIClient()
+        self.signed_in = APIClient()
+        self.signed_in.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @override_settings(THROTTLES={'RATES': {'ip': '2/min', 'token': '3/min'}})
+    def test_client_buckets_answer_429_with_retry_after(self):
+        statuses = [self.anonymous.get('/api/v1/products/').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.anonymous.get('/api/v1/products/')
+        self.assertEqual(int(response['Retry-After']), 30)
+
+        # Signed-in clients have their own buckets
+        statuses = [self.signed_in.get('/api/v1/orders/').status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    @override_settings(THROTTLES={'RATES': {'search': '1/min', 'checkout': '1/min'}})
+    def test_endpoint_buckets_are_shared_by_every_client(self):
+        self.assertEqual(self.anonymous.get('/api/v1/products/', {'search': 'spade'}).status_code, 200)
+        self.assertEqual(self.signed_in.get('/api/v1/products/', {'search': 'spade'}).status_code, 429)
+        # Browsing and the other order endpoints are not in those buckets
+        self.assertEqual(self.anonymous.get('/api/v1/products/').status_code, 200)
+        self.assertEqual(self.signed_in.get('/api/v1/orders/').status_code, 200)
+        self.assertEqual(self.signed_in.post('/api/v1/orders/', {}, format='json').status_code, 400)  # empty cart
+        self.assertEqual(self.signed_in.post('/api/v1/orders/', {}, format='json').status_code, 429)
+
+        body = self.anonymous.get('/metrics').content.decode()
+        self.assertIn('api_throttled_requests_total{scope="checkout"} 1', body)
+        self.assertIn('api_throttled_requests_total{scope="search"} 1', body)
+
+    @override_settings(THROTTLES={'RATES': {'user': '1/min', 'checkout': '5/min'}})
+    def test_a_throttled_client_cannot_drain_the_checkout_bucket(self):
+        statuses = [self.signed_in.post('/api/v1/orders/', {}, format='json').status_code for _ in range(6)]
+        self.assertEqual(statuses, [400, 429, 429, 429, 429, 429])  # 400: empty cart
+
+        # Only the admitted request took a checkout token
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='pass'))
+        statuses = [other.post('/api/v1/orders/', {}, format='json').status_code for _ in range(2)]
+        self.assertEqual(statuses, [400, 429])
+        self.assertEqual(throttling.store.throttled['checkout'], 0)
+
+    def test_overload_sheds_anonymous_searches_only(self):
+        # A window of requests taking seconds, most of it in SQL
+        for _ in range(20):
+            throttling.monitor.observe(5.0, 4.0)
+        self.assertTrue(throttling.monitor.overloaded())
+
+        response = self.anonymous.get('/api/v1/products/', {'search': 'spade'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(self.anonymous.get('/api/v1/products/', {'search': 'spade', 'cursor': 'abc'}).status_code, 503)
+        # Browsing past the first page is not a search: the bogus cursor gets its usual 404
+        self.assertEqual(self.anonymous.get('/api/v1/products/', {'cursor': 'abc'}).status_code, 404)
+        self.assertEqual(self.anonymous.get('/api/v1/products/').status_code, 200)
+        self.assertEqual(self.signed_in.get('/api/v1/products/', {'search': 'spade'}).status_code, 200)
+        self.assertEqual(self.signed_in.post('/api/v1/orders/', {}, format='json').status_code, 400)
+
+        body = self.anonymous.get('/metrics').content.decode()
+        self.assertIn('api_shed_requests_total 2', body)
+        self.assertIn('api_overloaded 1', body)
+
+        # Fast requests bring the percentiles back under RECOVER of the thresholds
+        for _ in range(200):
+            throttling.monitor.observe(0.01, 0.005)
+        with override_settings(THROTTLES={'OVERLOAD': {'EVALUATE_SECONDS': 0}}):
+            self.assertFalse(throttling.monitor.overloaded())
+            self.assertEqual(self.anonymous.get('/api/v1/products/', {'search': 'spade'}).status_code, 200)
+
+    @override_settings(THROTTLES={'OVERLOAD': {'EVALUATE_SECONDS': 0}})
+    def test_a_few_slow_requests_are_not_overload(self):
+        # Too few requests to judge, however slow
+        for _ in range(5):
+            throttling.monitor.observe(30.0, 20.0)
+        self.assertFalse(throttling.monitor.overloaded())
+        throttling.monitor.clear()
+
+        # A long bulk transition among ordinary requests
+        with override_settings(METRICS={'ENABLED': False}):
+            for _ in range(30):
+                self.anonymous.get('/api/v1/products/')
+        throttling.monitor.observe(10.5, 9.0)
+        self.assertFalse(throttling.monitor.overloaded())
+        # Requests were measured with METRICS disabled too
+        self.assertEqual(len(throttling.monitor._samples), 31)
+
+    def test_microbenchmark_decisions(self):
+        # The timings are `manage.py bench_throttles`' business; here, who is refused
+        rejected = {
+            mode: {case: figures['rejected'] for case, figures in throttle_bench.measure(mode, 200, 20).items()}
+            for mode in throttle_bench.MODES
+        }
+        self.assertEqual(rejected, {
+            'admitted': {'anonymous browse': 0, 'anonymous search': 0, 'token order list': 0, 'token checkout': 0},
+            # Each client's first request, then only the first one into a shared bucket
+            'rejected': {'anonymous browse': 180, 'anonymous search': 199, 'token order list': 180,
+                         'token checkout': 199},
+            'overload': {'anonymous browse': 0, 'anonymous search': 200, 'token order list': 0, 'token checkout': 0},
+        })
+
+
+@override_settings(RECOMMENDATIONS={'SETTLE_SECONDS': 0})
+class RecommendationTests(TestCase):
+    """Frequently bought together (api/recommendations.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='pass')
+        category = Category.objects.create(name='Camping')
+        self.tent, self.pegs, self.stove, self.lamp = [
+            Product.objects.create(category=category, name=name, description='', price=Decimal('10.00'))
+            for name in ('Tent', 'Pegs', 'Stove', 'Lamp')
+        ]
+        for basket, status in [
+            ((self.tent, self.pegs), 'PENDING'),
+            ((self.tent, self.pegs), 'DELIVERED'),
+            ((self.tent, self.stove), 'PENDING'),
+            ((self.pegs, self.stove), 'CANCELLED'),
+            ((self.stove,), 'PENDING'),
+            ((self.lamp,), 'PENDING'),
+        ]:
+            self.order(basket, status)
+
+    def order(self, basket, status='PENDING'):
+        order = Order.objects.create(user=self.user, status=status, created_at=timezone.now() - timedelta(hours=1))
+        for product in basket:
+            OrderItem.objects.create(order=order, product=product, name=product.name, quantity=1,
+                                     price_at_purchase=product.price)
+        return order
+
+    def recommended(self, product):
+        response = self.client.get(f'/api/v1/products/{product.pk}/recommendations/')
+        self.assertEqual(response.status_code, 200)
+        return [(row['product']['name'], round(row['score'], 3), row['orders']) for row in response.json()]
+
+    def test_full_run_ranks_pairs_by_lift(self):
+        result = recommendations.update(full=True)
+
+        # Five counted orders (not the cancelled one); tent & pegs in two of them
+        self.assertEqual(result['orders'], 5)
+        self.assertEqual(ProductPair.objects.get(product=self.tent, other=self.tent).orders, 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.recommended(self.tent), [('Pegs', 1.667, 2)])
+        self.assertEqual(self.recommended(self.stove), [])  # tent & stove: one order, under MIN_ORDERS
+
+        with override_settings(RECOMMENDATIONS={'SETTLE_SECONDS': 0, 'MIN_ORDERS': 1}):
+            recommendations.update(full=True)
+        self.assertEqual(self.recommended(self.tent), [('Pegs', 1.667, 2), ('Stove', 0.833, 1)])
+
+        self.assertEqual(self.client.get('/api/v1/products/999/recommendations/').status_code, 404)
+
+    def test_incremental_runs_count_new_orders_once(self):
+        recommendations.update(full=True)
+        for _ in range(3):
+            self.order((self.stove, self.lamp))
+        # Just placed: waits for SETTLE_SECONDS, as an order with a lower id might still be committing
+        fresh = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=fresh, product=self.lamp, name='Lamp', quantity=1,
+                                 price_at_purchase=Decimal('10.00'))
+
+        out = io.StringIO()
+        with override_settings(RECOMMENDATIONS={'SETTLE_SECONDS': 60}):
+            call_command('update_recommendations', stdout=out)
+        self.assertIn('Counted 3 order(s)', out.getvalue())
+        self.assertEqual(self.recommended(self.stove), [('Lamp', 1.2, 3)])
+        self.assertEqual(recommendations.update()['orders'], 1)  # the fresh order, once settled
+        self.assertEqual(recommendations.update()['orders'], 0)
+        self.assertEqual(ProductPair.objects.get(product=self.lamp, other=self.lamp).orders, 5)
+
+        # A run that lost the race for the watermark keeps nothing
+        pairs = list(ProductPair.objects.order_by('pk').values_list('orders', flat=True))
+        with self.assertRaises(recommendations.ConcurrentRun):
+            recommendations._count(0, fresh.pk, recommendations._config(), set())
+        self.assertEqual(list(ProductPair.objects.order_by('pk').values_list('orders', flat=True)), pairs)
+        self.assertTrue(ProductRecommendation.objects.filter(product=self.lamp, recommended=self.stove).exists())
+
+
+class AsyncReadPathTests(TransactionTestCase):
+    """
+    The ASGI entry point (api/async_views.py) answers like the WSGI one.
+    Transactional: ASGI requests query from their own threads and connections.
+    """
+
+    def setUp(self):
+        from api_project.asgi import application
+        self.asgi, self.wsgi = application, get_wsgi_application()
+        catalog_cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(username='shopper', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        category = Category.objects.create(name='Toys')
+        self.products = [
+            Product.objects.create(category=category, name=f'Kite {i}', description='Red kite',
+                                   price=Decimal('9.00') + i, stock_quantity=5)
+            for i in range(3)
+        ]
+        order = Order.objects.create(user=self.user, total_amount=Decimal('9.00'))
+        OrderItem.objects.create(order=order, product=self.products[0], name='Kite 0',
+                                 quantity=1, price_at_purchase=Decimal('9.00'))
+
+    def both(self, path, params=None, headers=None):
+        catalog_cache.clear()
+        wsgi = wsgi_get(self.wsgi, path, params, headers)
+        catalog_cache.clear()
+        asgi = asyncio.run(asgi_get(self.asgi, path, params, headers))
+        return wsgi, asgi
+
+    @override_settings(METRICS={'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 10_000})
+    def test_serialization_is_timed(self):
+        registry.clear()
+        asyncio.run(asgi_get(self.asgi, f'/api/v1/products/{self.products[0].pk}/'))
+        body = registry.exposition()
+        self.assertIn('api_serialize_seconds_total{view="ProductViewSet.retrieve"}', body)
+        self.assertNotIn('api_serialize_seconds_total{view="ProductViewSet.retrieve"} 0.000000', body)
+
+    def test_reads_match_wsgi_byte_for_byte(self):
+        auth = {'Authorization': f'Token {self.token.key}'}
+        for path, params, headers in [
+            ('/api/v1/products/', {'ordering': '-price', 'page_size': 2}, {}),
+            ('/api/v1/products/', {'search': 'kite'}, auth),
+            (f'/api/v1/products/{self.products[1].pk}/', None, {}),
+            ('/api/v1/orders/', None, auth),
+            ('/api/v1/orders/', None, {}),                                # 401 via the sync viewset
+            ('/api/v1/products/', {'category': 999}, {}),                 # 400 via the sync viewset
+            ('/api/v1/products/', {'category': [self.products[0].category_id], 'price_min': '9.50',
+                                   'in_stock': 'true'}, {}),
+            ('/api/v1/products/', {'price_max': 'cheap'}, {}),            # 400 via the sync viewset
+            ('/api/v1/products/facets/', {'search': 'kite'}, {}),         # list actions reach the viewset
+        ]:
+            (wsgi_status, wsgi_headers, wsgi_body), (asgi_status, asgi_headers, asgi_body) = self.both(
+                path, params, headers
+            )
+            self.assertEqual((asgi_status, asgi_body), (wsgi_status, wsgi_body), path)
+            self.assertEqual(sorted(asgi_headers), sorted(wsgi_headers), path)
+
+    @override_settings(METRICS={'SAMPLE_RATE': 1.0})
+    def test_metrics_count_queries_of_async_views(self):
+        registry.clear()
+        asyncio.run(asgi_get(self.asgi, '/api/v1/products/'))
+
+        body = registry.exposition()
+        self.assertIn('api_requests_total{view="ProductViewSet.list",status="2xx"} 1', body)
+        self.assertIn('api_request_queries_sum{view="ProductViewSet.list"} 1.000000', body)
+
+    @override_settings(THROTTLES={'RATES': {'ip': '2/min'}})
+    def test_throttled_on_the_event_loop(self):
+        throttling.store.clear()
+        self.addCleanup(throttling.store.clear)
+        responses = [asyncio.run(asgi_get(self.asgi, '/api/v1/products/')) for _ in range(3)]
+
+        self.assertEqual([status for status, _, _ in responses], [200, 200, 429])
+        self.assertEqual(dict(responses[2][1])['Retry-After'], '30')
+        # Answered on the event loop: the sync viewset did not take (and count) a second token
+        self.assertEqual(throttling.store.throttled['ip'], 1)
+
+    @override_settings(THROTTLES={'RATES': {'ip': '3/min'}})
+    def test_fallbacks_take_one_token(self):
+        throttling.store.clear()
+        self.addCleanup(throttling.store.clear)
+        # Admitted on the event loop, then answered by the sync viewset (400, 404)
+        for path, params, expected in [
+            ('/api/v1/products/', {'price_max': 'cheap'}, 400),
+            ('/api/v1/products/999999/', None, 404),
+        ]:
+            throttling.store.clear()
+            statuses = [asyncio.run(asgi_get(self.asgi, path, params))[0] for _ in range(3)]
+            self.assertEqual(statuses, [expected] * 3, path)
+
+    def test_conditional_get_and_writes(self):
+        path = f'/api/v1/products/{self.products[0].pk}/'
+        _, headers, _ = asyncio.run(asgi_get(self.asgi, path))
+        etag = dict(headers)['ETag']
+        status, _, _ = asyncio.run(asgi_get(self.asgi, path, headers={'If-None-Match': etag}))
+        self.assertEqual(status, 304)
+
+        # Writes go through the sync viewsets (and their transactions) unchanged
+        reservations.hold(self.user, self.products[0].pk, 2)
+        with override_settings(ROOT_URLCONF='api_project.urls_async'):
+            response = asyncio.run(self.async_client.post(
+                '/api/v1/orders/', {}, content_type='application/json',
+                headers={'Authorization': f'Token {self.token.key}'},
+            ))
+        self.assertEqual(response.status_code, 201)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_quantity, 3)
@@ -0,0 +1,301 @@
+# api/throttling.py
+"""
+Token-bucket throttles and load shedding (settings.THROTTLES).
+
+Every rate in THROTTLES['RATES'] is a bucket of N tokens refilled at N per
+period ('120/min': bursts of up to 120 requests, 2 per second sustained).
+Buckets are kept per
+  - authenticated user ('user'),
+  - API token ('token'),
+  - client IP address of anonymous requests ('ip'),
+  - endpoint, shared by all clients ('search', 'checkout', ...: the view's
+    `throttle_scope`). EndpointThrottle goes last: a request a client bucket
+    refused takes no token from the shared bucket, so one throttled client
+    cannot lock everyone else out of checkout.
+They live in an in-process store (BucketStore): a lock-protected LRU of at
+most MAX_KEYS buckets, so each decision is a dict lookup and a little
+arithmetic. Like the other in-process caches here, every server process
+keeps its own buckets: a client can send N requests per period to each.
+
+Load shedding: LoadMonitor keeps the latency and SQL time of the requests
+of the last WINDOW_SECONDS (fed by MetricsMiddleware, api/metrics.py, with
+or without METRICS enabled). While the PERCENTILE (p90) of either is above
+its OVERLOAD threshold, LoadShedThrottle answers low-priority requests
+(anonymous searches, deep pages included; not plain catalog browsing, on any
+page) with 503 and Retry-After, leaving the capacity to checkout and
+signed-in shoppers. A percentile needs
+most requests to be slow: one long admin action or bulk transition does not
+start shedding, and under MIN_SAMPLES requests in the window nothing does.
+Overload mode ends once both percentiles drop below RECOVER of their
+thresholds.
+"""
+
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def _config():
+    config = {
+        'ENABLED': True,
+        'RATES': {},
+        'MAX_KEYS': 100000,
+        'OVERLOAD': {},
+    }
+    config.update(getattr(settings, 'THROTTLES', {}))
+    return config
+
+
+def _overload_config():
+    config = {
+        'LATENCY_MS': 500,
+        'QUERY_MS': 250,
+        'RECOVER': 0.8,
+        'PERCENTILE': 90,
+        'WINDOW_SECONDS': 30,
+        'MIN_SAMPLES': 20,
+        'MAX_SAMPLES': 5000,
+        'EVALUATE_SECONDS': 1,
+        'RETRY_AFTER': 5,
+    }
+    config.update(_config()['OVERLOAD'])
+    return config
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'120/min' -> (capacity 120, refilled at 2.0 tokens per second)."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period]
+
+
+class BucketStore:
+    """Token buckets by key, LRU-bounded; take() is atomic. An evicted bucket comes back full."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self.throttled = Counter()     # scope -> rejected requests
+
+    def take(self, key, capacity, per_second, max_keys):
+        """Takes a token: 0.0 if there was one, else the seconds until there is."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                if len(self._buckets) > max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * per_second)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / per_second
+
+    def count_throttled(self, scope):
+        with self._lock:
+            self.throttled[scope] += 1
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self.throttled.clear()
+
+
+store = BucketStore()
+
+
+class LoadMonitor:
+    """
+    Request latency and SQL time (of sampled requests) over the last
+    WINDOW_SECONDS, judged by their PERCENTILE at most every EVALUATE_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = deque()  # (monotonic time, seconds, query seconds or None)
+        self.latency = 0.0       # the PERCENTILE at the last evaluation
+        self.query_time = 0.0
+        self._overloaded = False
+        self._evaluated = 0.0
+        self.shed = 0
+
+    def observe(self, seconds, query_seconds=None):
+        max_samples = _overload_config()['MAX_SAMPLES']
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds, query_seconds))
+            if len(self._samples) > max_samples:
+                self._samples.popleft()
+
+    def _evaluate(self, config, now):
+        samples = self._samples
+        while samples and samples[0][0] < now - config['WINDOW_SECONDS']:
+            samples.popleft()
+        # Too few requests to tell load from a handful of slow ones: 0
+        self.latency = _percentile([seconds for _, seconds, _ in samples], config)
+        self.query_time = _percentile([seconds for _, _, seconds in samples if seconds is not None], config)
+        latency_ms, query_ms = self.latency * 1000, self.query_time * 1000
+        if latency_ms > config['LATENCY_MS'] or query_ms > config['QUERY_MS']:
+            self._overloaded = True
+        elif (latency_ms < config['LATENCY_MS'] * config['RECOVER']
+              and query_ms < config['QUERY_MS'] * config['RECOVER']):
+            self._overloaded = False
+        self._evaluated = now
+
+    def count_shed(self):
+        with self._lock:
+            self.shed += 1
+
+    def overloaded(self):
+        config = _overload_config()
+        now = time.monotonic()
+        if now - self._evaluated >= config['EVALUATE_SECONDS']:
+            with self._lock:
+                self._evaluate(config, now)
+        return self._overloaded
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self.latency = self.query_time = self._evaluated = 0.0
+            self._overloaded = False
+            self.shed = 0
+
+
+def _percentile(values, config):
+    """Nearest-rank PERCENTILE of the values; 0.0 for fewer than MIN_SAMPLES."""
+    if len(values) < config['MIN_SAMPLES']:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(config['PERCENTILE'] / 100 * len(ordered)) - 1)]
+
+
+monitor = LoadMonitor()
+
+
+class Overloaded(exceptions.Throttled):
+    status_code = 503
+    default_detail = 'The service is busy.'
+    default_code = 'overloaded'
+
+
+# --- Throttles ----------------------------------------------------------------
+
+def mark_admitted(request):
+    """
+    Records on the Django request that its throttles passed, so a viewset that
+    dispatches it again (the ASGI path falling back, api/async_views.py)
+    neither takes a second token nor sheds it.
+    """
+    request._throttles_admitted = True
+
+
+def _admitted(request):
+    # DRF's Request reads missing attributes from the Django request
+    return getattr(request, '_throttles_admitted', False)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """A bucket per get_key() in THROTTLES['RATES'][scope]; no rate or no key: not throttled."""
+    scope = None
+
+    def get_scope(self, view):
+        return self.scope
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if _admitted(request):
+            return True
+        config = _config()
+        scope = self.get_scope(view)
+        rate = config['RATES'].get(scope) if config['ENABLED'] and scope else None
+        if not rate:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        capacity, per_second = parse_rate(rate)
+        self._wait = store.take(f'{scope}:{key}', capacity, per_second, config['MAX_KEYS'])
+        if self._wait:
+            store.count_throttled(scope)
+            # DRF asks every throttle anyway; see EndpointThrottle
+            request._throttle_refused = True
+            return False
+        return True
+
+    def wait(self):
+        return self._wait
+
+
+class UserThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def get_key(self, request, view):
+        return request.user.pk if request.user.is_authenticated else None
+
+
+class TokenThrottle(TokenBucketThrottle):
+    scope = 'token'
+
+    def get_key(self, request, view):
+        return getattr(request.auth, 'key', None)
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Anonymous clients by address (NUM_PROXIES aware); signed-in ones have their own buckets."""
+    scope = 'ip'
+
+    def get_key(self, request, view):
+        return None if request.user.is_authenticated else self.get_ident(request)
+
+
+class EndpointThrottle(TokenBucketThrottle):
+    """
+    One bucket per view `throttle_scope`, shared by every client. List it after
+    the client throttles: it takes no token for requests they refused.
+    """
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None)
+
+    def allow_request(self, request, view):
+        if getattr(request, '_throttle_refused', False):
+            return True  # refused already: the other throttle's wait applies
+        return super().allow_request(request, view)
+
+    def get_key(self, request, view):
+        return '*'
+
+
+def is_low_priority(request):
+    """
+    Anonymous searches, first and deeper (`cursor`) pages alike: shed first
+    under overload. Browsing the catalog without a search term never is.
+    """
+    return not request.user.is_authenticated and bool(request.query_params.get('search'))
+
+
+class LoadShedThrottle(BaseThrottle):
+    """Rejects low-priority requests with 503 while LoadMonitor reports overload."""
+
+    def allow_request(self, request, view):
+        if _admitted(request):
+            return True
+        if _config()['ENABLED'] and monitor.overloaded() and is_low_priority(request):
+            monitor.count_shed()
+            raise Overloaded(wait=_overload_config()['RETRY_AFTER'])
+        return True
@@ -2,7 +2,10 @@
 
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import ProductViewSet, CartItemViewSet, OrderViewSet
+from .views import (
+    ProductViewSet, CartItemViewSet, OrderViewSet, auth_cache_stats, sales_report, category_sales_report,
+    top_products_report,
+)
 
 # Create a router instance
 router = DefaultRouter()
@@ -13,5 +16,9 @@ router.register('cart/items', CartItemViewSet, basename='cart-item')
 router.register('orders', OrderViewSet, basename='order')
 
 urlpatterns = [
+    path('auth/cache-stats/', auth_cache_stats, name='auth-cache-stats'),
+    path('analytics/sales/', sales_report, name='sales-report'),
+    path('analytics/sales/categories/', category_sales_report, name='category-sales-report'),
+    path('analytics/sales/products/', top_products_report, name='top-products-report'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,45 +1,156 @@
 # api/views.py
 
+from decimal import Decimal
+
 from rest_framework import viewsets, mixins, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.db import transaction
+from django.http import Http404
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
 # IMPORTANT: Need to import all models and serializers
-from .models import Product, CartItem, Order
-from .serializers import ProductSerializer, CartItemSerializer, OrderSerializer
+from .models import Product, CartItem, Order, ProductRecommendation
+from .serializers import (
+    ProductSerializer, CartItemSerializer, CartBatchSerializer, CartSummarySerializer, OrderSerializer,
+    ExportParamsSerializer, SalesReportParamsSerializer, SalesFiguresSerializer, DailySalesSerializer,
+    RankedSalesSerializer, OrderTransitionSerializer, ProductRecommendationSerializer,
+)
 from .permissions import IsAdminOrReadOnly 
+from . import analytics, exports, fulfilment, representations
+from .authentication import token_cache
+from .carts import cart_store
+from .cache import CATALOG_GENERATION, CatalogCacheMixin, catalog_cache
+from .conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from .filters import FACET_FILTERS, ProductFilter, facet_counts
+from .metrics import SerializationTimingMixin
+from .representations import FastListMixin
+from .sparse import SparseFieldsetMixin
+from .search import ProductSearchFilter
 
 # Third-party packages for filtering and search 
+from django_filters import utils as filter_utils
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
+
+
+# Shared by the `export` actions: ?output=ndjson|csv&since=<iso datetime>&after_id=<id>
+def stream_export(dataset, request):
+    params = ExportParamsSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    return exports.streaming_export(dataset, **params.validated_data)
 
 
 # 1. Product ViewSet (CRUD, Filtering, Searching - Weeks 1 & 2)
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SerializationTimingMixin, FastListMixin, ConditionalRetrieveMixin, CatalogCacheMixin,
+                     viewsets.ModelViewSet):
     
-    queryset = Product.objects.all()
+    # The category is part of every representation; join it rather than load it per row
+    queryset = Product.objects.select_related('category')
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrReadOnly] 
+    # The category name is part of the representation, so its update time is a validator too
+    validator_fields = ('version', 'updated_at', 'category__updated_at')
+    # List pages skip the serializer (api/representations.py)
+    list_fields = representations.PRODUCT_FIELDS
+    list_representation = staticmethod(representations.products)
     
     # Filtering and Searching Configuration
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['category', 'stock_quantity'] 
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
+    # ?category= (repeatable), ?price_min=/?price_max=, ?in_stock=, ?stock_quantity= (api/filters.py)
+    filterset_class = ProductFilter
+    # Used by the full-text index (api/search.py) and by the icontains fallback
     search_fields = ['name', 'description', 'category__name'] 
     ordering_fields = ['price', 'stock_quantity', 'created_date'] 
 
+    @property
+    def throttle_scope(self):
+        # Searches share one endpoint bucket (api/throttling.py); browsing is only throttled per client
+        return 'search' if self.request.query_params.get('search') else None
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Category, price bucket and stock counts for the current search and filters (cached like list pages)."""
+        return self._cached(request, [CATALOG_GENERATION], self._facets)
+
+    def _facets(self, request):
+        filterset = self.filterset_class(request.query_params, self.get_queryset(), request=request)
+        if not filterset.is_valid():
+            raise filter_utils.translate_validation(filterset.errors)
+        queryset = filterset.filter_queryset_without(filterset.queryset, FACET_FILTERS)
+        queryset = ProductSearchFilter().filter_queryset(request, queryset, self)
+        return Response(facet_counts(queryset, filterset.form.cleaned_data))
+
+    @action(detail=True, methods=['get'])
+    def recommendations(self, request, pk=None):
+        """Products frequently bought together with this one, best first (api/recommendations.py)."""
+        if not pk.isdigit():
+            raise Http404
+        # One scan of recommendation_rank_uniq, joined to the recommended products
+        rows = ProductRecommendation.objects.filter(product_id=pk).select_related('recommended').only(
+            'rank', 'score', 'orders', 'product_id',
+            *(f'recommended__{name}' for name in ('id', 'name', 'price', 'image_url', 'stock_quantity')),
+        ).order_by('rank')
+        data = ProductRecommendationSerializer(rows, many=True).data
+        if not data and not Product.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Streams the whole catalog (or a delta) as NDJSON or CSV."""
+        return stream_export('products', request)
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss/eviction counters of the catalog response cache (this process)."""
+        return Response(catalog_cache.stats())
+
 
 # 2. CartItem ViewSet (Add/Update/Delete item in cart - Week 3)
-class CartItemViewSet(viewsets.GenericViewSet, 
+LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+class CartItemViewSet(SerializationTimingMixin,
+                      SparseFieldsetMixin,
+                      ConditionalListMixin,
+                      viewsets.GenericViewSet, 
                       mixins.ListModelMixin, 
                       mixins.CreateModelMixin, 
                       mixins.DestroyModelMixin):
     
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated]
+    # Cart lines embed product name/price/stock, so product changes must change the ETag.
+    # The cart summary rides along in the same aggregate query.
+    list_validator_aggregates = {
+        **ConditionalListMixin.list_validator_aggregates,
+        'product_versions': Sum('product__version'),
+        'product_updated': Max('product__updated_at'),
+        'line_count': Count('pk'),
+        'total_quantity': Coalesce(Sum('quantity'), 0),
+        'grand_total': Coalesce(Sum(LINE_TOTAL), Value(Decimal('0.00')), output_field=LINE_TOTAL.output_field),
+        'out_of_stock_lines': Count('pk', filter=Q(quantity__gt=F('product__stock_quantity'))),
+    }
     
     def get_queryset(self):
-        # Ensure users only see their own cart items
-        return CartItem.objects.filter(user=self.request.user)
+        # Ensure users only see their own cart items; product and sub total come from the same query
+        return (
+            CartItem.objects.filter(user=self.request.user)
+            .select_related('product')
+            .annotate(line_total=LINE_TOTAL)
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Paginated cart lines plus a `summary` envelope (constant number of queries)."""
+        # Changes still pending in a write-back cart store are read from CartItem like the rest
+        cart_store().flush(request.user)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.data['summary'] = CartSummarySerializer(self.list_aggregates).data
+        return response
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -51,37 +162,122 @@ class CartItemViewSet(viewsets.GenericViewSet,
         quantity = serializer.validated_data.get('quantity')
         user = self.request.user
         
-        # Check if item already exists in cart
-        cart_item, created = CartItem.objects.get_or_create(
-            user=user, 
-            product_id=product_id,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            # If item exists, update the quantity
-            cart_item.quantity = quantity
-            cart_item.save()
+        # Add or update the line (and reserve its units for CART_HOLD_TTL_SECONDS, see api/carts.py)
+        cart_item, created = cart_store().set_quantity(user, product_id, quantity)
         
         # Use a fresh serializer instance to ensure correct read representation
         read_serializer = self.get_serializer(cart_item)
         
         return Response(read_serializer.data, status=status.HTTP_200_OK if not created else status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """Adds, updates or removes (quantity 0) many cart lines at once; returns the whole cart."""
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart_store().set_many(request.user, serializer.validated_data['items'])
+
+        cart = self.get_queryset()
+        return Response(self.get_serializer(cart, many=True).data, status=status.HTTP_200_OK)
+
+    def perform_destroy(self, instance):
+        # Gives the held units back to other shoppers before removing the line
+        cart_store().remove(instance)
+
 
 # 3. Order ViewSet (List User Orders, Create New Order - Week 4)
-class OrderViewSet(viewsets.GenericViewSet, 
+class OrderViewSet(SerializationTimingMixin,
+                   FastListMixin,
+                   ConditionalRetrieveMixin,
+                   viewsets.GenericViewSet, 
                    mixins.ListModelMixin, 
                    mixins.RetrieveModelMixin,
                    mixins.CreateModelMixin):
     
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    list_fields = representations.ORDER_FIELDS
+    list_representation = staticmethod(representations.orders)
+
+    @property
+    def throttle_scope(self):
+        # Placing orders shares one endpoint bucket (api/throttling.py)
+        return 'checkout' if self.action == 'create' else None
 
     def get_queryset(self):
         # Users can only see their own orders, nested items are prefetched for efficiency
         return Order.objects.filter(user=self.request.user).prefetch_related('items')
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Streams every user's orders with their items (or a delta) as NDJSON or CSV."""
+        return stream_export('orders', request)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def transition(self, request):
+        """Moves any users' orders (`ids`) to `status` where allowed; reports the orders it could not move."""
+        serializer = OrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = fulfilment.transition(
+            serializer.validated_data['ids'], serializer.validated_data['status'], user=request.user
+        )
+        return Response(result, status=status.HTTP_200_OK)
+
     def perform_create(self, serializer):
        
-        serializer.save()
\ No newline at end of file
+        serializer.save()
+
+
+# 4. Token cache statistics (api/authentication.py)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def auth_cache_stats(request):
+    """Hit/miss/eviction/invalidation counters of the token -> user cache (this process)."""
+    return Response(token_cache.stats())
+
+
+# 5. Sales reports, read from the rollups (api/analytics.py): ?start=&end= (default: the last 30 days)
+def report_params(request):
+    params = SalesReportParamsSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    return params.validated_data
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_report(request):
+    """Orders, units, revenue and average order value of the range, in total and per day."""
+    params = report_params(request)
+    report = analytics.daily(params['start'], params['end'])
+    return Response({
+        'start': params['start'],
+        'end': params['end'],
+        'totals': SalesFiguresSerializer(report['totals']).data,
+        'days': DailySalesSerializer(report['days'], many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def category_sales_report(request):
+    """Sales of the ?limit= (default 10) best categories over the range, by ?rank_by=revenue|units|orders."""
+    params = report_params(request)
+    rows = analytics.by_category(params['start'], params['end'], params['rank_by'], params['limit'])
+    return Response({
+        'start': params['start'],
+        'end': params['end'],
+        'results': RankedSalesSerializer(rows, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def top_products_report(request):
+    """The ?limit= (default 10) best selling products over the range by ?rank_by=revenue|units|orders."""
+    params = report_params(request)
+    rows = analytics.top_products(params['start'], params['end'], params['rank_by'], params['limit'])
+    return Response({
+        'start': params['start'],
+        'end': params['end'],
+        'results': RankedSalesSerializer(rows, many=True).data,
+    })
@@ -2,6 +2,8 @@
 ASGI config for api_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed through ``api_project.urls_async``, which serves the
+catalog and order history reads with native async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +11,23 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_project.settings')
 
-application = get_asgi_application()
+ASYNC_URLCONF = 'api_project.urls_async'
+
+
+class ApiASGIHandler(ASGIHandler):
+    """Django's ASGI handler, resolving every request against ASYNC_URLCONF."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASYNC_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = ApiASGIHandler()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers every other middleware (api/metrics.py)
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +92,17 @@ DATABASES = {
     }
 }
 
+# Local PostgreSQL (e.g. for `manage.py bench_api`): export POSTGRES_DB and friends
+if os.environ.get('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ['POSTGRES_DB'],
+        'USER': os.environ.get('POSTGRES_USER', ''),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', ''),
+        'PORT': os.environ.get('POSTGRES_PORT', ''),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,3 +136,146 @@ STATIC_URL = 'static/'
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Cart reservations: how long an added cart line holds its units (api/reservations.py).
+# Run `python manage.py release_expired_holds` periodically (e.g. cron) to free lapsed holds.
+CART_HOLD_TTL_SECONDS = 15 * 60
+
+# Cart storage (api/carts.py). 'api.carts.CacheCartStore' keeps quantity changes in
+# the ALIAS cache and writes them back to CartItem after WRITE_BACK_CHANGES changes or
+# WRITE_BACK_SECONDS, before the cart is read and at checkout. With more than one
+# process, point ALIAS at a shared cache (e.g. Redis). LOCK_SECONDS bounds how long a
+# crashed request can keep a cart entry locked.
+CART_STORE = {
+    'BACKEND': 'api.carts.DatabaseCartStore',
+    'ALIAS': 'default',
+    'TIMEOUT': 24 * 60 * 60,
+    'WRITE_BACK_CHANGES': 20,
+    'WRITE_BACK_SECONDS': 60,
+    'LOCK_SECONDS': 5,
+}
+
+
+# Django REST Framework
+REST_FRAMEWORK = {
+    # Keyset (cursor) pagination for every list endpoint, see api/pagination.py
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # Tokens from /api/v1/auth/login/, looked up through an in-process cache (api/authentication.py)
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # Token buckets and load shedding, configured by THROTTLES below (api/throttling.py);
+    # the shared endpoint buckets last, so requests refused per client take none of theirs
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.LoadShedThrottle',
+        'api.throttling.UserThrottle',
+        'api.throttling.TokenThrottle',
+        'api.throttling.IPThrottle',
+        'api.throttling.EndpointThrottle',
+    ],
+}
+
+
+# Caches: the default cache holds small long-lived values (e.g. catalog generation
+# counters); cached catalog responses get their own bounded cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Catalog response cache (api/cache.py): LRU-bounded to MAX_ENTRIES keys per process
+CATALOG_CACHE = {
+    'ALIAS': 'catalog',
+    'MAX_ENTRIES': 5000,
+    'TIMEOUT': 300,
+}
+
+# Token -> user cache for CachedTokenAuthentication. Entries live TTL seconds per
+# process; set SHARED_ALIAS to a shared cache (e.g. Redis) to share lookups and
+# invalidations between processes.
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 60,
+    'SHARED_ALIAS': None,
+}
+
+# Background tasks (api/tasks.py), run by `python manage.py run_workers`. A failing
+# task is retried after BACKOFF_SECONDS, doubling per attempt up to MAX_BACKOFF_SECONDS,
+# and moved to the DeadTask table after MAX_ATTEMPTS. A worker that holds a task longer
+# than LEASE_SECONDS is presumed dead and the task is run again.
+TASKS = {
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 10,
+    'MAX_BACKOFF_SECONDS': 60 * 60,
+    'LEASE_SECONDS': 5 * 60,
+    'BATCH_SIZE': 10,
+}
+
+# "Frequently bought together" (api/recommendations.py), refreshed by
+# `python manage.py update_recommendations` (e.g. hourly; `--full` recounts all orders).
+# Each product keeps its TOP_K partners bought with it in at least MIN_ORDERS orders,
+# ranked by SCORE ('lift' or 'cosine'). Orders with more than MAX_BASKET products are
+# skipped; MAX_PAIRS bounds the pair counters held in memory.
+RECOMMENDATIONS = {
+    'TOP_K': 10,
+    'MIN_ORDERS': 2,
+    'SCORE': 'lift',
+    'CHUNK_ORDERS': 10000,
+    'MAX_PAIRS': 200000,
+    'MAX_BASKET': 50,
+    'RANK_CHUNK': 500,
+    'SETTLE_SECONDS': 60,
+}
+
+# Throttling (api/throttling.py). Each rate is a token bucket: bursts of N requests,
+# refilled at N per period. 'user', 'token' and 'ip' (anonymous clients) are per
+# client; 'search' and 'checkout' are shared by everyone using the endpoint. Buckets
+# are kept per process. While the PERCENTILE of request latency or SQL time over the
+# last WINDOW_SECONDS (at least MIN_SAMPLES requests) is above OVERLOAD's LATENCY_MS /
+# QUERY_MS, anonymous searches (any page) get 503 with Retry-After,
+# until both drop below RECOVER of their thresholds. MetricsMiddleware measures them.
+THROTTLES = {
+    'ENABLED': True,
+    'RATES': {
+        'user': '1200/min',
+        'token': '1200/min',
+        'ip': '600/min',
+        'search': '200/s',
+        'checkout': '50/s',
+    },
+    'MAX_KEYS': 100000,
+    'OVERLOAD': {
+        'LATENCY_MS': 500,
+        'QUERY_MS': 250,
+        'RECOVER': 0.8,
+        'PERCENTILE': 90,
+        'WINDOW_SECONDS': 30,
+        'MIN_SAMPLES': 20,
+        'MAX_SAMPLES': 5000,
+        'EVALUATE_SECONDS': 1,
+        'RETRY_AFTER': 5,
+    },
+}
+
+# Per-view request metrics (api/metrics.py), scraped from /metrics. SAMPLE_RATE is
+# the share of requests that also record SQL, serialization and render time and
+# response size; requests slower than SLOW_REQUEST_MS are logged to 'api.metrics'
+# (sampled ones with their slowest queries). Set BEARER_TOKEN to require `Authorization: Bearer <token>`.
+METRICS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.1,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_QUERIES_LOGGED': 5,
+    'BEARER_TOKEN': None,
+}
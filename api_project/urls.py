@@ -18,8 +18,14 @@ from django.contrib import admin
 from django.urls import path, include
  
 from rest_framework.authtoken.views import obtain_auth_token 
+
+from api.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+
+    # Prometheus scrape target (api/metrics.py)
+    path('metrics', metrics_view, name='metrics'),
     
     
     # Authentication Endpoint (Login/Get Token)
@@ -0,0 +1,21 @@
+"""
+URL configuration used under ASGI (see api_project/asgi.py).
+
+The read-heavy API routes go to the native async views in api/async_views.py
+(which hand writes and anything unusual to the regular viewsets); everything
+else is routed exactly as in api_project/urls.py. Detail routes only take
+numeric ids, so list-level actions (`products/facets/`) reach the viewsets.
+"""
+from django.urls import re_path
+
+from api import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    re_path(r'^api/v1/products/$', async_views.product_list),
+    re_path(r'^api/v1/products/(?P<pk>[0-9]+)/$', async_views.product_detail),
+    re_path(r'^api/v1/orders/$', async_views.order_list),
+    re_path(r'^api/v1/orders/(?P<pk>[0-9]+)/$', async_views.order_detail),
+    *sync_urlpatterns,
+]